@@ -0,0 +1,52 @@
+"""CORE-01 / ADM-06 / CORE-05: import_jobs — фоновые задачи импорта с прогрессом.
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-16
+
+Загрузка возвращает job_id сразу; воркер пишет прогресс и итоговый отчёт сюда,
+чтобы состояние переживало рестарт backend.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "013"
+down_revision: Union[str, None] = "012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "import_jobs",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("kind", sa.String(32), nullable=False),
+        sa.Column("status", sa.String(16), nullable=False, server_default="queued"),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("file_path", sa.Text(), nullable=False),
+        sa.Column("user_id", sa.String(128), nullable=True),
+        sa.Column("ip", sa.String(45), nullable=True),
+        sa.Column("processed_rows", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("accepted", sa.Integer(), nullable=True),
+        sa.Column("rejected", sa.Integer(), nullable=True),
+        sa.Column("errors", sa.Text(), nullable=True),
+        sa.Column("warnings", sa.Text(), nullable=True),
+        sa.Column("detail", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_check_constraint(
+        "import_jobs_status_check",
+        "import_jobs",
+        "status IN ('queued', 'running', 'done', 'failed')",
+    )
+    op.create_index("ix_import_jobs_status", "import_jobs", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_import_jobs_status", table_name="import_jobs")
+    op.drop_table("import_jobs")
@@ -0,0 +1,164 @@
+"""CORE-04: premise_quorum_stats — материализованные флаги кворума по помещениям.
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-16
+
+Одна строка на помещение: площадь, есть ли голос «ЗА», контакт в ЭД (owner / owner|account),
+доля участия в ОСС (≤ 1). Поддерживается триггерами FOR EACH STATEMENT на premises, contacts,
+oss_voting, oss_participation: пересчитываются только затронутые помещения (transition tables),
+в той же транзакции, что и изменение. GET /api/buildings/{id}/quorum — один агрегат по этой таблице без JOIN.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "014"
+down_revision: Union[str, None] = "013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Пересчёт флагов для набора помещений. Сначала строки статистики блокируются (в порядке premise_id —
+# без взаимоблокировок), затем флаги считаются новым снимком: при READ COMMITTED параллельная транзакция
+# по тому же помещению дождётся коммита первой и учтёт её изменения.
+_REFRESH_FUNCTION = """
+CREATE OR REPLACE FUNCTION premise_quorum_stats_refresh(pids text[]) RETURNS void AS $$
+BEGIN
+    IF pids IS NULL OR cardinality(pids) = 0 THEN
+        RETURN;
+    END IF;
+    INSERT INTO premise_quorum_stats (premise_id)
+    SELECT p.cadastral_number FROM premises p WHERE p.cadastral_number = ANY(pids)
+    ON CONFLICT (premise_id) DO NOTHING;
+    PERFORM 1 FROM premise_quorum_stats WHERE premise_id = ANY(pids) ORDER BY premise_id FOR UPDATE;
+    UPDATE premise_quorum_stats s SET
+        area = v.area,
+        voted_for = v.voted_for,
+        ed_owner = v.ed_owner,
+        ed_any = v.ed_any,
+        participated_share = v.participated_share
+    FROM (
+        SELECT p.cadastral_number AS premise_id,
+               COALESCE(p.area, 0) AS area,
+               COALESCE(cf.voted_for, false) AS voted_for,
+               COALESCE(cf.ed_owner, false) AS ed_owner,
+               COALESCE(cf.ed_any, false) AS ed_any,
+               LEAST(COALESCE(ps.share_sum, 0), 1) AS participated_share
+        FROM premises p
+        LEFT JOIN (
+            SELECT c.premise_id,
+                   bool_or(o.barrier_vote = 'for') AS voted_for,
+                   bool_or(c.registered_in_ed = 'owner' AND c.status IN ('pending', 'validated')) AS ed_owner,
+                   bool_or(c.registered_in_ed IN ('owner', 'account') AND c.status IN ('pending', 'validated')) AS ed_any
+            FROM contacts c
+            LEFT JOIN oss_voting o ON o.contact_id = c.id
+            WHERE c.premise_id = ANY(pids)
+            GROUP BY c.premise_id
+        ) cf ON cf.premise_id = p.cadastral_number
+        LEFT JOIN (
+            SELECT premise_id, SUM(ownership_share) AS share_sum
+            FROM oss_participation
+            WHERE participated = true AND premise_id = ANY(pids)
+            GROUP BY premise_id
+        ) ps ON ps.premise_id = p.cadastral_number
+        WHERE p.cadastral_number = ANY(pids)
+    ) v
+    WHERE s.premise_id = v.premise_id;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Триггерные функции: ключ помещения из transition tables (new_rows / old_rows) — по TG_OP.
+# plpgsql планирует оператор при первом выполнении, поэтому ветка с отсутствующей таблицей не мешает.
+_TRIGGER_FUNCTIONS = {
+    "premises": "cadastral_number",
+    "contacts": "premise_id",
+    "oss_participation": "premise_id",
+}
+_OSS_VOTING_FUNCTION = """
+CREATE OR REPLACE FUNCTION premise_quorum_stats_oss_voting_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM premise_quorum_stats_refresh(ARRAY(
+            SELECT DISTINCT c.premise_id FROM new_rows n JOIN contacts c ON c.id = n.contact_id));
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM premise_quorum_stats_refresh(ARRAY(
+            SELECT DISTINCT c.premise_id FROM old_rows n JOIN contacts c ON c.id = n.contact_id));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def _table_trigger_function(table: str, key: str) -> str:
+    return f"""
+CREATE OR REPLACE FUNCTION premise_quorum_stats_{table}_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM premise_quorum_stats_refresh(ARRAY(SELECT DISTINCT {key}::text FROM new_rows));
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM premise_quorum_stats_refresh(ARRAY(SELECT DISTINCT {key}::text FROM old_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+# Transition tables допускают только одно событие на триггер — по триггеру на INSERT/UPDATE/DELETE.
+_REFERENCING = {
+    "INSERT": "REFERENCING NEW TABLE AS new_rows",
+    "UPDATE": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "DELETE": "REFERENCING OLD TABLE AS old_rows",
+}
+# premises удаляются каскадом по FK статистики; DELETE-триггер не нужен
+_TRIGGER_EVENTS = {
+    "premises": ("INSERT", "UPDATE"),
+    "contacts": ("INSERT", "UPDATE", "DELETE"),
+    "oss_voting": ("INSERT", "UPDATE", "DELETE"),
+    "oss_participation": ("INSERT", "UPDATE", "DELETE"),
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "premise_quorum_stats",
+        sa.Column(
+            "premise_id",
+            sa.String(64),
+            sa.ForeignKey("premises.cadastral_number", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("area", sa.Numeric(), nullable=False, server_default="0"),
+        sa.Column("voted_for", sa.Boolean(), nullable=False, server_default="false"),
+        sa.Column("ed_owner", sa.Boolean(), nullable=False, server_default="false"),
+        sa.Column("ed_any", sa.Boolean(), nullable=False, server_default="false"),
+        sa.Column("participated_share", sa.Numeric(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("premise_id"),
+    )
+    op.execute(_REFRESH_FUNCTION)
+    for table, key in _TRIGGER_FUNCTIONS.items():
+        op.execute(_table_trigger_function(table, key))
+    op.execute(_OSS_VOTING_FUNCTION)
+    for table, events in _TRIGGER_EVENTS.items():
+        for event in events:
+            op.execute(
+                f"CREATE TRIGGER {table}_quorum_stats_{event.lower()} AFTER {event} ON {table} "
+                f"{_REFERENCING[event]} FOR EACH STATEMENT "
+                f"EXECUTE FUNCTION premise_quorum_stats_{table}_trg()"
+            )
+    # Начальное заполнение
+    op.execute("SELECT premise_quorum_stats_refresh(ARRAY(SELECT cadastral_number::text FROM premises))")
+
+
+def downgrade() -> None:
+    for table, events in _TRIGGER_EVENTS.items():
+        for event in events:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_quorum_stats_{event.lower()} ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS premise_quorum_stats_{table}_trg()")
+    op.execute("DROP FUNCTION IF EXISTS premise_quorum_stats_refresh(text[])")
+    op.drop_table("premise_quorum_stats")
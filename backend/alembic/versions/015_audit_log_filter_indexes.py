@@ -0,0 +1,35 @@
+"""BE-03: составные индексы audit_log под фильтры списка (keyset по id DESC).
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-16
+
+GET /api/admin/audit: фильтр (entity_type | action | user_id | entity_id) + ORDER BY id DESC LIMIT —
+индекс (фильтр, id) отдаёт страницу без сортировки; before_id — граница по тому же индексу.
+Диапазон дат обслуживает существующий ix_audit_log_created_at.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "015"
+down_revision: Union[str, None] = "014"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_INDEXES = {
+    "ix_audit_log_entity_type_id": ["entity_type", "id"],
+    "ix_audit_log_action_id": ["action", "id"],
+    "ix_audit_log_user_id_id": ["user_id", "id"],
+    "ix_audit_log_entity_id_id": ["entity_id", "id"],
+}
+
+
+def upgrade() -> None:
+    for name, columns in _INDEXES.items():
+        op.create_index(name, "audit_log", columns, unique=False)
+
+
+def downgrade() -> None:
+    for name in _INDEXES:
+        op.drop_index(name, table_name="audit_log")
@@ -0,0 +1,34 @@
+"""BE-03: audit_log.contact_id — типизированная ссылка на контакт вместо разбора entity_id регуляркой.
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-16
+
+Для entity_type = 'contact' с числовым entity_id контакт был доступен только через
+entity_id ~ '^\\d+$' и CAST — индексом не обслуживается. Колонка заполняется писателями аудита,
+существующие записи — backfill. Без FK: записи аудита переживают удаление контакта (forget).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "016"
+down_revision: Union[str, None] = "015"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("audit_log", sa.Column("contact_id", sa.Integer(), nullable=True))
+    # До 9 цифр — гарантированно в диапазоне integer
+    op.execute(
+        "UPDATE audit_log SET contact_id = CAST(entity_id AS INTEGER) "
+        "WHERE entity_type = 'contact' AND entity_id ~ '^[0-9]{1,9}$'"
+    )
+    op.create_index("ix_audit_log_contact_id", "audit_log", ["contact_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_audit_log_contact_id", table_name="audit_log")
+    op.drop_column("audit_log", "contact_id")
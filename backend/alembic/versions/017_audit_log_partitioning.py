@@ -0,0 +1,124 @@
+"""BE-03: audit_log секционируется по месяцам (RANGE по created_at).
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-16
+
+Секции audit_log_pYYYY_MM (границы — начало месяца UTC) и audit_log_default на случай отсутствия
+секции. Секции создаёт audit_log_ensure_partitions(from_ts, months_ahead) — миграция, старт backend и
+команда хранения (scripts/audit_retention.py), которая выгружает старые секции в архивные файлы и удаляет их.
+Первичный ключ — (id, created_at): ключ секционирования обязан входить в уникальные ограничения;
+id по-прежнему выдаёт последовательность audit_log_id_seq.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "017"
+down_revision: Union[str, None] = "016"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_COLUMNS = "id, entity_type, entity_id, action, old_value, new_value, user_id, ip, created_at, contact_id"
+
+# Индексы 002 / 015 / 016 — на родителе, создаются в каждой секции автоматически
+_INDEXES = {
+    "ix_audit_log_entity": "entity_type, entity_id",
+    "ix_audit_log_created_at": "created_at",
+    "ix_audit_log_entity_type_id": "entity_type, id",
+    "ix_audit_log_action_id": "action, id",
+    "ix_audit_log_user_id_id": "user_id, id",
+    "ix_audit_log_entity_id_id": "entity_id, id",
+    "ix_audit_log_contact_id": "contact_id",
+}
+
+# Секции с месяца from_ts по текущий + months_ahead. Строки, попавшие в audit_log_default за этот месяц,
+# переносятся в новую секцию (иначе ATTACH не пройдёт проверку default). Advisory lock — от параллельного вызова.
+_ENSURE_FUNCTION = """
+CREATE OR REPLACE FUNCTION audit_log_ensure_partitions(from_ts timestamptz, months_ahead integer)
+RETURNS integer AS $$
+DECLARE
+    m date := date_trunc('month', LEAST(from_ts, now()) AT TIME ZONE 'UTC')::date;
+    last_month date := (date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => months_ahead))::date;
+    part text;
+    lo timestamptz;
+    hi timestamptz;
+    created integer := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('audit_log_ensure_partitions'));
+    WHILE m <= last_month LOOP
+        part := 'audit_log_p' || to_char(m, 'YYYY_MM');
+        lo := (m::timestamp AT TIME ZONE 'UTC');
+        hi := ((m + interval '1 month')::timestamp AT TIME ZONE 'UTC');
+        IF to_regclass(part) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE audit_log INCLUDING DEFAULTS)', part);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM audit_log_default WHERE created_at >= $1 AND created_at < $2 RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved', part) USING lo, hi;
+            EXECUTE format('ALTER TABLE audit_log ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', part, lo, hi);
+            created := created + 1;
+        END IF;
+        m := (m + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE audit_log RENAME TO audit_log_unpartitioned")
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY NONE")
+    op.execute(
+        "CREATE TABLE audit_log ("
+        "id integer NOT NULL DEFAULT nextval('audit_log_id_seq'::regclass), "
+        "entity_type varchar(64) NOT NULL, "
+        "entity_id varchar(128) NOT NULL, "
+        "action varchar(64) NOT NULL, "
+        "old_value text, "
+        "new_value text, "
+        "user_id varchar(128), "
+        "ip varchar(45), "
+        "created_at timestamptz NOT NULL DEFAULT now(), "
+        "contact_id integer"
+        ") PARTITION BY RANGE (created_at)"
+    )
+    op.execute("CREATE TABLE audit_log_default PARTITION OF audit_log DEFAULT")
+    op.execute(_ENSURE_FUNCTION)
+    op.execute(
+        "SELECT audit_log_ensure_partitions("
+        "COALESCE((SELECT min(created_at) FROM audit_log_unpartitioned), now()), 3)"
+    )
+    op.execute(f"INSERT INTO audit_log ({_COLUMNS}) SELECT {_COLUMNS} FROM audit_log_unpartitioned")
+    op.execute("DROP TABLE audit_log_unpartitioned")
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY audit_log.id")
+    op.execute("ALTER TABLE audit_log ADD CONSTRAINT audit_log_pkey PRIMARY KEY (id, created_at)")
+    for name, columns in _INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON audit_log ({columns})")
+
+
+def downgrade() -> None:
+    # Уже выгруженные в архив секции в таблицу не возвращаются
+    op.execute("ALTER TABLE audit_log RENAME TO audit_log_partitioned")
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY NONE")
+    op.execute(
+        "CREATE TABLE audit_log ("
+        "id integer NOT NULL DEFAULT nextval('audit_log_id_seq'::regclass), "
+        "entity_type varchar(64) NOT NULL, "
+        "entity_id varchar(128) NOT NULL, "
+        "action varchar(64) NOT NULL, "
+        "old_value text, "
+        "new_value text, "
+        "user_id varchar(128), "
+        "ip varchar(45), "
+        "created_at timestamptz NOT NULL DEFAULT now(), "
+        "contact_id integer"
+        ")"
+    )
+    op.execute(f"INSERT INTO audit_log ({_COLUMNS}) SELECT {_COLUMNS} FROM audit_log_partitioned")
+    op.execute("DROP TABLE audit_log_partitioned")
+    op.execute("DROP FUNCTION IF EXISTS audit_log_ensure_partitions(timestamptz, integer)")
+    op.execute("ALTER SEQUENCE audit_log_id_seq OWNED BY audit_log.id")
+    op.execute("ALTER TABLE audit_log ADD CONSTRAINT audit_log_pkey PRIMARY KEY (id)")
+    for name, columns in _INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON audit_log ({columns})")
@@ -0,0 +1,100 @@
+"""ADM-08: template_data_versions — версия данных шаблона контактов по подъезду.
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-16
+
+Версия подъезда растёт при любом изменении помещений, контактов или голосования в нём
+(триггеры FOR EACH STATEMENT, transition tables — как в 014). Ключ кэша шаблонов включает версию:
+после изменения подъезда закэшированный файл больше не выдаётся. Версия дома — сумма версий подъездов.
+Подъезд NULL хранится как ''.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "018"
+down_revision: Union[str, None] = "017"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Порядок строк по entrance — без взаимоблокировок между параллельными операторами
+_BUMP_FUNCTION = """
+CREATE OR REPLACE FUNCTION template_data_versions_bump(entrances text[]) RETURNS void AS $$
+BEGIN
+    IF entrances IS NULL OR cardinality(entrances) = 0 THEN
+        RETURN;
+    END IF;
+    INSERT INTO template_data_versions (entrance, version)
+    SELECT DISTINCT COALESCE(e, ''), 1 FROM unnest(entrances) AS e ORDER BY 1
+    ON CONFLICT (entrance) DO UPDATE SET version = template_data_versions.version + 1;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Подъезды затронутых строк: premises — напрямую, contacts — через помещение, oss_voting — через контакт
+_ENTRANCES_SQL = {
+    "premises": "SELECT entrance FROM {rows}",
+    "contacts": "SELECT p.entrance FROM {rows} n JOIN premises p ON p.cadastral_number = n.premise_id",
+    "oss_voting": (
+        "SELECT p.entrance FROM {rows} n JOIN contacts c ON c.id = n.contact_id "
+        "JOIN premises p ON p.cadastral_number = c.premise_id"
+    ),
+}
+
+
+def _trigger_function(table: str) -> str:
+    new_sql = _ENTRANCES_SQL[table].format(rows="new_rows")
+    old_sql = _ENTRANCES_SQL[table].format(rows="old_rows")
+    return f"""
+CREATE OR REPLACE FUNCTION template_data_versions_{table}_trg() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM template_data_versions_bump(ARRAY({new_sql}));
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM template_data_versions_bump(ARRAY({old_sql}));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+_REFERENCING = {
+    "INSERT": "REFERENCING NEW TABLE AS new_rows",
+    "UPDATE": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "DELETE": "REFERENCING OLD TABLE AS old_rows",
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "template_data_versions",
+        sa.Column("entrance", sa.String(16), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="1"),
+        sa.PrimaryKeyConstraint("entrance"),
+    )
+    op.execute(_BUMP_FUNCTION)
+    for table in _ENTRANCES_SQL:
+        op.execute(_trigger_function(table))
+        for event, referencing in _REFERENCING.items():
+            op.execute(
+                f"CREATE TRIGGER {table}_template_version_{event.lower()} AFTER {event} ON {table} "
+                f"{referencing} FOR EACH STATEMENT "
+                f"EXECUTE FUNCTION template_data_versions_{table}_trg()"
+            )
+    op.execute(
+        "INSERT INTO template_data_versions (entrance) "
+        "SELECT DISTINCT COALESCE(entrance, '') FROM premises"
+    )
+
+
+def downgrade() -> None:
+    for table in _ENTRANCES_SQL:
+        for event in _REFERENCING:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_template_version_{event.lower()} ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS template_data_versions_{table}_trg()")
+    op.execute("DROP FUNCTION IF EXISTS template_data_versions_bump(text[])")
+    op.drop_table("template_data_versions")
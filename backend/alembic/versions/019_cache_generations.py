@@ -0,0 +1,57 @@
+"""BOT-01 / CORE-03: cache_generations — поколения таблиц, закэшированных в памяти процессов backend.
+
+Revision ID: 019
+Revises: 018
+Create Date: 2026-10-16
+
+Любое изменение premise_type_aliases, premises или export_watermarks (триггер FOR EACH STATEMENT)
+увеличивает поколение таблицы и отправляет pg_notify('cache_invalidate', '<таблица>:<поколение>') —
+уведомление доставляется после коммита всем воркерам backend (app.cache_sync), каждый сбрасывает свой кэш.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "019"
+down_revision: Union[str, None] = "018"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CACHED_TABLES = ("premise_type_aliases", "premises", "export_watermarks")
+
+_BUMP_FUNCTION = """
+CREATE OR REPLACE FUNCTION cache_generations_bump() RETURNS trigger AS $$
+DECLARE
+    g bigint;
+BEGIN
+    UPDATE cache_generations SET generation = generation + 1 WHERE name = TG_TABLE_NAME
+    RETURNING generation INTO g;
+    PERFORM pg_notify('cache_invalidate', TG_TABLE_NAME || ':' || g);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "cache_generations",
+        sa.Column("name", sa.String(64), nullable=False),
+        sa.Column("generation", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.execute(_BUMP_FUNCTION)
+    for table in CACHED_TABLES:
+        op.execute(f"INSERT INTO cache_generations (name) VALUES ('{table}')")
+        op.execute(
+            f"CREATE TRIGGER {table}_cache_generation AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION cache_generations_bump()"
+        )
+
+
+def downgrade() -> None:
+    for table in CACHED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_cache_generation ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS cache_generations_bump()")
+    op.drop_table("cache_generations")
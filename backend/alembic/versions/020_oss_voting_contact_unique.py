@@ -0,0 +1,31 @@
+"""BOT-04: oss_voting — одна запись на контакт (UNIQUE contact_id) для INSERT ... ON CONFLICT.
+
+Revision ID: 020
+Revises: 019
+Create Date: 2026-10-16
+
+Все пути записи и так обновляют запись контакта, если она есть; возможные дубли (гонка SELECT/INSERT)
+удаляются — остаётся последняя (наибольший id). Уникальный индекс заменяет ix_oss_voting_contact_id.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "020"
+down_revision: Union[str, None] = "019"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "DELETE FROM oss_voting o USING oss_voting newer "
+        "WHERE newer.contact_id = o.contact_id AND newer.id > o.id"
+    )
+    op.drop_index("ix_oss_voting_contact_id", table_name="oss_voting")
+    op.create_unique_constraint("uq_oss_voting_contact_id", "oss_voting", ["contact_id"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_oss_voting_contact_id", "oss_voting", type_="unique")
+    op.create_index("ix_oss_voting_contact_id", "oss_voting", ["contact_id"], unique=False)
@@ -0,0 +1,29 @@
+"""CORE-01 / ADM-06 / CORE-05: import_jobs — владелец задачи и heartbeat.
+
+Revision ID: 021
+Revises: 020
+Create Date: 2026-10-16
+
+owner — процесс backend, захвативший задачу; locked_at — время последнего heartbeat владельца. В очередь
+возвращаются только running-задачи с истёкшим heartbeat (процесс-владелец упал), а не все подряд при старте:
+при нескольких воркерах или перекрытии старого и нового контейнера живая задача не выполняется дважды.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "021"
+down_revision: Union[str, None] = "020"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("import_jobs", sa.Column("owner", sa.String(128), nullable=True))
+    op.add_column("import_jobs", sa.Column("locked_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("import_jobs", "locked_at")
+    op.drop_column("import_jobs", "owner")
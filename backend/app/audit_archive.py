@@ -0,0 +1,185 @@
+"""
+BE-03: хранение audit_log — месячные секции и архив.
+Секции audit_log_pYYYY_MM создаёт функция БД audit_log_ensure_partitions (миграция 017) — при старте backend
+и командой хранения, с запасом AUDIT_PARTITIONS_AHEAD месяцев. Секции старше AUDIT_RETENTION_MONTHS
+выгружаются в AUDIT_ARCHIVE_DIR (JSON Lines + gzip, id по убыванию, рядом манифест) и удаляются из БД.
+Архив читается по запросу: GET /api/admin/audit/archives[/{month}]. Команда: scripts/audit_retention.py.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator
+
+from sqlalchemy import text
+
+from app.config import AUDIT_ARCHIVE_DIR, AUDIT_PARTITIONS_AHEAD, AUDIT_RETENTION_MONTHS
+from app.db import get_db
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FETCH_SIZE = 5000
+ARCHIVE_COLUMNS = (
+    "id", "entity_type", "entity_id", "action", "old_value", "new_value", "user_id", "ip", "created_at", "contact_id",
+)
+
+_MONTH_RE = re.compile(r"^(\d{4})-(0[1-9]|1[0-2])$")
+_PARTITION_RE = re.compile(r"^audit_log_p(\d{4})_(\d{2})$")
+
+
+def is_month(value: str) -> bool:
+    """Месяц в формате YYYY-MM."""
+    return bool(_MONTH_RE.match(value))
+
+
+def _partition_name(month: str) -> str:
+    return "audit_log_p" + month.replace("-", "_")
+
+
+def _shift_month(month: str, delta: int) -> str:
+    year, mon = (int(x) for x in month.split("-"))
+    n = year * 12 + mon - 1 + delta
+    return f"{n // 12:04d}-{n % 12 + 1:02d}"
+
+
+def _archive_paths(month: str) -> tuple[Path, Path]:
+    """(файл данных, манифест) архивного месяца."""
+    base = Path(AUDIT_ARCHIVE_DIR) / ("audit_log_" + month.replace("-", "_"))
+    return base.with_name(base.name + ".jsonl.gz"), base.with_name(base.name + ".json")
+
+
+def ensure_partitions(months_ahead: int = AUDIT_PARTITIONS_AHEAD) -> int:
+    """Создать секции с текущего месяца на months_ahead вперёд. Возвращает число созданных."""
+    with get_db() as db:
+        created = db.execute(
+            text("SELECT audit_log_ensure_partitions(now(), :ahead)"), {"ahead": months_ahead}
+        ).scalar()
+        db.commit()
+    return created or 0
+
+
+def list_partitions() -> list[str]:
+    """Месяцы (YYYY-MM) месячных секций audit_log по возрастанию; audit_log_default не входит."""
+    with get_db() as db:
+        names = db.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'audit_log'::regclass"
+            )
+        ).scalars().all()
+    months = []
+    for name in names:
+        m = _PARTITION_RE.match(name)
+        if m:
+            months.append(f"{m.group(1)}-{m.group(2)}")
+    return sorted(months)
+
+
+def _write_atomic(path: Path, write) -> None:
+    """Записать через временный файл с fsync и rename — при сбое на диске не остаётся обрезанного архива."""
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as raw:
+        write(raw)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+
+
+def archive_partition(month: str) -> int:
+    """
+    Выгрузить секцию месяца в архив и удалить её из БД. Возвращает число строк.
+    Одна транзакция: SHARE-блокировка секции (запись в неё ждёт), выгрузка серверным курсором, DETACH + DROP.
+    Файлы пишутся до коммита: если транзакция не прошла, секция остаётся и повторный запуск перезапишет архив.
+    """
+    if not is_month(month):
+        raise ValueError(f"Invalid month: {month}")
+    table = _partition_name(month)
+    data_path, manifest_path = _archive_paths(month)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+    stats = {"rows": 0, "min_id": None, "max_id": None}
+
+    with get_db() as db:
+        db.execute(text(f'LOCK TABLE "{table}" IN SHARE MODE'))
+        result = db.execute(
+            text(f'SELECT {", ".join(ARCHIVE_COLUMNS)} FROM "{table}" ORDER BY id DESC'),
+            execution_options={"yield_per": ARCHIVE_FETCH_SIZE},
+        )
+
+        def write_rows(raw) -> None:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+                for r in result:
+                    rec = dict(zip(ARCHIVE_COLUMNS, r))
+                    rec["created_at"] = r[8].isoformat() if r[8] else None
+                    out.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+                    stats["rows"] += 1
+                    stats["max_id"] = stats["max_id"] or r[0]
+                    stats["min_id"] = r[0]
+
+        _write_atomic(data_path, write_rows)
+        manifest = {
+            "month": month,
+            **stats,
+            "size_bytes": data_path.stat().st_size,
+            "archived_at": datetime.now(timezone.utc).isoformat(),
+        }
+        _write_atomic(manifest_path, lambda raw: raw.write(json.dumps(manifest, ensure_ascii=False).encode("utf-8")))
+        # DETACH берёт эксклюзивную блокировку audit_log: не ждать долго за длинными чтениями
+        db.execute(text("SET LOCAL lock_timeout = '5s'"))
+        db.execute(text(f'ALTER TABLE audit_log DETACH PARTITION "{table}"'))
+        db.execute(text(f'DROP TABLE "{table}"'))
+        db.commit()
+    logger.info("Audit partition %s archived: %d rows -> %s", month, stats["rows"], data_path)
+    return stats["rows"]
+
+
+def run_retention(retention_months: int = AUDIT_RETENTION_MONTHS, dry_run: bool = False) -> list[dict[str, Any]]:
+    """
+    Создать будущие секции и выгрузить в архив секции старше retention_months полных месяцев
+    (текущий месяц не считается). 0 — только создание секций. dry_run — список секций без изменений в БД.
+    """
+    if not dry_run:
+        ensure_partitions()
+    if retention_months <= 0:
+        return []
+    cutoff = _shift_month(datetime.now(timezone.utc).strftime("%Y-%m"), -retention_months)
+    done = []
+    for month in list_partitions():
+        if month >= cutoff:
+            break
+        done.append({"month": month, "rows": None if dry_run else archive_partition(month)})
+    return done
+
+
+def list_archives() -> list[dict[str, Any]]:
+    """Манифесты архивных месяцев, новые первыми."""
+    archive_dir = Path(AUDIT_ARCHIVE_DIR)
+    if not archive_dir.is_dir():
+        return []
+    archives = []
+    for path in archive_dir.glob("audit_log_*.json"):
+        try:
+            archives.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            logger.warning("Unreadable audit archive manifest %s", path)
+    return sorted(archives, key=lambda a: a.get("month", ""), reverse=True)
+
+
+def open_archive(month: str) -> Iterator[dict[str, Any]] | None:
+    """Записи архивного месяца (id по убыванию), читаются потоково. None — архива нет."""
+    if not is_month(month):
+        return None
+    data_path, _ = _archive_paths(month)
+    if not data_path.is_file():
+        return None
+    return _iter_archive(data_path)
+
+
+def _iter_archive(path: Path) -> Iterator[dict[str, Any]]:
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            rec = json.loads(line)
+            rec["created_at"] = datetime.fromisoformat(rec["created_at"]) if rec.get("created_at") else None
+            yield rec
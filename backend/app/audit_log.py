@@ -0,0 +1,319 @@
+"""
+BE-03: запись в audit_log — общий компонент для всех роутеров.
+write_audit — в транзакции вызывающего: запись аудита коммитится вместе с изменением (submit, смена статуса, бот);
+write_audit_many — то же для одного события по нескольким сущностям, одним INSERT.
+record_audit — для событий без своей транзакции (просмотр списка/контакта, раскрытие ПДн, выгрузка шаблона):
+событие ставится в буфер, фоновый поток пишет буфер multi-row INSERT по размеру (AUDIT_BATCH_SIZE) или по времени
+(AUDIT_FLUSH_INTERVAL_SECONDS). Если БД недоступна — события дописываются в файл-очередь AUDIT_SPOOL_PATH (fsync)
+и досылаются при следующей записи. Файл общий для всех процессов backend: дозапись и досылка (чтение, INSERT,
+удаление) идут под flock на <AUDIT_SPOOL_PATH>.lock. Время события фиксируется при вызове, а не при записи.
+"""
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator
+
+from sqlalchemy import text
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from app.config import AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL_SECONDS, AUDIT_SPOOL_PATH
+from app.db import get_db
+
+logger = logging.getLogger(__name__)
+
+_CONTACT_ID_RE = re.compile(r"^[0-9]{1,9}$")
+_COLUMNS = ("entity_type", "entity_id", "action", "old_value", "new_value", "user_id", "ip", "contact_id", "created_at")
+
+
+def audit_contact_id(entity_type: str, entity_id: str | None) -> int | None:
+    """audit_log.contact_id: id контакта для entity_type='contact' с числовым entity_id (списки вида "1,2" — None)."""
+    if entity_type != "contact" or not entity_id or not _CONTACT_ID_RE.match(entity_id):
+        return None
+    return int(entity_id)
+
+
+def write_audit(db, entity_type: str, entity_id: str, action: str, old_value: str | None, new_value: str | None, user_id: str | None, ip: str | None) -> None:
+    """Запись в аудит-лог в транзакции db (коммитит вызывающий)."""
+    try:
+        db.execute(
+            text(
+                "INSERT INTO audit_log (entity_type, entity_id, action, old_value, new_value, user_id, ip, contact_id) "
+                "VALUES (:et, :eid, :act, :old, :new, :uid, :ip, :cid)"
+            ),
+            {
+                "et": entity_type, "eid": entity_id, "act": action, "old": old_value, "new": new_value,
+                "uid": user_id, "ip": ip, "cid": audit_contact_id(entity_type, entity_id),
+            },
+        )
+    except Exception as e:
+        logger.warning("audit_log insert failed: %s", e)
+
+
+def write_audit_many(db, entity_type: str, entity_ids: list[str], action: str, old_value: str | None, new_value: str | None, user_id: str | None, ip: str | None) -> None:
+    """Одно и то же событие для нескольких сущностей — одним INSERT в транзакции db (коммитит вызывающий)."""
+    if not entity_ids:
+        return
+    try:
+        db.execute(
+            text(
+                "INSERT INTO audit_log (entity_type, entity_id, action, old_value, new_value, user_id, ip, contact_id) "
+                "SELECT :et, e.eid, :act, :old, :new, :uid, :ip, e.cid "
+                "FROM unnest(CAST(:eids AS text[]), CAST(:cids AS integer[])) AS e(eid, cid)"
+            ),
+            {
+                "et": entity_type, "act": action, "old": old_value, "new": new_value, "uid": user_id, "ip": ip,
+                "eids": entity_ids, "cids": [audit_contact_id(entity_type, eid) for eid in entity_ids],
+            },
+        )
+    except Exception as e:
+        logger.warning("audit_log insert failed: %s", e)
+
+
+def _insert_events(events: list[dict[str, Any]], batch_size: int) -> None:
+    """Multi-row INSERT пачками по batch_size в одной транзакции."""
+    with get_db() as db:
+        for start in range(0, len(events), batch_size):
+            params: dict[str, Any] = {}
+            tuples = []
+            for i, ev in enumerate(events[start:start + batch_size]):
+                names = []
+                for col in _COLUMNS:
+                    params[f"{col}_{i}"] = ev[col]
+                    names.append(f":{col}_{i}")
+                tuples.append("(" + ", ".join(names) + ")")
+            db.execute(
+                text(f"INSERT INTO audit_log ({', '.join(_COLUMNS)}) VALUES {', '.join(tuples)}"), params,
+            )
+        db.commit()
+
+
+class AuditWriter:
+    """Буфер событий аудита с фоновой записью пачками и файлом-очередью на случай недоступности БД."""
+
+    def __init__(self, batch_size: int, flush_interval: float, spool_path: str) -> None:
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.spool_path = Path(spool_path)
+        self._spool_lock_path = self.spool_path.with_name(self.spool_path.name + ".lock")
+        self._events: list[dict[str, Any]] = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self.written = 0
+        self.spooled = 0
+
+    def record(self, event: dict[str, Any]) -> None:
+        if self.flush_interval <= 0:
+            self._events_flush([event])
+            return
+        with self._cond:
+            self._events.append(event)
+            if self._thread is None:
+                self._start()
+            if len(self._events) >= self.batch_size:
+                self._cond.notify()
+
+    def _start(self) -> None:
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def start(self) -> None:
+        """При старте: поднять поток, если в файле-очереди остались события прошлого запуска."""
+        with self._cond:
+            if self._thread is None and self.spool_path.is_file() and self.flush_interval > 0:
+                self._start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopping or len(self._events) >= self.batch_size, timeout=self.flush_interval
+                )
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def flush(self) -> None:
+        """Записать накопленное (и файл-очередь, если он не пуст)."""
+        with self._cond:
+            events, self._events = self._events, []
+        self._events_flush(events)
+
+    @contextmanager
+    def _spool_locked(self, blocking: bool = True) -> Iterator[bool]:
+        """flock файла-очереди (между процессами и потоками); False — занят другим (blocking=False) или ошибка ФС."""
+        try:
+            self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+            lock_file = self._spool_lock_path.open("a")
+        except OSError as e:
+            logger.error("audit spool lock failed: %s", e)
+            yield False
+            return
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _events_flush(self, events: list[dict[str, Any]]) -> None:
+        with self._flush_lock:
+            if self.spool_path.is_file():
+                with self._spool_locked(blocking=False) as locked:
+                    if locked:
+                        # Файл читается, пишется и заменяется остатком под одной блокировкой: события, дописанные
+                        # другим процессом, не удаляются непрочитанными. Занят — досылает другой процесс
+                        left = self._insert(self._read_spool() + events)
+                        # Остаток — хвост (файл + events): новых событий в нём не больше len(events)
+                        new_left = min(len(left), len(events))
+                        if self._replace_spool(left):
+                            self.spooled += new_left
+                        elif new_left:
+                            logger.error("audit spool rewrite failed, %d events lost", new_left)
+                        return
+            left = self._insert(events)
+            if left:
+                self._append_spool(left)
+
+    def _insert(self, pending: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Записать события; вернуть незаписанные из-за недоступности БД — они остаются в очереди.
+        События, отвергнутые по данным, отбрасываются (в лог). written — только записанные.
+        """
+        if not pending:
+            return []
+        try:
+            _insert_events(pending, self.batch_size)
+        except (OperationalError, InterfaceError) as e:
+            logger.warning("audit_log batch insert failed, %d events left in spool: %s", len(pending), e)
+            return pending
+        except Exception as e:
+            # БД доступна, но пачка отвергнута (ошибка данных) — по одному, чтобы не терять соседние события
+            logger.warning("audit_log batch insert rejected, retrying per event: %s", e)
+            for i, ev in enumerate(pending):
+                try:
+                    _insert_events([ev], 1)
+                except (OperationalError, InterfaceError) as ev_error:
+                    # БД пропала посреди повтора — это и оставшиеся события в очередь
+                    logger.warning("audit_log insert failed, %d events left in spool: %s", len(pending) - i, ev_error)
+                    return pending[i:]
+                except Exception as ev_error:
+                    logger.error("audit_log event dropped %s: %s", json.dumps(ev, ensure_ascii=False), ev_error)
+                else:
+                    self.written += 1
+            return []
+        self.written += len(pending)
+        return []
+
+    def _read_spool(self) -> list[dict[str, Any]]:
+        events = []
+        try:
+            with self.spool_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        # Строка, недописанная при аварийной остановке
+                        logger.error("audit spool: unreadable line skipped: %r", line[:200])
+        except FileNotFoundError:
+            pass
+        return events
+
+    def _append_spool(self, events: list[dict[str, Any]]) -> None:
+        with self._spool_locked():
+            try:
+                self._write_lines(self.spool_path, "a", events)
+            except OSError as e:
+                logger.error("audit spool write failed, %d events lost: %s", len(events), e)
+                return
+        self.spooled += len(events)
+
+    def _replace_spool(self, events: list[dict[str, Any]]) -> bool:
+        """Заменить файл-очередь событиями events (пусто — удалить); вызывается под _spool_locked."""
+        try:
+            if not events:
+                self.spool_path.unlink(missing_ok=True)
+                return True
+            tmp = self.spool_path.with_name(self.spool_path.name + ".tmp")
+            self._write_lines(tmp, "w", events)
+            os.replace(tmp, self.spool_path)
+        except OSError as e:
+            # Прежний файл остаётся как есть: уже записанные из него события будут досланы повторно
+            logger.error("audit spool rewrite failed: %s", e)
+            return False
+        return True
+
+    @staticmethod
+    def _write_lines(path: Path, mode: str, events: list[dict[str, Any]]) -> None:
+        with path.open(mode, encoding="utf-8") as f:
+            for ev in events:
+                f.write(json.dumps(ev, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def stop(self) -> None:
+        """Остановка backend: дописать буфер и дождаться потока."""
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout=10)
+        self.flush()
+        with self._cond:
+            self._thread = None
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            buffered = len(self._events)
+        return {
+            "buffered": buffered,
+            "written": self.written,
+            "spooled": self.spooled,
+            "spool_pending": self.spool_path.is_file(),
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+        }
+
+
+_writer = AuditWriter(AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL_SECONDS, AUDIT_SPOOL_PATH)
+
+
+def record_audit(entity_type: str, entity_id: str, action: str, old_value: str | None, new_value: str | None, user_id: str | None, ip: str | None) -> None:
+    """Событие аудита вне транзакции вызывающего: в буфер, запись в фоне."""
+    _writer.record({
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "action": action,
+        "old_value": old_value,
+        "new_value": new_value,
+        "user_id": user_id,
+        "ip": ip,
+        "contact_id": audit_contact_id(entity_type, entity_id),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    })
+
+
+def start_audit_writer() -> None:
+    _writer.start()
+
+
+def stop_audit_writer() -> None:
+    _writer.stop()
+
+
+def audit_writer_stats() -> dict[str, Any]:
+    return _writer.stats()
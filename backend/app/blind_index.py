@@ -0,0 +1,104 @@
+"""
+BE-02: Blind Index для поиска по ПДн (SR-BE02-008) — HMAC-SHA256(pepper, нормализованное значение) -> hex.
+HMAC ключуется pepper один раз при загрузке модуля; каждый индекс — hmac.copy() и update значения
+(без повторного кодирования pepper и расчёта ipad/opad). Без pepper индексы не создаются.
+"""
+import hashlib
+import hmac
+import re
+from functools import lru_cache
+from typing import Callable, Iterable
+
+from app.config import BLIND_INDEX_PEPPER, BLIND_INDEX_TG_CACHE_SIZE
+
+_BASE_MAC: hmac.HMAC | None = (
+    hmac.new(BLIND_INDEX_PEPPER.encode("utf-8"), digestmod=hashlib.sha256) if BLIND_INDEX_PEPPER else None
+)
+_NON_DIGITS = re.compile(r"\D")
+
+
+def _normalize_phone(value: str | None) -> str:
+    """Только цифры, лидирующая 8 -> 7."""
+    if not value:
+        return ""
+    digits = _NON_DIGITS.sub("", value)
+    if digits.startswith("8") and len(digits) >= 11:
+        digits = "7" + digits[1:]
+    elif len(digits) == 10:
+        digits = "7" + digits
+    return digits[:11] or ""
+
+
+def _normalize_email(value: str | None) -> str:
+    """Нижний регистр, без пробелов."""
+    if not value:
+        return ""
+    return value.lower().strip().replace(" ", "")
+
+
+def _normalize_telegram_id(value: str | None) -> str:
+    """Строковый формат."""
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+_NORMALIZERS: dict[str, Callable[[str | None], str]] = {
+    "phone": _normalize_phone,
+    "email": _normalize_email,
+    "telegram_id": _normalize_telegram_id,
+}
+
+
+def _digest(normalized: str) -> str:
+    mac = _BASE_MAC.copy()
+    mac.update(normalized.encode("utf-8"))
+    return mac.hexdigest()
+
+
+def blind_index(kind: str, value: str | None) -> str | None:
+    """Индекс одного значения; kind — phone | email | telegram_id. Пустое после нормализации — None."""
+    if _BASE_MAC is None:
+        return None
+    n = _NORMALIZERS[kind](value)
+    return _digest(n) if n else None
+
+
+def blind_index_many(kind: str, values: Iterable[str | None]) -> list[str | None]:
+    """Индексы пачки значений (импорт) в порядке входа; HMAC-копия и нормализатор связаны один раз на пачку."""
+    normalize = _NORMALIZERS[kind]
+    if _BASE_MAC is None:
+        return [None for _ in values]
+    copy = _BASE_MAC.copy
+    out: list[str | None] = []
+    for v in values:
+        n = normalize(v)
+        if n:
+            mac = copy()
+            mac.update(n.encode("utf-8"))
+            out.append(mac.hexdigest())
+        else:
+            out.append(None)
+    return out
+
+
+def blind_index_phone(value: str | None) -> str | None:
+    """HMAC-SHA256(pepper, normalized_phone) -> hex. Без pepper — не создавать индекс."""
+    return blind_index("phone", value)
+
+
+def blind_index_email(value: str | None) -> str | None:
+    return blind_index("email", value)
+
+
+@lru_cache(maxsize=BLIND_INDEX_TG_CACHE_SIZE)
+def _telegram_id_digest(normalized: str) -> str:
+    """LRU по нормализованному telegram_id: бот считает индекс одних и тех же пользователей на каждом /api/bot/*."""
+    return _digest(normalized)
+
+
+def blind_index_telegram_id(value: str | None) -> str | None:
+    if _BASE_MAC is None:
+        return None
+    n = _normalize_telegram_id(value)
+    return _telegram_id_digest(n) if n else None
@@ -2,20 +2,35 @@
 BOT-01: Resolve premise from free-text user input.
 Loads synonym table (premise_type_aliases) from DB, normalizes input,
 parses type+number, fuzzy-matches via rapidfuzz, logs unrecognized.
+Premises are matched against an in-memory index (PremiseIndex), loaded once and
+dropped after every import job; resolve() itself makes no DB round-trip.
+Both caches are dropped in every worker when the tables change (app.cache_sync).
 """
 import logging
 import re
+import threading
+from collections import defaultdict
 from typing import Any
 
 from sqlalchemy import text as sa_text
 
+from app.cache_sync import on_invalidate
 from app.db import get_db
 from app.room_normalizer import normalize_room_number
 
 logger = logging.getLogger(__name__)
 
-_aliases_cache: dict[str, tuple[str, str]] | None = None
-_short_names_cache: dict[str, str] | None = None
+# (alias -> (type, short), type -> short): один кортеж — читатель не увидит половину перезагрузки
+_aliases_cache: tuple[dict[str, tuple[str, str]], dict[str, str]] | None = None
+_aliases_lock = threading.Lock()
+_aliases_generation = 0
+_premise_index: "PremiseIndex | None" = None
+_premise_index_lock = threading.Lock()
+_premise_index_load_lock = threading.Lock()
+_premise_index_generation = 0
+
+FUZZY_SCORE_CUTOFF = 55
+MAX_RESULTS = 5
 
 CADASTRAL_RE = re.compile(r"\d{2}:\d{2}:\d{6,7}:\d+")
 TYPE_NUMBER_RE = re.compile(r"^([а-яёa-z/.()-]+)\s*[.:,]?\s*(.+)$", re.IGNORECASE)
@@ -30,9 +45,12 @@ def _norm_strip_leading_zeros(s: str) -> str:
 
 def _load_aliases() -> tuple[dict[str, tuple[str, str]], dict[str, str]]:
     """Load premise_type_aliases from DB. Returns (alias->type+short, type->short)."""
-    global _aliases_cache, _short_names_cache
-    if _aliases_cache is not None and _short_names_cache is not None:
-        return _aliases_cache, _short_names_cache
+    global _aliases_cache
+    with _aliases_lock:
+        cached = _aliases_cache
+        generation = _aliases_generation
+    if cached is not None:
+        return cached
     alias_map: dict[str, tuple[str, str]] = {}
     short_map: dict[str, str] = {}
     with get_db() as db:
@@ -42,19 +60,131 @@ def _load_aliases() -> tuple[dict[str, tuple[str, str]], dict[str, str]]:
     for pt, sn, alias in rows:
         alias_map[alias.lower().strip()] = (pt, sn)
         short_map[pt] = sn
-    _aliases_cache = alias_map
-    _short_names_cache = short_map
+    with _aliases_lock:
+        # Dropped while loading: the rows may predate the change, so they are returned but not cached
+        if generation == _aliases_generation:
+            _aliases_cache = (alias_map, short_map)
     return alias_map, short_map
 
 
+def _drop_aliases() -> None:
+    global _aliases_cache, _aliases_generation
+    with _aliases_lock:
+        _aliases_generation += 1
+        _aliases_cache = None
+
+
+def get_short_names() -> dict[str, str]:
+    """premises_type -> short name (cached with the aliases)."""
+    return _load_aliases()[1]
+
+
 def reload_aliases() -> None:
-    """Force reload of aliases cache (after admin edits)."""
-    global _aliases_cache, _short_names_cache
-    _aliases_cache = None
-    _short_names_cache = None
+    """Force reload of aliases cache (after admin edits). Other workers drop theirs via cache_sync."""
+    _drop_aliases()
     _load_aliases()
 
 
+PremiseRow = tuple[str, str, str]  # (cadastral_number, premises_type, premises_number)
+
+
+class PremiseIndex:
+    """
+    All premises keyed the way resolve() looks them up. Lists keep cadastral_number order.
+    - by_cadastral: cadastral_number -> row
+    - by_number / by_number_lower: premises_number (as stored / lowercased) -> rows, also per type
+    - by_norm: normalize_room_number(premises_number) without leading zeros -> rows, also per type
+    - choices: "type number" lowercased, aligned with rows, for rapidfuzz.process.extract
+    """
+
+    def __init__(self, rows: list[PremiseRow]) -> None:
+        self.rows = rows
+        self.by_cadastral: dict[str, PremiseRow] = {}
+        self.by_number: dict[str, list[PremiseRow]] = defaultdict(list)
+        self.by_type_number: dict[tuple[str, str], list[PremiseRow]] = defaultdict(list)
+        self.by_number_lower: dict[str, list[PremiseRow]] = defaultdict(list)
+        self.by_type_number_lower: dict[tuple[str, str], list[PremiseRow]] = defaultdict(list)
+        self.by_norm: dict[str, list[PremiseRow]] = defaultdict(list)
+        self.by_type_norm: dict[tuple[str, str], list[PremiseRow]] = defaultdict(list)
+        self.choices: list[str] = []
+        for row in rows:
+            cn, pt, pn = row
+            pn_lower = pn.lower()
+            norm = _norm_strip_leading_zeros(normalize_room_number(pn))
+            self.by_cadastral[cn] = row
+            self.by_number[pn].append(row)
+            self.by_type_number[(pt, pn)].append(row)
+            self.by_number_lower[pn_lower].append(row)
+            self.by_type_number_lower[(pt, pn_lower)].append(row)
+            self.by_norm[norm].append(row)
+            self.by_type_norm[(pt, norm)].append(row)
+            self.choices.append(f"{pt} {pn}".lower())
+
+    @classmethod
+    def load(cls) -> "PremiseIndex":
+        with get_db() as db:
+            rows = db.execute(
+                sa_text(
+                    "SELECT cadastral_number, premises_type, premises_number FROM premises "
+                    "ORDER BY cadastral_number"
+                )
+            ).fetchall()
+        return cls([(cn, pt or "", pn or "") for cn, pt, pn in rows])
+
+    def exact(self, premises_type: str | None, number: str, number_raw: str) -> list[PremiseRow]:
+        """premises_number equal to the normalized number, else equal ignoring case to the raw one."""
+        if premises_type:
+            return self.by_type_number.get((premises_type, number)) or self.by_type_number_lower.get(
+                (premises_type, number_raw.lower()), []
+            )
+        return self.by_number.get(number) or self.by_number_lower.get(number_raw.lower(), [])
+
+    def normalized(self, premises_type: str | None, number: str) -> list[PremiseRow]:
+        """Same normalized number without leading zeros (Cyrillic vs Latin letter, 05b vs 5b)."""
+        key = _norm_strip_leading_zeros(number)
+        if premises_type:
+            return self.by_type_norm.get((premises_type, key), [])
+        return self.by_norm.get(key, [])
+
+    def fuzzy(self, query: str, limit: int = MAX_RESULTS) -> list[tuple[float, PremiseRow]]:
+        """Best fuzz.ratio matches of "type number" at or above FUZZY_SCORE_CUTOFF, one vectorised pass."""
+        from rapidfuzz import fuzz, process
+        found = process.extract(query, self.choices, scorer=fuzz.ratio, score_cutoff=FUZZY_SCORE_CUTOFF, limit=limit)
+        return [(score, self.rows[i]) for _choice, score, i in found]
+
+
+def get_premise_index() -> PremiseIndex:
+    """Premise index, loaded on first use (one load at a time)."""
+    global _premise_index
+    index = _premise_index
+    if index is not None:
+        return index
+    with _premise_index_load_lock:
+        with _premise_index_lock:
+            index = _premise_index
+            generation = _premise_index_generation
+        if index is not None:
+            return index
+        index = PremiseIndex.load()
+        with _premise_index_lock:
+            # Invalidated while loading: the rows may predate the change, so the index is used once but not cached
+            if generation == _premise_index_generation:
+                _premise_index = index
+    return index
+
+
+def invalidate_premise_index() -> None:
+    """Drop the index after premises change (import job, or any worker via cache_sync); the next resolve reloads it."""
+    global _premise_index, _premise_index_generation
+    with _premise_index_lock:
+        _premise_index_generation += 1
+        _premise_index = None
+
+
+on_invalidate("premise_type_aliases", _drop_aliases)
+on_invalidate("premises", invalidate_premise_index)
+
+
 def _normalize_input(raw: str) -> str:
     s = raw.strip().lower()
     s = s.replace("ё", "е")
@@ -69,6 +199,76 @@ def _make_display(premises_type: str, premises_number: str, short_names: dict[st
     return display, short_display
 
 
+def triage(inputs: list[str], top: int = 3, min_score: float = 60) -> list[dict[str, Any]]:
+    """
+    Batch triage of unrecognized inputs: all inputs against all premises in one rapidfuzz cdist call,
+    and all unknown type words against all aliases and premise types in another.
+    Per input: up to `top` candidate premises (score >= min_score, best first) and, when the type word
+    is not a known alias but is close to one, a suggested new alias for that premise type.
+    """
+    import numpy as np
+    from rapidfuzz import fuzz, process
+
+    alias_map, short_names = _load_aliases()
+    index = get_premise_index()
+    normalized = [_normalize_input(t) for t in inputs]
+    results: list[dict[str, Any]] = [{"candidates": [], "suggested_alias": None} for _ in inputs]
+
+    if normalized and index.choices:
+        scores = process.cdist(
+            normalized, index.choices, scorer=fuzz.ratio, score_cutoff=min_score, dtype=np.uint8, workers=-1,
+        )
+        k = min(top, len(index.choices))
+        best = np.argpartition(-scores.astype(np.int16), k - 1, axis=1)[:, :k]
+        for i, cols in enumerate(best):
+            ranked = sorted(((int(scores[i, j]), int(j)) for j in cols if scores[i, j] > 0), key=lambda x: (-x[0], x[1]))
+            results[i]["candidates"] = [
+                {**_match(index.rows[j], short_names, round(score / 100, 2)), "score": score} for score, j in ranked
+            ]
+
+    # Type words resolve() did not recognise (neither an alias nor a prefix of one)
+    unknown: list[tuple[int, str, str]] = []
+    for i, text in enumerate(normalized):
+        m = TYPE_NUMBER_RE.match(text)
+        if not m:
+            continue
+        type_word = m.group(1).strip().rstrip(".")
+        if not type_word or type_word in alias_map or any(
+            type_word.startswith(a) or a.startswith(type_word) for a in alias_map
+        ):
+            continue
+        unknown.append((i, type_word, m.group(2).strip()))
+    targets = {alias: pt for alias, (pt, _sn) in alias_map.items()}
+    for pt in short_names:
+        targets.setdefault(_normalize_input(pt), pt)
+    if unknown and targets:
+        target_words = list(targets)
+        scores = process.cdist(
+            [w for _, w, _ in unknown], target_words, scorer=fuzz.ratio, score_cutoff=min_score,
+            dtype=np.uint8, workers=-1,
+        )
+        for (i, type_word, number_raw), row in zip(unknown, scores):
+            j = int(row.argmax())
+            if row[j] == 0:
+                continue
+            pt = targets[target_words[j]]
+            number = normalize_room_number(number_raw) or number_raw
+            results[i]["suggested_alias"] = {
+                "alias": type_word,
+                "premises_type": pt,
+                "short_name": short_names.get(pt, pt),
+                "similar_to": target_words[j],
+                "score": int(row[j]),
+                "number_found": bool(index.exact(pt, number, number_raw) or index.normalized(pt, number)),
+            }
+    return results
+
+
+def _match(row: PremiseRow, short_names: dict[str, str], confidence: float) -> dict[str, Any]:
+    d, sd = _make_display(row[1], row[2], short_names)
+    return {"premise_id": row[0], "display": d, "short_display": sd, "confidence": confidence}
+
+
 def _log_unrecognized(input_text: str, telegram_id_idx: str | None) -> None:
     try:
         with get_db() as db:
@@ -90,16 +290,13 @@ def resolve(raw_text: str, telegram_id_idx: str | None = None) -> list[dict[str,
         return []
 
     alias_map, short_names = _load_aliases()
+    index = get_premise_index()
     normalized = _normalize_input(raw_text)
 
     if CADASTRAL_RE.fullmatch(normalized):
-        with get_db() as db:
-            row = db.execute(
-                sa_text("SELECT cadastral_number, premises_type, premises_number FROM premises WHERE cadastral_number = :cn"),
-                {"cn": normalized},
-            ).fetchone()
+        row = index.by_cadastral.get(normalized)
         if row:
-            d, sd = _make_display(row[1] or "", row[2] or "", short_names)
+            d, sd = _make_display(row[1], row[2], short_names)
             return [{"premise_id": row[0], "display": d, "short_display": sd, "confidence": 1.0}]
         _log_unrecognized(raw_text, telegram_id_idx)
         return []
@@ -130,104 +327,21 @@ def resolve(raw_text: str, telegram_id_idx: str | None = None) -> list[dict[str,
 
     norm_number = normalize_room_number(number_part) or number_part
 
-    with get_db() as db:
-        if resolved_type:
-            rows = db.execute(
-                sa_text(
-                    "SELECT cadastral_number, premises_type, premises_number FROM premises "
-                    "WHERE premises_type = :pt AND premises_number = :pn"
-                ),
-                {"pt": resolved_type, "pn": norm_number},
-            ).fetchall()
-            if not rows:
-                rows = db.execute(
-                    sa_text(
-                        "SELECT cadastral_number, premises_type, premises_number FROM premises "
-                        "WHERE premises_type = :pt AND LOWER(premises_number) = LOWER(:pn)"
-                    ),
-                    {"pt": resolved_type, "pn": number_part},
-                ).fetchall()
-        else:
-            rows = db.execute(
-                sa_text(
-                    "SELECT cadastral_number, premises_type, premises_number FROM premises "
-                    "WHERE premises_number = :pn"
-                ),
-                {"pn": norm_number},
-            ).fetchall()
-            if not rows:
-                rows = db.execute(
-                    sa_text(
-                        "SELECT cadastral_number, premises_type, premises_number FROM premises "
-                        "WHERE LOWER(premises_number) = LOWER(:pn)"
-                    ),
-                    {"pn": number_part},
-                ).fetchall()
-
+    rows = index.exact(resolved_type, norm_number, number_part)
     if rows:
-        results = []
-        for r in rows[:5]:
-            d, sd = _make_display(r[1] or "", r[2] or "", short_names)
-            conf = 1.0 if resolved_type else 0.9
-            results.append({"premise_id": r[0], "display": d, "short_display": sd, "confidence": conf})
-        return results
+        conf = 1.0 if resolved_type else 0.9
+        return [_match(r, short_names, conf) for r in rows[:MAX_RESULTS]]
 
     # Fallback (variant A): compare by normalized number when exact/LOWER failed (e.g. Cyrillic vs Latin in DB)
-    with get_db() as db:
-        if resolved_type:
-            candidates = db.execute(
-                sa_text(
-                    "SELECT cadastral_number, premises_type, premises_number FROM premises WHERE premises_type = :pt"
-                ),
-                {"pt": resolved_type},
-            ).fetchall()
-        else:
-            candidates = db.execute(
-                sa_text("SELECT cadastral_number, premises_type, premises_number FROM premises")
-            ).fetchall()
-    def _number_matches(db_pn: str, user_norm: str) -> bool:
-        n = normalize_room_number(db_pn or "")
-        if n == user_norm:
-            return True
-        # 05Б vs 5Б in DB: compare without leading zeros
-        if _norm_strip_leading_zeros(n) == _norm_strip_leading_zeros(user_norm):
-            return True
-        return False
-
-    matches = [
-        (cn, pt, pn)
-        for cn, pt, pn in candidates
-        if _number_matches(pn or "", norm_number)
-    ]
+    matches = index.normalized(resolved_type, norm_number)
     if matches:
-        results = []
-        for cn, pt, pn in matches[:5]:
-            d, sd = _make_display(pt or "", pn or "", short_names)
-            conf = 0.95 if resolved_type else 0.9
-            results.append({"premise_id": cn, "display": d, "short_display": sd, "confidence": conf})
-        return results
+        conf = 0.95 if resolved_type else 0.9
+        return [_match(r, short_names, conf) for r in matches[:MAX_RESULTS]]
 
     try:
-        from rapidfuzz import fuzz
-        all_premises: list[tuple[str, str, str]] = []
-        with get_db() as db:
-            all_premises = db.execute(
-                sa_text("SELECT cadastral_number, premises_type, premises_number FROM premises")
-            ).fetchall()
-
-        candidates = []
-        for cn, pt, pn in all_premises:
-            target = f"{pt} {pn}".lower()
-            score = fuzz.ratio(normalized, target)
-            if score >= 55:
-                candidates.append((score, cn, pt, pn))
-        candidates.sort(key=lambda x: -x[0])
+        candidates = index.fuzzy(normalized)
         if candidates:
-            results = []
-            for score, cn, pt, pn in candidates[:5]:
-                d, sd = _make_display(pt or "", pn or "", short_names)
-                results.append({"premise_id": cn, "display": d, "short_display": sd, "confidence": round(score / 100, 2)})
-            return results
+            return [_match(r, short_names, round(score / 100, 2)) for score, r in candidates]
     except ImportError:
         logger.warning("rapidfuzz not installed, fuzzy search disabled")
 
@@ -0,0 +1,110 @@
+"""
+BOT-01 / CORE-03: согласование кэшей в памяти между процессами (воркерами) backend.
+Триггеры БД (миграция 019) при изменении premise_type_aliases, premises, export_watermarks увеличивают поколение
+таблицы в cache_generations и шлют pg_notify('cache_invalidate', '<таблица>:<поколение>'). Фоновый поток каждого
+процесса слушает канал на отдельном соединении и вызывает обработчики, подписанные на таблицу (on_invalidate), —
+кэш сбрасывается во всех воркерах, а не только в том, что выполнил изменение. Раз в CACHE_SYNC_POLL_SECONDS
+и после переподключения поколения сверяются с таблицей: пропущенное уведомление не оставляет кэш устаревшим.
+"""
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from typing import Callable
+
+from app.config import CACHE_SYNC_POLL_SECONDS
+from app.db import engine
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidate"
+_RECONNECT_DELAY_SECONDS = 5.0
+
+_handlers: dict[str, list[Callable[[], None]]] = defaultdict(list)
+_generations: dict[str, int] = {}
+_lock = threading.Lock()
+_thread: threading.Thread | None = None
+_stop = threading.Event()
+
+
+def on_invalidate(table: str, handler: Callable[[], None]) -> None:
+    """Вызывать handler (без аргументов, быстро — из фонового потока) при изменении таблицы в любом процессе."""
+    with _lock:
+        _handlers[table].append(handler)
+
+
+def _apply(table: str, generation: int) -> None:
+    """Новое поколение таблицы: вызвать обработчики, если оно отличается от известного процессу."""
+    with _lock:
+        known = _generations.get(table)
+        if known is not None and generation <= known:
+            return
+        _generations[table] = generation
+        handlers = list(_handlers.get(table, ()))
+    for handler in handlers:
+        try:
+            handler()
+        except Exception:
+            logger.exception("Cache invalidation handler for %s failed", table)
+
+
+def _sync_generations(cursor) -> None:
+    cursor.execute("SELECT name, generation FROM cache_generations")
+    for name, generation in cursor.fetchall():
+        _apply(name, generation)
+
+
+def _listen_once() -> None:
+    """Одно соединение: LISTEN, сверка поколений, затем разбор уведомлений до ошибки или остановки."""
+    raw = engine.raw_connection()
+    # Соединение держится всё время работы — вне пула
+    raw.detach()
+    conn = raw.driver_connection
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+            _sync_generations(cursor)
+            next_poll = time.monotonic() + CACHE_SYNC_POLL_SECONDS
+            while not _stop.is_set():
+                if select.select([conn], [], [], 1.0)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        table, _, generation = conn.notifies.pop(0).payload.rpartition(":")
+                        try:
+                            _apply(table, int(generation))
+                        except ValueError:
+                            logger.warning("Unexpected %s payload: %s", CHANNEL, generation)
+                if time.monotonic() >= next_poll:
+                    _sync_generations(cursor)
+                    next_poll = time.monotonic() + CACHE_SYNC_POLL_SECONDS
+    finally:
+        conn.close()
+
+
+def _run() -> None:
+    while not _stop.is_set():
+        try:
+            _listen_once()
+        except Exception as e:
+            logger.warning("Cache sync listener failed, reconnecting in %.0fs: %s", _RECONNECT_DELAY_SECONDS, e)
+            _stop.wait(_RECONNECT_DELAY_SECONDS)
+
+
+def start_cache_sync() -> None:
+    """При старте процесса: поток-слушатель (только PostgreSQL; CACHE_SYNC_POLL_SECONDS <= 0 — выключено)."""
+    global _thread
+    if engine.dialect.name != "postgresql" or CACHE_SYNC_POLL_SECONDS <= 0 or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="cache-sync", daemon=True)
+    _thread.start()
+
+
+def stop_cache_sync() -> None:
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=5)
+        _thread = None
@@ -2,16 +2,25 @@
 BE-02: Шифрование ПДн (phone, email, telegram_id, как обращаться).
 Ключ только из файла (SR-BE02-005, SR-BE02-006). Blind Index для поиска (SR-BE02-008).
 """
-import hashlib
-import hmac
-import re
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator
 
 from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
-from app.config import BLIND_INDEX_PEPPER, MASTER_KEY_PATH
+# Blind Index (SR-BE02-008) реализован в app.blind_index; реэкспорт — прежние точки импорта
+from app.blind_index import (  # noqa: F401
+    blind_index_email,
+    blind_index_many,
+    blind_index_phone,
+    blind_index_telegram_id,
+)
+from app.config import CRYPTO_WORKERS, MASTER_KEY_PATH
 
 # Путь к ключу: Docker Secrets или bind mount (SR-BE02-005)
 _KEY_PATH = Path(MASTER_KEY_PATH)
@@ -67,69 +76,78 @@ def decrypt(cipher: str | None) -> str | None:
         return None
 
 
-# --- Blind Index (SR-BE02-008) ---
+# --- Пакетное шифрование (BE-02) ---
+# Fernet (AES-CBC + HMAC) в cryptography выполняется в нативном коде без GIL — пачка делится между потоками.
+# Мелкие пачки шифруются на месте: накладные расходы пула для них больше выигрыша.
+_PARALLEL_MIN_BATCH = 256
+_crypto_pool: ThreadPoolExecutor | None = None
+_crypto_pool_lock = threading.Lock()
 
-def _normalize_phone(value: str | None) -> str:
-    """Только цифры, лидирующая 8 -> 7."""
-    if not value:
-        return ""
-    digits = re.sub(r"\D", "", value)
-    if digits.startswith("8") and len(digits) >= 11:
-        digits = "7" + digits[1:]
-    elif len(digits) == 10:
-        digits = "7" + digits
-    return digits[:11] or ""
 
+def _crypto_workers() -> int:
+    return CRYPTO_WORKERS if CRYPTO_WORKERS > 0 else (os.cpu_count() or 1)
 
-def _normalize_email(value: str | None) -> str:
-    """Нижний регистр, без пробелов."""
-    if not value:
-        return ""
-    return value.lower().strip().replace(" ", "")
 
+def _get_crypto_pool() -> ThreadPoolExecutor:
+    global _crypto_pool
+    with _crypto_pool_lock:
+        if _crypto_pool is None:
+            _crypto_pool = ThreadPoolExecutor(max_workers=_crypto_workers(), thread_name_prefix="crypto")
+        return _crypto_pool
 
-def _normalize_telegram_id(value: str | None) -> str:
-    """Строковый формат."""
-    if value is None:
-        return ""
-    return str(value).strip()
 
+def _map_batch(fn: Callable[[str | None], str | None], values: Iterable[str | None]) -> list[str | None]:
+    """Применить fn к пачке с сохранением порядка; большие пачки — по одному куску на поток."""
+    items = list(values)
+    workers = _crypto_workers()
+    if len(items) < _PARALLEL_MIN_BATCH or workers < 2:
+        return [fn(v) for v in items]
+    get_fernet()  # инициализация ключа до запуска потоков
+    size = -(-len(items) // workers)
+    parts = [items[i:i + size] for i in range(0, len(items), size)]
+    result: list[str | None] = []
+    for part in _get_crypto_pool().map(lambda chunk: [fn(v) for v in chunk], parts):
+        result.extend(part)
+    return result
 
-def blind_index_phone(value: str | None) -> str | None:
-    """HMAC-SHA256(pepper, normalized_phone) -> hex. Без pepper — не создавать индекс."""
-    if not BLIND_INDEX_PEPPER:
-        return None
-    n = _normalize_phone(value)
-    if not n:
-        return None
-    return hmac.new(
-        BLIND_INDEX_PEPPER.encode("utf-8"),
-        n.encode("utf-8"),
-        hashlib.sha256,
-    ).hexdigest()
 
+def encrypt_many(values: Iterable[str | None]) -> list[str | None]:
+    """Пакетный encrypt: результат в порядке входа, семантика пустых значений та же."""
+    return _map_batch(encrypt, values)
 
-def blind_index_email(value: str | None) -> str | None:
-    if not BLIND_INDEX_PEPPER:
-        return None
-    n = _normalize_email(value)
-    if not n:
-        return None
-    return hmac.new(
-        BLIND_INDEX_PEPPER.encode("utf-8"),
-        n.encode("utf-8"),
-        hashlib.sha256,
-    ).hexdigest()
 
+def decrypt_many(values: Iterable[str | None]) -> list[str | None]:
+    """Пакетный decrypt: результат в порядке входа, битые значения — None (AF-2)."""
+    return _map_batch(decrypt, values)
 
-def blind_index_telegram_id(value: str | None) -> str | None:
-    if not BLIND_INDEX_PEPPER:
-        return None
-    n = _normalize_telegram_id(value)
-    if not n:
+
+# --- Файлы с ПДн на диске (BE-02): кэш шаблонов, загрузки импорта ---
+# Формат: последовательность токенов Fernet, перед каждым — длина (4 байта, big-endian). Запись и чтение потоковые.
+STREAM_CHUNK_BYTES = 1024 * 1024
+_TOKEN_LEN = struct.Struct(">I")
+
+
+def write_encrypted_chunk(out: BinaryIO, data: bytes) -> None:
+    token = get_fernet().encrypt(data)
+    out.write(_TOKEN_LEN.pack(len(token)) + token)
+
+
+def read_encrypted_chunk(f: BinaryIO) -> bytes | None:
+    """Следующая расшифрованная часть; None — конец файла. Битый файл — InvalidToken / ValueError."""
+    head = f.read(_TOKEN_LEN.size)
+    if not head:
         return None
-    return hmac.new(
-        BLIND_INDEX_PEPPER.encode("utf-8"),
-        n.encode("utf-8"),
-        hashlib.sha256,
-    ).hexdigest()
+    if len(head) < _TOKEN_LEN.size:
+        raise ValueError("truncated encrypted file")
+    return get_fernet().decrypt(f.read(_TOKEN_LEN.unpack(head)[0]))
+
+
+def encrypt_stream(src: BinaryIO, out: BinaryIO, chunk_bytes: int = STREAM_CHUNK_BYTES) -> None:
+    """Зашифровать src (с текущей позиции до конца) частями по chunk_bytes."""
+    while chunk := src.read(chunk_bytes):
+        write_encrypted_chunk(out, chunk)
+
+
+def iter_decrypted_chunks(f: BinaryIO) -> Iterator[bytes]:
+    while (chunk := read_encrypted_chunk(f)) is not None:
+        yield chunk
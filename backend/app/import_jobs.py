@@ -0,0 +1,344 @@
+"""
+CORE-01 / ADM-06 / CORE-05: фоновые задачи импорта.
+Загрузка сохраняется в IMPORT_JOBS_DIR зашифрованной мастер-ключом (BE-02: ПДн не лежат на volume открытым
+текстом), состояние — в таблице import_jobs. Перед разбором файл расшифровывается во временный файл вне volume,
+который удаляется при закрытии или падении процесса; файлы без задачи в очереди удаляются при старте. POST отдаёт job_id сразу,
+воркер (ThreadPoolExecutor) вызывает run_import* и пишет прогресс отдельной транзакцией.
+Процесс, захвативший задачу, записывается в owner и раз в IMPORT_JOB_HEARTBEAT_SECONDS обновляет locked_at.
+Running-задача с истёкшим heartbeat (процесс-владелец упал) возвращается в очередь при старте или фоновой
+проверкой любого процесса (импорт транзакционный — повтор безопасен); задачи живых процессов не трогаются.
+"""
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from sqlalchemy import text
+
+from app.bot_premise_resolver import invalidate_premise_index
+from app.config import IMPORT_JOB_HEARTBEAT_SECONDS, IMPORT_JOB_WORKERS, IMPORT_JOBS_DIR
+from app.crypto import encrypt_stream, iter_decrypted_chunks
+from app.db import get_db
+from app.import_register import invalidate_watermark_cache
+from app.response_cache import invalidate
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND_REGISTER = "register"
+JOB_KIND_CONTACTS = "contacts"
+JOB_KIND_VOTING_PARTICIPATION = "voting_participation"
+
+# Running-задача без heartbeat дольше стольких интервалов считается брошенной
+_STALE_HEARTBEATS = 4
+# Зашифрованная загрузка; файлы без суффикса — открытым текстом, от версий до шифрования
+_ENCRYPTED_SUFFIX = ".enc"
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_owner: tuple[int, str] | None = None
+_watchdog: threading.Thread | None = None
+_watchdog_stop = threading.Event()
+
+
+def _get_owner() -> str:
+    """Идентификатор процесса для import_jobs.owner (заново после fork — pid другой)."""
+    global _owner
+    pid = os.getpid()
+    if _owner is None or _owner[0] != pid:
+        _owner = (pid, f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}")
+    return _owner[1]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Ленивая инициализация пула воркеров импорта."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, IMPORT_JOB_WORKERS), thread_name_prefix="import-job")
+        return _executor
+
+
+def create_job(kind: str, upload: BinaryIO, filename: str, user_id: str | None, ip: str | None) -> str:
+    """Сохранить загрузку на диск (зашифрованной), создать запись import_jobs (queued) и поставить в очередь. Возвращает job_id."""
+    job_id = uuid.uuid4()
+    jobs_dir = Path(IMPORT_JOBS_DIR)
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    path = jobs_dir / f"{job_id}{_ENCRYPTED_SUFFIX}"
+    tmp = path.with_name(path.name + ".tmp")
+    upload.seek(0)
+    try:
+        with tmp.open("wb") as out:
+            encrypt_stream(upload, out)
+        tmp.replace(path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    with get_db() as db:
+        db.execute(
+            text(
+                "INSERT INTO import_jobs (id, kind, status, filename, file_path, user_id, ip) "
+                "VALUES (:id, :kind, 'queued', :fn, :path, :uid, :ip)"
+            ),
+            {"id": job_id, "kind": kind, "fn": (filename or "")[:255], "path": str(path), "uid": user_id, "ip": ip},
+        )
+        db.commit()
+    _get_executor().submit(_run_job, job_id)
+    return str(job_id)
+
+
+def _set_progress(job_id: uuid.UUID, processed_rows: int) -> None:
+    """Прогресс пишется отдельной сессией: основная транзакция импорта ещё не закоммичена."""
+    try:
+        with get_db() as db:
+            db.execute(
+                text("UPDATE import_jobs SET processed_rows = :n WHERE id = :id"),
+                {"n": processed_rows, "id": job_id},
+            )
+            db.commit()
+    except Exception as e:
+        logger.warning("import job %s progress update failed: %s", job_id, e)
+
+
+def _finish_job(job_id: uuid.UUID, status: str, report: dict[str, Any] | None, detail: str | None) -> bool:
+    """
+    Итог задачи; пишется, только пока задача за этим процессом (не возвращена в очередь как брошенная).
+    False — задача уже не за этим процессом, итог не записан.
+    """
+    with get_db() as db:
+        result = db.execute(
+            text(
+                "UPDATE import_jobs SET status = :st, accepted = :acc, rejected = :rej, "
+                "errors = :errors, warnings = :warnings, detail = :detail, finished_at = CURRENT_TIMESTAMP, "
+                "owner = NULL, locked_at = NULL "
+                "WHERE id = :id AND owner = :owner"
+            ),
+            {
+                "st": status,
+                "acc": report["accepted"] if report else None,
+                "rej": report["rejected"] if report else None,
+                "errors": json.dumps(report["errors"], ensure_ascii=False) if report else None,
+                "warnings": json.dumps(report["warnings"], ensure_ascii=False) if report and report.get("warnings") else None,
+                "detail": detail,
+                "id": job_id,
+                "owner": _get_owner(),
+            },
+        )
+        db.commit()
+    return result.rowcount == 1
+
+
+def _open_upload(path: Path) -> BinaryIO:
+    """Загрузка для разбора: зашифрованная — расшифровать во временный файл (без имени на диске, вне volume)."""
+    if path.suffix != _ENCRYPTED_SUFFIX:
+        return path.open("rb")
+    plain = tempfile.TemporaryFile()
+    try:
+        with path.open("rb") as src:
+            for chunk in iter_decrypted_chunks(src):
+                plain.write(chunk)
+        plain.seek(0)
+    except BaseException:
+        plain.close()
+        raise
+    return plain
+
+
+def _run_import_file(kind: str, path: Path, filename: str, user_id: str | None, ip: str | None, on_progress) -> dict[str, Any]:
+    from app.import_register import parse_file, run_import, run_import_contacts_only
+    from app.import_voting_participation import parse_voting_participation_file, run_import_voting_participation
+
+    with _open_upload(path) as f:
+        if kind == JOB_KIND_REGISTER:
+            _, _, rows = parse_file(f, filename)
+            return run_import(rows, client_ip=ip, on_progress=on_progress)
+        if kind == JOB_KIND_CONTACTS:
+            _, _, rows = parse_file(f, filename)
+            return run_import_contacts_only(rows, client_ip=ip, on_progress=on_progress)
+        if kind == JOB_KIND_VOTING_PARTICIPATION:
+            _, _, rows = parse_voting_participation_file(f, filename)
+            return run_import_voting_participation(rows, user_id=user_id, client_ip=ip, on_progress=on_progress)
+    raise ValueError(f"Unknown import job kind: {kind}")
+
+
+def _run_job(job_id: uuid.UUID) -> None:
+    """Выполнить задачу. Захват queued -> running атомарный: при нескольких воркерах задача выполнится один раз."""
+    with get_db() as db:
+        claimed = db.execute(
+            text(
+                "UPDATE import_jobs SET status = 'running', started_at = CURRENT_TIMESTAMP, processed_rows = 0, "
+                "owner = :owner, locked_at = CURRENT_TIMESTAMP "
+                "WHERE id = :id AND status = 'queued' "
+                "RETURNING kind, filename, file_path, user_id, ip"
+            ),
+            {"id": job_id, "owner": _get_owner()},
+        ).fetchone()
+        db.commit()
+    if not claimed:
+        return
+    kind, filename, file_path, user_id, ip = claimed
+    path = Path(file_path)
+    report = None
+    try:
+        report = _run_import_file(kind, path, filename, user_id, ip, lambda n: _set_progress(job_id, n))
+    except Exception:
+        logger.exception("Import job %s (%s) failed", job_id, kind)
+        owned = _finish_job(job_id, "failed", None, "Import failed")
+    else:
+        # Импорт закоммичен: помещения/контакты/участие могли измениться — публичный кэш сбрасывается целиком,
+        # как и кэш канареек списка контактов (данные помещений водяных знаков) и индекс помещений бота.
+        # Сброс — до проверки владения: данные изменены этим процессом в любом случае
+        invalidate()
+        invalidate_watermark_cache()
+        invalidate_premise_index()
+        owned = _finish_job(job_id, "done", report, None)
+    if not owned:
+        # Задача возвращена в очередь как брошенная (heartbeat истёк) — файл нужен повторному запуску
+        logger.warning("Import job %s (%s) was re-queued while running, upload kept for the rerun", job_id, kind)
+        return
+    if report is not None:
+        logger.info(
+            "Import job %s (%s) by sub=%s: accepted=%s rejected=%s",
+            job_id, kind, user_id, report["accepted"], report["rejected"],
+        )
+    path.unlink(missing_ok=True)
+
+
+def get_job(job_id: str) -> dict[str, Any] | None:
+    """Состояние задачи для GET /api/admin/import/jobs/{id}. None — нет такой задачи."""
+    try:
+        jid = uuid.UUID(job_id)
+    except ValueError:
+        return None
+    with get_db() as db:
+        r = db.execute(
+            text(
+                "SELECT id, kind, status, filename, user_id, processed_rows, accepted, rejected, "
+                "errors, warnings, detail, created_at, started_at, finished_at "
+                "FROM import_jobs WHERE id = :id"
+            ),
+            {"id": jid},
+        ).fetchone()
+    if not r:
+        return None
+    job = {
+        "job_id": str(r[0]),
+        "kind": r[1],
+        "status": r[2],
+        "filename": r[3],
+        "user_id": r[4],
+        "processed_rows": r[5],
+        "accepted": r[6],
+        "rejected": r[7],
+        "errors": json.loads(r[8]) if r[8] else [],
+        "detail": r[10],
+        "created_at": r[11].isoformat() if r[11] else None,
+        "started_at": r[12].isoformat() if r[12] else None,
+        "finished_at": r[13].isoformat() if r[13] else None,
+    }
+    if r[9]:
+        job["warnings"] = json.loads(r[9])
+    return job
+
+
+def _heartbeat() -> None:
+    """Продлить locked_at задач, выполняющихся в этом процессе."""
+    with get_db() as db:
+        db.execute(
+            text("UPDATE import_jobs SET locked_at = CURRENT_TIMESTAMP WHERE owner = :owner AND status = 'running'"),
+            {"owner": _get_owner()},
+        )
+        db.commit()
+
+
+def _requeue_stale() -> list[uuid.UUID]:
+    """Running-задачи с истёкшим heartbeat -> queued. Возвращает их id (UPDATE атомарный — вернёт один процесс)."""
+    with get_db() as db:
+        rows = db.execute(
+            text(
+                "UPDATE import_jobs SET status = 'queued', owner = NULL, locked_at = NULL "
+                "WHERE status = 'running' "
+                "AND (locked_at IS NULL OR locked_at < CURRENT_TIMESTAMP - make_interval(secs => :stale)) "
+                "RETURNING id"
+            ),
+            {"stale": IMPORT_JOB_HEARTBEAT_SECONDS * _STALE_HEARTBEATS},
+        ).fetchall()
+        db.commit()
+    if rows:
+        logger.warning("Re-queued %d import job(s) with expired heartbeat", len(rows))
+    return [r[0] for r in rows]
+
+
+def _watchdog_loop() -> None:
+    while not _watchdog_stop.wait(IMPORT_JOB_HEARTBEAT_SECONDS):
+        try:
+            _heartbeat()
+            for job_id in _requeue_stale():
+                _get_executor().submit(_run_job, job_id)
+        except Exception as e:
+            logger.warning("Import jobs heartbeat failed: %s", e)
+
+
+def _purge_orphan_files() -> None:
+    """
+    Удалить из IMPORT_JOBS_DIR файлы, на которые не ссылается задача в очереди или в работе (остались после падения).
+    Свежие файлы не трогаются: create_job другого процесса мог записать файл и ещё не создать запись.
+    """
+    jobs_dir = Path(IMPORT_JOBS_DIR)
+    if not jobs_dir.is_dir():
+        return
+    with get_db() as db:
+        keep = {
+            r[0] for r in db.execute(
+                text("SELECT file_path FROM import_jobs WHERE status IN ('queued', 'running')")
+            ).fetchall()
+        }
+    cutoff = time.time() - IMPORT_JOB_HEARTBEAT_SECONDS * _STALE_HEARTBEATS
+    purged = 0
+    for p in jobs_dir.iterdir():
+        try:
+            if not p.is_file() or str(p) in keep or p.stat().st_mtime > cutoff:
+                continue
+            p.unlink()
+            purged += 1
+        except FileNotFoundError:
+            continue
+    if purged:
+        logger.info("Removed %d orphaned import upload(s)", purged)
+
+
+def resume_jobs() -> None:
+    """
+    При старте: брошенные running-задачи (heartbeat истёк) -> queued, все queued — в пул (захват атомарный,
+    задачу выполнит один процесс), файлы без задачи — удалить. Затем фоновый поток heartbeat и проверки брошенных задач.
+    """
+    global _watchdog
+    _requeue_stale()
+    try:
+        _purge_orphan_files()
+    except OSError as e:
+        logger.warning("Import uploads cleanup failed: %s", e)
+    with get_db() as db:
+        rows = db.execute(text("SELECT id FROM import_jobs WHERE status = 'queued' ORDER BY created_at")).fetchall()
+    for r in rows:
+        _get_executor().submit(_run_job, r[0])
+    if rows:
+        logger.info("Resumed %d import job(s)", len(rows))
+    if _watchdog is None:
+        _watchdog_stop.clear()
+        _watchdog = threading.Thread(target=_watchdog_loop, name="import-job-heartbeat", daemon=True)
+        _watchdog.start()
+
+
+def stop_import_jobs() -> None:
+    global _watchdog
+    _watchdog_stop.set()
+    if _watchdog is not None:
+        _watchdog.join(timeout=5)
+        _watchdog = None
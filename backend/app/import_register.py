@@ -2,22 +2,30 @@
 CORE-01: Импорт реестра помещений и контактов (CSV/XLS/XLSX).
 Парсинг, валидация, сопоставление по Blind Index, шифрование (BE-02), отчёт.
 """
+import codecs
 import csv
 import io
 import logging
 import random
 import re
-from typing import Any
+import tempfile
+import threading
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Any, BinaryIO, Callable, Iterable, Iterator
 
 from sqlalchemy import text
 
 from app.crypto import (
     blind_index_email,
+    blind_index_many,
     blind_index_phone,
     blind_index_telegram_id,
-    decrypt,
+    decrypt_many,
     encrypt,
+    encrypt_many,
 )
+from app.cache_sync import on_invalidate
 from app.db import get_db
 from app.room_normalizer import normalize_room_number
 
@@ -184,98 +192,92 @@ def _row_to_dict(row: list[Any], mapping: dict[str, int]) -> dict[str, Any]:
     return out
 
 
-def _read_csv(content: bytes) -> tuple[list[str], list[list[Any]]]:
-    """Прочитать CSV UTF-8 (SR-CORE01-002)."""
-    text_content = content.decode("utf-8", errors="replace")
-    reader = csv.reader(io.StringIO(text_content), delimiter=";")
-    rows = list(reader)
-    if not rows:
+def _open_source(source: bytes | BinaryIO) -> BinaryIO:
+    """Байты загрузки или двоичный файл (spooled file UploadFile) — в файловый объект с начала."""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def _read_csv(source: bytes | BinaryIO) -> tuple[list[str], Iterator[list[Any]]]:
+    """Прочитать CSV UTF-8 (SR-CORE01-002). Строки данных отдаются лениво."""
+    # codecs.StreamReader, а не TextIOWrapper: обёртка не закрывает файл загрузки при сборке мусора
+    reader = csv.reader(codecs.getreader("utf-8")(_open_source(source), errors="replace"), delimiter=";")
+    first = next(reader, None)
+    if first is None:
         raise ValueError("Empty file")
-    headers = [h.strip() for h in rows[0]]
-    data_rows = rows[1:]
-    return headers, data_rows
+    headers = [h.strip() for h in first]
+    return headers, reader
 
 
-def _read_xlsx(content: bytes) -> tuple[list[str], list[list[Any]]]:
-    """Прочитать первый лист XLSX (SR-CORE01-003)."""
+def _read_xlsx(source: bytes | BinaryIO) -> tuple[list[str], Iterator[list[Any]]]:
+    """Прочитать первый лист XLSX (SR-CORE01-003) в режиме read_only; строки данных отдаются лениво."""
     import openpyxl
-    wb = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    wb = openpyxl.load_workbook(_open_source(source), read_only=True, data_only=True)
     ws = wb.active
     if not ws:
+        wb.close()
         raise ValueError("No sheet")
-    rows = list(ws.iter_rows(values_only=True))
-    if not rows:
+    it = ws.iter_rows(values_only=True)
+    first = next(it, None)
+    if first is None:
+        wb.close()
         raise ValueError("Empty sheet")
-    headers = [str(c).strip() if c is not None else "" for c in rows[0]]
-    data_rows = [[str(c).strip() if c is not None else "" for c in r] for r in rows[1:]]
-    return headers, data_rows
+    headers = [str(c).strip() if c is not None else "" for c in first]
 
+    def data_rows() -> Iterator[list[Any]]:
+        try:
+            for r in it:
+                yield [str(c).strip() if c is not None else "" for c in r]
+        finally:
+            wb.close()
 
-def _read_xls(content: bytes) -> tuple[list[str], list[list[Any]]]:
-    """Прочитать первый лист XLS (SR-CORE01-003)."""
+    return headers, data_rows()
+
+
+def _read_xls(source: bytes | BinaryIO) -> tuple[list[str], Iterator[list[Any]]]:
+    """Прочитать первый лист XLS (SR-CORE01-003). Формат BIFF читается целиком (xlrd), строки — лениво."""
     import xlrd
-    wb = xlrd.open_workbook(file_contents=content)
+    wb = xlrd.open_workbook(file_contents=_open_source(source).read())
     sheet = wb.sheet_by_index(0)
     headers = [str(sheet.cell_value(0, c)).strip() for c in range(sheet.ncols)]
-    data_rows = [
+    data_rows = (
         [str(sheet.cell_value(r, c)).strip() if sheet.cell_value(r, c) else "" for c in range(sheet.ncols)]
         for r in range(1, sheet.nrows)
-    ]
+    )
     return headers, data_rows
 
 
-def parse_file(content: bytes, filename: str) -> tuple[list[str], list[str], list[dict[str, Any]]]:
+def read_table(source: bytes | BinaryIO, filename: str) -> tuple[list[str], Iterator[list[Any]]]:
+    """Определить формат по расширению/сигнатуре и вернуть (заголовки, итератор строк данных)."""
+    fn = (filename or "").lower()
+    if fn.endswith(".csv"):
+        return _read_csv(source)
+    if fn.endswith(".xlsx"):
+        return _read_xlsx(source)
+    if fn.endswith(".xls"):
+        return _read_xls(source)
+    f = _open_source(source)
+    signature = f.read(4)
+    if signature == b"PK\x03\x04":
+        return _read_xlsx(f)
+    return _read_csv(f)
+
+
+def parse_file(source: bytes | BinaryIO, filename: str) -> tuple[list[str], list[str], Iterator[dict[str, Any]]]:
     """
     Определить формат по расширению/содержимому, распарсить.
-    Возвращает (original_headers, canonical_columns, list of row dicts).
+    source — байты или двоичный файл (UploadFile.file): строки читаются по одной, файл целиком в память не грузится.
+    Возвращает (original_headers, canonical_columns, итератор row dicts).
     """
-    fn = (filename or "").lower()
-    if fn.endswith(".csv"):
-        headers, data_rows = _read_csv(content)
-    elif fn.endswith(".xlsx"):
-        headers, data_rows = _read_xlsx(content)
-    elif fn.endswith(".xls"):
-        headers, data_rows = _read_xls(content)
-    else:
-        if content[:4] == b"PK\x03\x04":
-            headers, data_rows = _read_xlsx(content)
-        else:
-            headers, data_rows = _read_csv(content)
+    headers, data_rows = read_table(source, filename)
     original_headers = [h for h in headers if (h or "").strip()]
     mapping = _map_headers(headers)
-    rows = [_row_to_dict(r, mapping) for r in data_rows]
+    rows = (_row_to_dict(r, mapping) for r in data_rows)
     return original_headers, list(mapping.keys()), rows
 
 
-def _get_or_create_premise(
-    db, cadastral_number: str, area, entrance, floor, premises_type, premises_number: str
-) -> str:
-    """Получить кадастровый номер помещения (существующего или созданного) (SR-CORE01-006)."""
-    # Проверка существования строки: не вставлять дубликат по PK при повторном появлении кадастра в импорте.
-    row = db.execute(
-        text("SELECT 1 FROM premises WHERE cadastral_number = :cn"),
-        {"cn": cadastral_number},
-    ).fetchone()
-    if row:
-        return cadastral_number
-    db.execute(
-        text(
-            "INSERT INTO premises (cadastral_number, area, entrance, floor, premises_type, premises_number) "
-            "VALUES (:cn, :area, :entrance, :floor, :pt, :pn)"
-        ),
-        {
-            "cn": cadastral_number,
-            "area": area,
-            "entrance": entrance,
-            "floor": floor,
-            "pt": premises_type,
-            "pn": premises_number,
-        },
-    )
-    db.flush()
-    return cadastral_number
-
-
 def _find_contact_by_indexes(db, premise_id: str, phone_idx, email_idx, telegram_id_idx) -> dict | None:
     """Найти контакт по premise_id (cadastral_number) и любому из Blind Index. Возвращает id, индексы (для коллизии) и флаги заполненности (для обогащения SR-CORE01-014)."""
     cols = "id, phone_idx, email_idx, telegram_id_idx, (COALESCE(trim(phone),'') != '') as has_phone, (COALESCE(trim(email),'') != '') as has_email, (COALESCE(trim(telegram_id),'') != '') as has_telegram_id, (COALESCE(trim(how_to_address),'') != '') as has_how"
@@ -320,9 +322,235 @@ def _collision(existing: dict, row: dict, phone_idx, email_idx, telegram_id_idx)
     return "; ".join(reasons) if reasons else None
 
 
-def run_import(rows: list[dict[str, Any]], client_ip: str | None = None) -> dict[str, Any]:
+_BULK_CHUNK = 1000  # строк в одном multi-row INSERT/UPDATE и элементов в одном ANY(:ids)
+
+# Ограничения колонок premises (миграция 001): проверяем до записи, чтобы ошибка осталась построчной
+_PREMISE_FIELD_LIMITS = {
+    "cadastral_number": 64,
+    "entrance": 16,
+    "floor": 16,
+    "premises_type": 64,
+    "premises_number": 32,
+}
+
+_CONTACT_INSERT_COLUMNS = [
+    "n", "premise_id", "phone", "email", "telegram_id", "how_to_address",
+    "phone_idx", "email_idx", "telegram_id_idx", "ip",
+]
+_CONTACT_UPDATE_COLUMNS = [
+    "id", "phone", "phone_idx", "email", "email_idx", "telegram_id", "telegram_id_idx", "how_to_address",
+]
+
+
+def _chunks(items: Iterable, size: int = _BULK_CHUNK) -> Iterator[list]:
+    """Разбить список или поток (в т.ч. генератор строк parse_file) на пачки по size."""
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def _bulk_values(db, sql: str, columns: list[str], rows: list[dict[str, Any]]) -> list[Any]:
+    """
+    Выполнить sql, подставив в {values} multi-row VALUES по columns; пачками по _BULK_CHUNK строк.
+    Возвращает строки RETURNING (если есть).
+    """
+    returned: list[Any] = []
+    for chunk in _chunks(rows):
+        params: dict[str, Any] = {}
+        tuples = []
+        for i, r in enumerate(chunk):
+            names = []
+            for col in columns:
+                key = f"{col}_{i}"
+                params[key] = r.get(col)
+                names.append(f":{key}")
+            tuples.append("(" + ", ".join(names) + ")")
+        result = db.execute(text(sql.format(values=", ".join(tuples))), params)
+        if result.returns_rows:
+            returned.extend(result.fetchall())
+    return returned
+
+
+def _parse_area(val: Any) -> Any:
+    """Площадь для premises.area (Numeric(12, 2)). ValueError — если не число."""
+    if val is None or not str(val).strip():
+        return None
+    s = str(val).strip().replace(",", ".").replace(" ", "")
+    try:
+        d = Decimal(s)
+    except InvalidOperation:
+        raise ValueError(f"invalid area {val!r}") from None
+    if not d.is_finite() or abs(d) >= Decimal("1e10"):
+        raise ValueError(f"invalid area {val!r}")
+    return d
+
+
+def _premise_values(cadastral: str, row: dict[str, Any], premises_number: str) -> dict[str, Any]:
+    """Значения новой строки premises. ValueError — если строка не поместится в колонки."""
+    values = {
+        "cadastral_number": cadastral,
+        "area": _parse_area(row.get("area")),
+        "entrance": row.get("entrance") or None,
+        "floor": row.get("floor") or None,
+        "premises_type": row.get("premises_type") or None,
+        "premises_number": premises_number,
+    }
+    for col, limit in _PREMISE_FIELD_LIMITS.items():
+        if values[col] is not None and len(str(values[col])) > limit:
+            raise ValueError(f"{col} longer than {limit} characters")
+    return values
+
+
+def _load_existing_premises(db, cadastrals: list[str]) -> set[str]:
+    """Кадастровые номера из списка, уже присутствующие в premises (один запрос на пачку)."""
+    found: set[str] = set()
+    for chunk in _chunks(cadastrals):
+        rows = db.execute(
+            text("SELECT cadastral_number FROM premises WHERE cadastral_number = ANY(:cns)"),
+            {"cns": chunk},
+        ).fetchall()
+        found.update(r[0] for r in rows)
+    return found
+
+
+def _index_contact(index: dict[str, dict[str, dict[str, dict]]], contact: dict[str, Any]) -> None:
+    """Добавить контакт в индекс premise_id -> вид индекса -> значение; первый (по id) выигрывает."""
+    by_kind = index.setdefault(contact["premise_id"], {"phone_idx": {}, "email_idx": {}, "telegram_id_idx": {}})
+    for kind in ("phone_idx", "email_idx", "telegram_id_idx"):
+        if contact.get(kind):
+            by_kind[kind].setdefault(contact[kind], contact)
+
+
+def _load_contacts_index(db, premise_ids: list[str]) -> dict[str, dict[str, dict[str, dict]]]:
+    """
+    Контакты по помещениям из импорта одним запросом на пачку (вместо _find_contact_by_indexes на строку).
+    Записи того же вида, что возвращает _find_contact_by_indexes, плюс premise_id.
+    """
+    index: dict[str, dict[str, dict[str, dict]]] = {}
+    for chunk in _chunks(premise_ids):
+        rows = db.execute(
+            text(
+                "SELECT id, premise_id, phone_idx, email_idx, telegram_id_idx, "
+                "(COALESCE(trim(phone),'') != '') as has_phone, (COALESCE(trim(email),'') != '') as has_email, "
+                "(COALESCE(trim(telegram_id),'') != '') as has_telegram_id, "
+                "(COALESCE(trim(how_to_address),'') != '') as has_how "
+                "FROM contacts WHERE premise_id = ANY(:pids) ORDER BY id"
+            ),
+            {"pids": chunk},
+        ).fetchall()
+        for r in rows:
+            _index_contact(index, {
+                "id": r[0], "premise_id": r[1], "phone_idx": r[2], "email_idx": r[3], "telegram_id_idx": r[4],
+                "has_phone": r[5], "has_email": r[6], "has_telegram_id": r[7], "has_how": r[8],
+            })
+    return index
+
+
+def _match_contact(index, premise_id: str, phone_idx, email_idx, telegram_id_idx) -> dict | None:
+    """Тот же порядок, что в _find_contact_by_indexes: телефон, затем email, затем telegram_id."""
+    by_kind = index.get(premise_id)
+    if not by_kind:
+        return None
+    for kind, value in (("phone_idx", phone_idx), ("email_idx", email_idx), ("telegram_id_idx", telegram_id_idx)):
+        if value and value in by_kind[kind]:
+            return by_kind[kind][value]
+    return None
+
+
+def _enrich_contact(contact: dict[str, Any], fields: dict[str, Any], phone_idx, email_idx, telegram_id_idx) -> dict[str, Any]:
+    """
+    SR-CORE01-014: заполнить у контакта только пустые поля. Меняет контакт на месте (флаги и индексы),
+    чтобы следующие строки файла видели его обновлённым. Возвращает {колонка: значение} для записи.
+    """
+    changes: dict[str, Any] = {}
+    if fields["email"] and not contact.get("has_email"):
+        changes["email"] = fields["email"]; changes["email_idx"] = email_idx
+        contact["has_email"] = True; contact["email_idx"] = email_idx
+    if fields["phone"] and not contact.get("has_phone"):
+        changes["phone"] = fields["phone"]; changes["phone_idx"] = phone_idx
+        contact["has_phone"] = True; contact["phone_idx"] = phone_idx
+    if fields["telegram_id"] and not contact.get("has_telegram_id"):
+        changes["telegram_id"] = fields["telegram_id"]; changes["telegram_id_idx"] = telegram_id_idx
+        contact["has_telegram_id"] = True; contact["telegram_id_idx"] = telegram_id_idx
+    if fields["how_to_address"] and not contact.get("has_how"):
+        changes["how_to_address"] = fields["how_to_address"]
+        contact["has_how"] = True
+    return changes
+
+
+def _encrypt_fields(records: list[dict[str, Any]]) -> None:
+    """Зашифровать ПДн в записях перед bulk-записью (BE-02) — одной пачкой через encrypt_many."""
+    slots = [(r, col) for r in records for col in ("phone", "email", "telegram_id", "how_to_address") if r.get(col)]
+    for (r, col), enc in zip(slots, encrypt_many(r[col] for r, col in slots)):
+        r[col] = enc
+
+
+def _flush_import_chunk(
+    db,
+    new_premises: list[dict[str, Any]],
+    new_contacts: list[dict[str, Any]],
+    updates: dict[int, dict[str, Any]],
+) -> None:
+    """Записать накопленную пачку run_import; новым контактам проставить id (для обогащения в следующих пачках)."""
+    if new_premises:
+        _bulk_values(
+            db,
+            "INSERT INTO premises (cadastral_number, area, entrance, floor, premises_type, premises_number) "
+            "VALUES {values} ON CONFLICT (cadastral_number) DO NOTHING",
+            ["cadastral_number", "area", "entrance", "floor", "premises_type", "premises_number"],
+            new_premises,
+        )
+    if new_contacts:
+        inserts = [dict(c["insert"], n=n) for n, c in enumerate(new_contacts)]
+        _encrypt_fields(inserts)
+        # id выдаются по возрастанию в порядке ORDER BY v.n — сортировка RETURNING восстанавливает соответствие
+        returned = _bulk_values(
+            db,
+            "INSERT INTO contacts (premise_id, is_owner, phone, email, telegram_id, how_to_address, "
+            "phone_idx, email_idx, telegram_id_idx, status, ip) "
+            "SELECT v.premise_id, true, v.phone, v.email, v.telegram_id, v.how_to_address, "
+            "v.phone_idx, v.email_idx, v.telegram_id_idx, 'pending', v.ip "
+            "FROM (VALUES {values}) AS v(" + ", ".join(_CONTACT_INSERT_COLUMNS) + ") "
+            "ORDER BY v.n RETURNING id",
+            _CONTACT_INSERT_COLUMNS,
+            inserts,
+        )
+        for contact, contact_id in zip(new_contacts, sorted(r[0] for r in returned)):
+            contact["id"] = contact_id
+            del contact["insert"]
+    if updates:
+        update_rows = list(updates.values())
+        _encrypt_fields(update_rows)
+        # NULL в v.<поле> — поле не трогаем; индекс пишется вместе со своим полем
+        _bulk_values(
+            db,
+            "UPDATE contacts AS c SET "
+            "phone = COALESCE(v.phone, c.phone), "
+            "phone_idx = CASE WHEN v.phone IS NULL THEN c.phone_idx ELSE v.phone_idx END, "
+            "email = COALESCE(v.email, c.email), "
+            "email_idx = CASE WHEN v.email IS NULL THEN c.email_idx ELSE v.email_idx END, "
+            "telegram_id = COALESCE(v.telegram_id, c.telegram_id), "
+            "telegram_id_idx = CASE WHEN v.telegram_id IS NULL THEN c.telegram_id_idx ELSE v.telegram_id_idx END, "
+            "how_to_address = COALESCE(v.how_to_address, c.how_to_address), "
+            "updated_at = CURRENT_TIMESTAMP "
+            "FROM (VALUES {values}) AS v(" + ", ".join(_CONTACT_UPDATE_COLUMNS) + ") "
+            "WHERE c.id = v.id",
+            _CONTACT_UPDATE_COLUMNS,
+            update_rows,
+        )
+
+
+def run_import(
+    rows: Iterable[dict[str, Any]],
+    client_ip: str | None = None,
+    on_progress: Callable[[int], None] | None = None,
+) -> dict[str, Any]:
     """
     Выполнить импорт в транзакции. Все валидные строки записываются; ошибки по строкам в отчёте.
+    rows — список или поток из parse_file; обрабатывается пачками по _BULK_CHUNK строк,
+    после каждой пачки вызывается on_progress(число обработанных строк).
+    Set-based: помещения и контакты пачки подгружаются через ANY(:ids), сопоставление по Blind Index
+    идёт в памяти в порядке строк файла, запись — multi-row INSERT ... ON CONFLICT и UPDATE ... FROM (VALUES ...).
     Возвращает { accepted, rejected, errors: [ { row, message } ] }.
     """
     accepted = 0
@@ -330,92 +558,91 @@ def run_import(rows: list[dict[str, Any]], client_ip: str | None = None) -> dict
     errors: list[dict[str, Any]] = []
     with get_db() as db:
         try:
-            for row_num, row in enumerate(rows, start=2):
-                row_1based = row_num
-                cadastral = (row.get("cadastral_number") or "").strip()
-                if not cadastral:
-                    errors.append({"row": row_1based, "message": "Missing required field: cadastral_number"})
-                    rejected += 1
-                    continue
-                phone = (row.get("phone") or "").strip() or None
-                email = (row.get("email") or "").strip() or None
-                telegram_id = (row.get("telegram_id") or "").strip() or None
-                how_to_address = (row.get("how_to_address") or "").strip() or None
-                has_contact = phone or email or telegram_id
-                premises_number_raw = (row.get("premises_number") or "").strip() or None
-                premises_number = normalize_room_number(premises_number_raw) or premises_number_raw or ""
-                try:
-                    premise_id = _get_or_create_premise(
-                        db,
-                        cadastral,
-                        row.get("area") or None,
-                        row.get("entrance") or None,
-                        row.get("floor") or None,
-                        row.get("premises_type") or None,
-                        premises_number,
-                    )
-                except Exception as e:
-                    errors.append({"row": row_1based, "message": f"Premise error: {e}"})
-                    rejected += 1
-                    continue
-                # Если контактных данных нет — помещение создано, контакт не добавляется
-                if not has_contact:
-                    accepted += 1
-                    continue
-                phone_idx = blind_index_phone(phone) if phone else None
-                email_idx = blind_index_email(email) if email else None
-                telegram_id_idx = blind_index_telegram_id(telegram_id) if telegram_id else None
-                existing = _find_contact_by_indexes(db, premise_id, phone_idx, email_idx, telegram_id_idx)
-                collision_msg = _collision(existing, row, phone_idx, email_idx, telegram_id_idx)
-                if collision_msg:
-                    errors.append({"row": row_1based, "message": f"Collision: {collision_msg}"})
-                    rejected += 1
-                    continue
-                phone_enc = encrypt(phone)
-                email_enc = encrypt(email)
-                telegram_id_enc = encrypt(telegram_id)
-                how_enc = encrypt(how_to_address)
-                if existing:
-                    contact_id = existing["id"]
-                    updates = []
-                    params = {"cid": contact_id}
-                    if email_enc and not existing.get("has_email"):
-                        updates.append("email = :email"); params["email"] = email_enc; params["email_idx"] = email_idx
-                    if phone_enc and not existing.get("has_phone"):
-                        updates.append("phone = :phone"); params["phone"] = phone_enc; params["phone_idx"] = phone_idx
-                    if telegram_id_enc and not existing.get("has_telegram_id"):
-                        updates.append("telegram_id = :telegram_id"); params["telegram_id"] = telegram_id_enc; params["telegram_id_idx"] = telegram_id_idx
-                    if how_enc and not existing.get("has_how"):
-                        updates.append("how_to_address = :how_to_address"); params["how_to_address"] = how_enc
-                    if updates:
-                        set_parts = updates.copy()
-                        if "email_idx" in params: set_parts.append("email_idx = :email_idx")
-                        if "phone_idx" in params: set_parts.append("phone_idx = :phone_idx")
-                        if "telegram_id_idx" in params: set_parts.append("telegram_id_idx = :telegram_id_idx")
-                        set_parts.append("updated_at = CURRENT_TIMESTAMP")
-                        db.execute(text("UPDATE contacts SET " + ", ".join(set_parts) + " WHERE id = :cid"), params)
-                    accepted += 1
-                else:
-                    db.execute(
-                        text(
-                            "INSERT INTO contacts (premise_id, is_owner, phone, email, telegram_id, how_to_address, "
-                            "phone_idx, email_idx, telegram_id_idx, status, ip) "
-                            "VALUES (:pid, true, :phone, :email, :telegram_id, :how_to_address, "
-                            ":phone_idx, :email_idx, :telegram_id_idx, 'pending', :ip)"
-                        ),
-                        {
-                            "pid": premise_id,
-                            "phone": phone_enc,
-                            "email": email_enc,
-                            "telegram_id": telegram_id_enc,
-                            "how_to_address": how_enc,
-                            "phone_idx": phone_idx,
-                            "email_idx": email_idx,
-                            "telegram_id_idx": telegram_id_idx,
-                            "ip": client_ip,
-                        },
-                    )
+            loaded: set[str] = set()
+            known_premises: set[str] = set()
+            contacts_index: dict[str, dict[str, dict[str, dict]]] = {}
+            processed = 0
+            for chunk in _chunks(enumerate(rows, start=2)):
+                to_load = list(dict.fromkeys(
+                    cn for cn in ((row.get("cadastral_number") or "").strip() for _, row in chunk)
+                    if cn and cn not in loaded
+                ))
+                if to_load:
+                    loaded.update(to_load)
+                    known_premises |= _load_existing_premises(db, to_load)
+                    contacts_index.update(_load_contacts_index(db, to_load))
+
+                # Blind Index всей пачки — одним проходом на поле (blind_index_many), дальше по позиции строки
+                chunk_idx = {
+                    col: blind_index_many(col, ((row.get(col) or "").strip() or None for _, row in chunk))
+                    for col in ("phone", "email", "telegram_id")
+                }
+                new_premises: list[dict[str, Any]] = []
+                new_contacts: list[dict[str, Any]] = []
+                updates: dict[int, dict[str, Any]] = {}
+                for pos, (row_num, row) in enumerate(chunk):
+                    row_1based = row_num
+                    cadastral = (row.get("cadastral_number") or "").strip()
+                    if not cadastral:
+                        errors.append({"row": row_1based, "message": "Missing required field: cadastral_number"})
+                        rejected += 1
+                        continue
+                    phone = (row.get("phone") or "").strip() or None
+                    email = (row.get("email") or "").strip() or None
+                    telegram_id = (row.get("telegram_id") or "").strip() or None
+                    how_to_address = (row.get("how_to_address") or "").strip() or None
+                    has_contact = phone or email or telegram_id
+                    premises_number_raw = (row.get("premises_number") or "").strip() or None
+                    premises_number = normalize_room_number(premises_number_raw) or premises_number_raw or ""
+                    # Повторное появление кадастра в файле или в БД — помещение не создаётся заново (SR-CORE01-006)
+                    if cadastral not in known_premises:
+                        try:
+                            new_premises.append(_premise_values(cadastral, row, premises_number))
+                        except ValueError as e:
+                            errors.append({"row": row_1based, "message": f"Premise error: {e}"})
+                            rejected += 1
+                            continue
+                        known_premises.add(cadastral)
+                    # Если контактных данных нет — помещение создано, контакт не добавляется
+                    if not has_contact:
+                        accepted += 1
+                        continue
+                    phone_idx = chunk_idx["phone"][pos]
+                    email_idx = chunk_idx["email"][pos]
+                    telegram_id_idx = chunk_idx["telegram_id"][pos]
+                    existing = _match_contact(contacts_index, cadastral, phone_idx, email_idx, telegram_id_idx)
+                    collision_msg = _collision(existing, row, phone_idx, email_idx, telegram_id_idx)
+                    if collision_msg:
+                        errors.append({"row": row_1based, "message": f"Collision: {collision_msg}"})
+                        rejected += 1
+                        continue
+                    fields = {"phone": phone, "email": email, "telegram_id": telegram_id, "how_to_address": how_to_address}
+                    if existing:
+                        changes = _enrich_contact(existing, fields, phone_idx, email_idx, telegram_id_idx)
+                        if existing["id"] is None:
+                            # Контакт создан выше в этой же пачке — дописываем в его INSERT
+                            existing["insert"].update(changes)
+                        elif changes:
+                            updates.setdefault(existing["id"], {"id": existing["id"]}).update(changes)
+                        _index_contact(contacts_index, existing)
+                    else:
+                        contact = {
+                            "id": None, "premise_id": cadastral,
+                            "phone_idx": phone_idx, "email_idx": email_idx, "telegram_id_idx": telegram_id_idx,
+                            "has_phone": bool(phone), "has_email": bool(email),
+                            "has_telegram_id": bool(telegram_id), "has_how": bool(how_to_address),
+                            "insert": {
+                                **fields, "premise_id": cadastral, "ip": client_ip,
+                                "phone_idx": phone_idx, "email_idx": email_idx, "telegram_id_idx": telegram_id_idx,
+                            },
+                        }
+                        new_contacts.append(contact)
+                        _index_contact(contacts_index, contact)
                     accepted += 1
+                _flush_import_chunk(db, new_premises, new_contacts, updates)
+                processed += len(chunk)
+                if on_progress:
+                    on_progress(processed)
             db.commit()
         except Exception as e:
             db.rollback()
@@ -424,11 +651,16 @@ def run_import(rows: list[dict[str, Any]], client_ip: str | None = None) -> dict
     return {"accepted": accepted, "rejected": rejected, "errors": errors}
 
 
-def run_import_contacts_only(rows: list[dict[str, Any]], client_ip: str | None = None) -> dict[str, Any]:
+def run_import_contacts_only(
+    rows: Iterable[dict[str, Any]],
+    client_ip: str | None = None,
+    on_progress: Callable[[int], None] | None = None,
+) -> dict[str, Any]:
     """
     ADM-06: Импорт только контактов. Помещения не создаются и не обновляются.
     Обязательны cadastral_number и хотя бы одно из: phone, email, telegram_id.
     Опционально: is_owner, barrier_vote, vote_format.
+    on_progress(число обработанных строк) вызывается каждые _BULK_CHUNK строк.
     """
     accepted = 0
     rejected = 0
@@ -437,6 +669,8 @@ def run_import_contacts_only(rows: list[dict[str, Any]], client_ip: str | None =
         try:
             for row_num, row in enumerate(rows, start=2):
                 row_1based = row_num
+                if on_progress and (row_num - 2) and (row_num - 2) % _BULK_CHUNK == 0:
+                    on_progress(row_num - 2)
                 cadastral = (row.get("cadastral_number") or "").strip()
                 if not cadastral:
                     errors.append({"row": row_1based, "message": "Missing required field: cadastral_number"})
@@ -608,55 +842,98 @@ CANARY_NAMES = [
 ]
 
 
-def create_watermark(admin_telegram_id: str, entrance: str) -> dict[str, Any] | None:
+FULL_HOUSE_ENTRANCE = "full_house"
+FULL_HOUSE_ROW_LIMIT = 15000
+
+# Порядок помещений подъезда по индексу ix_premises_entrance_floor: смещение берётся без сортировки таблицы
+_PREMISE_INDEX_ORDER = "floor, premises_type, premises_number"
+
+
+def _random_premise(db, entrance: str | None) -> str | None:
     """
-    Создать запись в export_watermarks: случайное помещение подъезда, телефон +7 916 XXXXXXX,
-    canary_telegram_id, одно из CANARY_NAMES. Возвращает dict с ключами premise_id, phone,
-    canary_telegram_id, how_to_address для вставки в шаблон и список контактов.
+    Случайное помещение подъезда (entrance=None — дома): случайное смещение по числу помещений.
+    Число и строка по смещению читаются по индексу — без ORDER BY random() по всей таблице.
     """
+    if entrance is None:
+        where, order, params = "", "cadastral_number", {}
+    else:
+        where, order, params = "WHERE entrance = :e", _PREMISE_INDEX_ORDER, {"e": entrance}
+    n = db.execute(text(f"SELECT COUNT(*) FROM premises {where}"), params).scalar() or 0
+    if n == 0:
+        return None
+    return db.execute(
+        text(f"SELECT cadastral_number FROM premises {where} ORDER BY {order} OFFSET :o LIMIT 1"),
+        {**params, "o": random.randrange(n)},
+    ).scalar()
+
+
+def _insert_watermarks(db, admin_telegram_id: str, picks: list[tuple[str, str]]) -> list[dict[str, Any]]:
+    """
+    Записи export_watermarks для пар (entrance, premise_id) одним INSERT: телефон +7 916 XXXXXXX,
+    canary_telegram_id, одно из CANARY_NAMES. Коммитит вызывающий.
+    """
+    if not picks:
+        return []
+    params: dict[str, Any] = {"aid": admin_telegram_id}
+    tuples = []
+    marks = []
+    for i, (entrance, premise_id) in enumerate(picks):
+        mark = {
+            "entrance": entrance,
+            "premise_id": premise_id,
+            "phone": "+7916" + "".join(random.choices("0123456789", k=7)),
+            "canary_telegram_id": str(random.randint(10**7, 10**10 - 1)),
+            "how_to_address": random.choice(CANARY_NAMES),
+        }
+        params.update({f"e_{i}": entrance, f"pid_{i}": premise_id, f"phone_{i}": mark["phone"],
+                       f"tg_{i}": mark["canary_telegram_id"], f"how_{i}": mark["how_to_address"]})
+        tuples.append(f"(:aid, :e_{i}, :pid_{i}, :phone_{i}, :tg_{i}, :how_{i})")
+        marks.append(mark)
+    rows = db.execute(
+        text(
+            "INSERT INTO export_watermarks "
+            "(admin_telegram_id, entrance, premise_id, phone, canary_telegram_id, how_to_address) "
+            f"VALUES {', '.join(tuples)} "
+            "RETURNING entrance, id, created_at"
+        ),
+        params,
+    ).fetchall()
+    # Подъезды в пачке различны — сопоставление строк RETURNING по entrance
+    returned = {r[0]: r for r in rows}
+    for mark in marks:
+        r = returned[mark["entrance"]]
+        mark["id"] = r[1]
+        mark["created_at"] = r[2].isoformat() if r[2] else None
+    return marks
+
+
+def allocate_watermark(db, admin_telegram_id: str, entrance: str | None) -> dict[str, Any] | None:
+    """
+    Водяной знак по подъезду (entrance=None — по дому, entrance='full_house') в транзакции db; коммитит вызывающий,
+    после коммита — invalidate_watermark_cache(). None — в подъезде нет помещений.
+    """
+    premise_id = _random_premise(db, entrance)
+    if premise_id is None:
+        return None
+    return _insert_watermarks(db, admin_telegram_id, [(FULL_HOUSE_ENTRANCE if entrance is None else entrance, premise_id)])[0]
+
+
+def _create_watermark(admin_telegram_id: str, entrance: str | None) -> dict[str, Any] | None:
     with get_db() as db:
-        premise_row = db.execute(
-            text(
-                "SELECT cadastral_number FROM premises WHERE entrance = :e ORDER BY random() LIMIT 1"
-            ),
-            {"e": entrance.strip()},
-        ).fetchone()
-        if not premise_row:
-            return None
-        premise_id = premise_row[0]
-        phone = "+7916" + "".join(random.choices("0123456789", k=7))
-        canary_telegram_id = str(random.randint(10**7, 10**10 - 1))
-        how_to_address = random.choice(CANARY_NAMES)
-        result = db.execute(
-            text(
-                "INSERT INTO export_watermarks "
-                "(admin_telegram_id, entrance, premise_id, phone, canary_telegram_id, how_to_address) "
-                "VALUES (:aid, :e, :pid, :phone, :tg, :how) "
-                "RETURNING created_at"
-            ),
-            {
-                "aid": admin_telegram_id,
-                "e": entrance.strip(),
-                "pid": premise_id,
-                "phone": phone,
-                "tg": canary_telegram_id,
-                "how": how_to_address,
-            },
-        )
-        created_at_row = result.fetchone()
+        mark = allocate_watermark(db, admin_telegram_id, entrance)
         db.commit()
-    created_at = created_at_row[0] if created_at_row else None
-    return {
-        "premise_id": premise_id,
-        "phone": phone,
-        "canary_telegram_id": canary_telegram_id,
-        "how_to_address": how_to_address,
-        "created_at": created_at.isoformat() if created_at else None,
-    }
+    if mark is not None:
+        invalidate_watermark_cache()
+    return mark
 
 
-FULL_HOUSE_ENTRANCE = "full_house"
-FULL_HOUSE_ROW_LIMIT = 15000
+def create_watermark(admin_telegram_id: str, entrance: str) -> dict[str, Any] | None:
+    """
+    Создать запись в export_watermarks: случайное помещение подъезда, телефон +7 916 XXXXXXX,
+    canary_telegram_id, одно из CANARY_NAMES. Возвращает dict с ключами id (водяного знака), premise_id, phone,
+    canary_telegram_id, how_to_address для вставки в шаблон и список контактов.
+    """
+    return _create_watermark(admin_telegram_id, entrance.strip())
 
 
 def create_watermark_full_house(admin_telegram_id: str) -> dict[str, Any] | None:
@@ -664,44 +941,65 @@ def create_watermark_full_house(admin_telegram_id: str) -> dict[str, Any] | None
     Canary для шаблона по всему дому: одно случайное помещение из premises,
     запись в export_watermarks с entrance='full_house'. Возврат dict для вставки в шаблон.
     """
-    with get_db() as db:
-        premise_row = db.execute(
-            text(
-                "SELECT cadastral_number FROM premises ORDER BY random() LIMIT 1"
-            ),
-        ).fetchone()
-        if not premise_row:
-            return None
-        premise_id = premise_row[0]
-        phone = "+7916" + "".join(random.choices("0123456789", k=7))
-        canary_telegram_id = str(random.randint(10**7, 10**10 - 1))
-        how_to_address = random.choice(CANARY_NAMES)
-        result = db.execute(
-            text(
-                "INSERT INTO export_watermarks "
-                "(admin_telegram_id, entrance, premise_id, phone, canary_telegram_id, how_to_address) "
-                "VALUES (:aid, :e, :pid, :phone, :tg, :how) "
-                "RETURNING created_at"
-            ),
-            {
-                "aid": admin_telegram_id,
-                "e": FULL_HOUSE_ENTRANCE,
-                "pid": premise_id,
-                "phone": phone,
-                "tg": canary_telegram_id,
-                "how": how_to_address,
-            },
-        )
-        created_at_row = result.fetchone()
-        db.commit()
-    created_at = created_at_row[0] if created_at_row else None
-    return {
-        "premise_id": premise_id,
-        "phone": phone,
-        "canary_telegram_id": canary_telegram_id,
-        "how_to_address": how_to_address,
-        "created_at": created_at.isoformat() if created_at else None,
-    }
+    return _create_watermark(admin_telegram_id, None)
+
+
+def create_watermarks_for_admin(db, admin_telegram_id: str) -> int:
+    """
+    Водяные знаки нового админа по всем подъездам заранее (ADM-04): одно чтение помещений и один INSERT в
+    транзакции db (коммитит вызывающий) — первый просмотр списка контактов подъезда не создаёт запись.
+    Возвращает число созданных записей.
+    """
+    counts = db.execute(
+        text("SELECT entrance, COUNT(*) FROM premises WHERE entrance IS NOT NULL GROUP BY entrance")
+    ).fetchall()
+    offsets = [(r[0], random.randrange(r[1])) for r in counts if (r[0] or "").strip()]
+    if not offsets:
+        return 0
+    rows = db.execute(
+        text(
+            "SELECT p.entrance, p.cadastral_number FROM ("
+            f"SELECT entrance, cadastral_number, row_number() OVER (PARTITION BY entrance ORDER BY {_PREMISE_INDEX_ORDER}) - 1 AS rn "
+            "FROM premises WHERE entrance = ANY(:es)"
+            ") p JOIN unnest(CAST(:es AS text[]), CAST(:ns AS bigint[])) AS o(entrance, rn) "
+            "ON o.entrance = p.entrance AND o.rn = p.rn "
+            "ORDER BY p.entrance"
+        ),
+        {"es": [e for e, _ in offsets], "ns": [n for _, n in offsets]},
+    ).fetchall()
+    return len(_insert_watermarks(db, admin_telegram_id, [(r[0].strip(), r[1]) for r in rows]))
+
+
+# CORE-03: последний водяной знак (админ, подъезд) с данными его помещения — канарейка списка контактов без
+# запросов к export_watermarks на каждый просмотр. Сбрасывается при создании водяного знака и после импорта
+# (помещения могли измениться); generation не даёт сохранить значение, прочитанное до сброса.
+_watermark_cache: dict[tuple[str, str], tuple] = {}
+_watermark_cache_lock = threading.Lock()
+_watermark_cache_generation = 0
+
+
+def cached_watermark(admin_telegram_id: str, entrance: str) -> tuple[tuple | None, int]:
+    """(значение или None, generation для cache_watermark)."""
+    with _watermark_cache_lock:
+        return _watermark_cache.get((admin_telegram_id, entrance)), _watermark_cache_generation
+
+
+def cache_watermark(admin_telegram_id: str, entrance: str, value: tuple, generation: int) -> None:
+    with _watermark_cache_lock:
+        if generation == _watermark_cache_generation:
+            _watermark_cache[(admin_telegram_id, entrance)] = value
+
+
+def invalidate_watermark_cache() -> None:
+    global _watermark_cache_generation
+    with _watermark_cache_lock:
+        _watermark_cache_generation += 1
+        _watermark_cache.clear()
+
+
+# Водяные знаки и помещения, изменённые другим воркером
+on_invalidate("export_watermarks", invalidate_watermark_cache)
+on_invalidate("premises", invalidate_watermark_cache)
 
 
 def _telegram_link(telegram_id: str | None, phone: str | None) -> str:
@@ -744,108 +1042,113 @@ def _format_phone_display(phone: str | None) -> str:
     return phone
 
 
-def build_contacts_template_xlsx(entrance: str, canary_row: dict[str, Any] | None = None) -> tuple[bytes, int]:
+TEMPLATE_FETCH_SIZE = 1000  # строк шаблона с серверного курсора за раз (и в одной пачке decrypt_many)
+
+# SR-ADM08-005: сортировка как в CORE-03 — по типу помещения, затем по номеру (естественная).
+# Контакты inactive не выгружаются; помещение только с inactive — одна строка без контакта.
+_TEMPLATE_SQL = (
+    "SELECT p.cadastral_number, p.premises_type, p.premises_number, "
+    "c.id, c.phone, c.email, c.telegram_id, c.how_to_address, c.is_owner, "
+    "o.barrier_vote, o.vote_format, c.registered_in_ed "
+    "FROM premises p "
+    "LEFT JOIN contacts c ON c.premise_id = p.cadastral_number "
+    "AND c.status IN ('pending', 'validated') "
+    "LEFT JOIN oss_voting o ON o.contact_id = c.id "
+    "{where}"
+    "ORDER BY p.premises_type NULLS LAST, "
+    "(NULLIF(TRIM(REGEXP_REPLACE(COALESCE(p.premises_number, ''), '[^0-9].*', '')), '')::int) NULLS LAST, "
+    "p.premises_number NULLS LAST, c.id NULLS LAST"
+    "{limit}"
+)
+
+
+def _template_row(r: Any, plain: list[str | None]) -> list[Any]:
+    """Строка шаблона из строки _TEMPLATE_SQL и 4 расшифрованных полей (телефон, email, telegram_id, обращение)."""
+    cn, pt, pn = r[0], r[1], r[2]
+    if r[3] is None:
+        return [cn or "", pt or "", pn or "", "", "", "", "", "", True, "", "", ""]
+    is_owner, bv, vf, reg_ed = r[8], r[9], r[10], r[11]
+    phone_raw, email, telegram_id, how_to_address = (v or "" for v in plain)
+    phone_display = _format_phone_display(phone_raw) or phone_raw or ""
+    bv_display = BARRIER_VOTE_DISPLAY.get(bv, bv) if bv else ""
+    vf_display = VOTE_FORMAT_DISPLAY.get(vf, vf) if vf else ""
+    reg_ed_display = REGISTERED_ED_DISPLAY.get(reg_ed, reg_ed) if reg_ed else ""
+    # Колонка «Ссылка ТГ» заполняется формулой при записи (пересчитывается при редактировании D/F)
+    return [
+        cn or "", pt or "", pn or "",
+        phone_display, email or "", telegram_id or "", "", how_to_address or "",
+        is_owner if is_owner is not None else True,
+        bv_display, vf_display, reg_ed_display,
+    ]
+
+
+def _canary_line(canary_row: dict[str, Any], cn: str | None, pt: str | None, pn: str | None) -> list[Any]:
+    phone_display = _format_phone_display(canary_row["phone"]) or canary_row["phone"]
+    return [
+        cn or "", pt or "", pn or "",
+        phone_display, "", canary_row["canary_telegram_id"], "", canary_row["how_to_address"],
+        True, "", "", "",
+    ]
+
+
+def _template_rows(db, entrance: str | None, canary_row: dict[str, Any] | None, limit: int | None) -> Iterator[list[Any]]:
     """
-    ADM-08: Сформировать XLSX-шаблон контактов по подъезду.
-    Одна строка на контакт (только pending/validated; inactive не выгружаются).
-    Если у помещения только неактуальные контакты — одна строка с пустыми полями контакта.
-    canary_row: опционально dict с premise_id, phone, canary_telegram_id, how_to_address — вставляется как строка по этому помещению.
-    Возвращает (содержимое файла, количество строк данных).
+    Строки шаблона потоком: серверный курсор пачками по TEMPLATE_FETCH_SIZE, ПДн пачки — одним decrypt_many.
+    Canary — сразу после блока строк своего помещения; если помещения нет в выборке — последней строкой.
     """
-    import openpyxl
+    params: dict[str, Any] = {}
+    where = ""
+    if entrance is not None:
+        where = "WHERE p.entrance = :e "
+        params["e"] = entrance
+    limit_sql = ""
+    if limit is not None:
+        limit_sql = " LIMIT :lim"
+        params["lim"] = limit
+    result = db.execute(
+        text(_TEMPLATE_SQL.format(where=where, limit=limit_sql)),
+        params,
+        execution_options={"yield_per": TEMPLATE_FETCH_SIZE},
+    )
+    canary_pid = canary_row["premise_id"] if canary_row else None
+    canary_premise: tuple | None = None  # (cn, pt, pn), пока идёт блок помещения canary
+    for batch in result.partitions():
+        # BE-02: ПДн пачки расшифровываются одним вызовом (decrypt_many), по 4 поля на строку
+        plain = decrypt_many(v for r in batch for v in r[4:8])
+        for i, r in enumerate(batch):
+            if canary_premise is not None and r[0] != canary_pid:
+                yield _canary_line(canary_row, *canary_premise)
+                canary_premise = canary_pid = None
+            if canary_pid is not None and r[0] == canary_pid:
+                canary_premise = (r[0], r[1], r[2])
+            yield _template_row(r, plain[4 * i:4 * i + 4])
+    if canary_premise is not None:
+        yield _canary_line(canary_row, *canary_premise)
+    elif canary_pid is not None:
+        pr = db.execute(
+            text("SELECT cadastral_number, premises_type, premises_number FROM premises WHERE cadastral_number = :pid"),
+            {"pid": canary_pid},
+        ).fetchone()
+        yield _canary_line(canary_row, *(pr if pr else (canary_pid, "", "")))
+
+
+def _tg_link_formula(row_idx: int) -> str:
+    """SR-ADM08-006: «Ссылка ТГ» — формула от D (телефон) и F (telegram_id).
+    F: число — tg://user?id=, иначе https://t.me/username; D — https://t.me/+цифры."""
+    return (
+        f'=IF(F{row_idx}<>"",'
+        f'IF(ISERROR(VALUE(F{row_idx})),'
+        f'HYPERLINK("https://t.me/"&SUBSTITUTE(SUBSTITUTE(TRIM(F{row_idx}),"@","")," ",""),"\u2708"),'
+        f'HYPERLINK("tg://user?id="&F{row_idx},"\u2708")),'
+        f'IF(D{row_idx}<>"",'
+        f'HYPERLINK("https://t.me/+"&SUBSTITUTE(SUBSTITUTE(SUBSTITUTE(SUBSTITUTE(SUBSTITUTE(SUBSTITUTE(D{row_idx}," ",""),"(",""),")",""),"-",""),"+",""),".",""),"\u2708"),""))'
+    )
 
-    rows: list[list[Any]] = []
-    with get_db() as db:
-        # SR-ADM08-005: сортировка как в CORE-03 — по типу помещения, затем по номеру (естественная)
-        q = text(
-            "SELECT p.cadastral_number, p.premises_type, p.premises_number, "
-            "c.id, c.phone, c.email, c.telegram_id, c.how_to_address, c.is_owner, "
-            "o.barrier_vote, o.vote_format, c.registered_in_ed "
-            "FROM premises p "
-            "LEFT JOIN contacts c ON c.premise_id = p.cadastral_number "
-            "AND c.status IN ('pending', 'validated') "
-            "LEFT JOIN oss_voting o ON o.contact_id = c.id "
-            "WHERE p.entrance = :e "
-            "ORDER BY p.premises_type NULLS LAST, "
-            "(NULLIF(TRIM(REGEXP_REPLACE(COALESCE(p.premises_number, ''), '[^0-9].*', '')), '')::int) NULLS LAST, "
-            "p.premises_number NULLS LAST, c.id NULLS LAST"
-        )
-        result = db.execute(q, {"e": entrance}).fetchall()
-        for r in result:
-            cn, pt, pn = r[0], r[1], r[2]
-            cid, phone_enc, email_enc, tg_enc, how_enc = r[3], r[4], r[5], r[6], r[7]
-            is_owner, bv, vf, reg_ed = r[8], r[9], r[10], r[11]
-            if cid is None:
-                rows.append([cn or "", pt or "", pn or "", "", "", "", "", "", True, "", "", ""])
-            else:
-                phone_raw = decrypt(phone_enc) if phone_enc else ""
-                email = decrypt(email_enc) if email_enc else ""
-                telegram_id = decrypt(tg_enc) if tg_enc else ""
-                how_to_address = decrypt(how_enc) if how_enc else ""
-                phone_display = _format_phone_display(phone_raw) or phone_raw or ""
-                bv_display = BARRIER_VOTE_DISPLAY.get(bv, bv) if bv else ""
-                vf_display = VOTE_FORMAT_DISPLAY.get(vf, vf) if vf else ""
-                reg_ed_display = REGISTERED_ED_DISPLAY.get(reg_ed, reg_ed) if reg_ed else ""
-                # Колонка «Ссылка ТГ» заполняется формулой ниже (пересчитывается при редактировании D/F)
-                rows.append([
-                    cn or "", pt or "", pn or "",
-                    phone_display, email or "", telegram_id or "", "", how_to_address or "",
-                    is_owner if is_owner is not None else True,
-                    bv_display, vf_display, reg_ed_display,
-                ])
-
-    # Canary: вставить строку в блок помещения canary_row["premise_id"]
-    if canary_row:
-        pid = canary_row["premise_id"]
-        insert_idx = -1
-        for i, row in enumerate(rows):
-            if row[0] == pid:
-                insert_idx = i
-        if insert_idx >= 0:
-            cn, pt, pn = rows[insert_idx][0], rows[insert_idx][1], rows[insert_idx][2]
-        else:
-            with get_db() as db2:
-                pr = db2.execute(text("SELECT cadastral_number, premises_type, premises_number FROM premises WHERE cadastral_number = :pid"), {"pid": pid}).fetchone()
-                cn = pr[0] if pr else pid
-                pt = pr[1] if pr else ""
-                pn = pr[2] if pr else ""
-        phone_display = _format_phone_display(canary_row["phone"]) or canary_row["phone"]
-        canary_line = [
-            cn or "", pt or "", pn or "",
-            phone_display, "", canary_row["canary_telegram_id"], "", canary_row["how_to_address"],
-            True, "", "", "",
-        ]
-        if insert_idx >= 0:
-            rows.insert(insert_idx + 1, canary_line)
-        else:
-            rows.append(canary_line)
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    if ws is None:
-        ws = wb.create_sheet("Контакты")
-    ws.title = "Контакты"
-    ws.append(CONTACTS_TEMPLATE_HEADERS_RU)
-    for row in rows:
-        ws.append(row)
-
-    # SR-ADM08-006: колонка «Ссылка ТГ» — формула от D (телефон) и F (telegram_id), пересчитывается при редактировании
-    g_col = COL_TG_LINK + 1
-    for row_idx in range(2, len(rows) + 2):
-        # F=telegram_id: если число — tg://user?id=; иначе https://t.me/username. D=телефон — https://t.me/+цифры
-        formula = (
-            f'=IF(F{row_idx}<>"",'
-            f'IF(ISERROR(VALUE(F{row_idx})),'
-            f'HYPERLINK("https://t.me/"&SUBSTITUTE(SUBSTITUTE(TRIM(F{row_idx}),"@","")," ",""),"\u2708"),'
-            f'HYPERLINK("tg://user?id="&F{row_idx},"\u2708")),'
-            f'IF(D{row_idx}<>"",'
-            f'HYPERLINK("https://t.me/+"&SUBSTITUTE(SUBSTITUTE(SUBSTITUTE(SUBSTITUTE(SUBSTITUTE(SUBSTITUTE(D{row_idx}," ",""),"(",""),")",""),"-",""),"+",""),".",""),"\u2708"),""))'
-        )
-        ws.cell(row=row_idx, column=g_col).value = formula
 
-    # Data Validation: выпадающие списки для позиции по шлагбаумам и формата голосования (openpyxl поддерживает)
+def _template_validations(max_row: int) -> list[Any]:
+    """Выпадающие списки: позиция по шлагбаумам (J), формат голосования (K), Электронный дом (L)."""
     from openpyxl.worksheet.datavalidation import DataValidation
-    max_row = len(rows) + 1
+
     dv_bv = DataValidation(
         type="list",
         formula1='"ЗА,Против,Не определился"',
@@ -854,7 +1157,6 @@ def build_contacts_template_xlsx(entrance: str, canary_row: dict[str, Any] | Non
         prompt="Выберите: ЗА, Против, Не определился",
     )
     dv_bv.add(f"J2:J{max_row}")
-    ws.add_data_validation(dv_bv)
     dv_vf = DataValidation(
         type="list",
         formula1='"Электронно,Бумага,Не определился"',
@@ -863,7 +1165,6 @@ def build_contacts_template_xlsx(entrance: str, canary_row: dict[str, Any] | Non
         prompt="Выберите: Электронно, Бумага, Не определился",
     )
     dv_vf.add(f"K2:K{max_row}")
-    ws.add_data_validation(dv_vf)
     dv_re = DataValidation(
         type="list",
         formula1='"Да,Нет"',
@@ -872,143 +1173,63 @@ def build_contacts_template_xlsx(entrance: str, canary_row: dict[str, Any] | Non
         prompt="Зарегистрирован в Электронном доме: Да, Нет",
     )
     dv_re.add(f"L2:L{max_row}")
-    ws.add_data_validation(dv_re)
-
-    ws.freeze_panes = "A2"
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer.getvalue(), len(rows)
+    return [dv_bv, dv_vf, dv_re]
 
 
-def build_contacts_template_xlsx_full_house(canary_row: dict[str, Any] | None = None) -> tuple[bytes, int]:
+def write_contacts_template_xlsx(
+    out: BinaryIO,
+    entrance: str | None = None,
+    canary_row: dict[str, Any] | None = None,
+    limit: int | None = None,
+) -> int:
     """
-    Шаблон контактов по всем помещениям дома (без фильтра по подъезду).
-    Контакты inactive не выгружаются; только inactive — как пустое помещение.
-    Лимит FULL_HOUSE_ROW_LIMIT строк. Один canary по случайному помещению — опционально (canary_row).
-    Возвращает (содержимое файла, количество строк данных).
+    ADM-08: записать XLSX-шаблон контактов в out (entrance=None — весь дом). Возвращает число строк данных.
+    Строки идут потоком из _template_rows в лист write_only (openpyxl держит в памяти не лист, а текущую строку),
+    формулы и проверки данных — по мере записи; память не зависит от размера дома.
     """
     import openpyxl
 
-    rows = []
-    with get_db() as db:
-        q = text(
-            "SELECT p.cadastral_number, p.premises_type, p.premises_number, "
-            "c.id, c.phone, c.email, c.telegram_id, c.how_to_address, c.is_owner, "
-            "o.barrier_vote, o.vote_format, c.registered_in_ed "
-            "FROM premises p "
-            "LEFT JOIN contacts c ON c.premise_id = p.cadastral_number "
-            "AND c.status IN ('pending', 'validated') "
-            "LEFT JOIN oss_voting o ON o.contact_id = c.id "
-            "ORDER BY p.premises_type NULLS LAST, "
-            "(NULLIF(TRIM(REGEXP_REPLACE(COALESCE(p.premises_number, ''), '[^0-9].*', '')), '')::int) NULLS LAST, "
-            "p.premises_number NULLS LAST, c.id NULLS LAST "
-            "LIMIT :lim"
-        )
-        result = db.execute(q, {"lim": FULL_HOUSE_ROW_LIMIT}).fetchall()
-        for r in result:
-            cn, pt, pn = r[0], r[1], r[2]
-            cid, phone_enc, email_enc, tg_enc, how_enc = r[3], r[4], r[5], r[6], r[7]
-            is_owner, bv, vf, reg_ed = r[8], r[9], r[10], r[11]
-            if cid is None:
-                rows.append([cn or "", pt or "", pn or "", "", "", "", "", "", True, "", "", ""])
-            else:
-                phone_raw = decrypt(phone_enc) if phone_enc else ""
-                email = decrypt(email_enc) if email_enc else ""
-                telegram_id = decrypt(tg_enc) if tg_enc else ""
-                how_to_address = decrypt(how_enc) if how_enc else ""
-                phone_display = _format_phone_display(phone_raw) or phone_raw or ""
-                bv_display = BARRIER_VOTE_DISPLAY.get(bv, bv) if bv else ""
-                vf_display = VOTE_FORMAT_DISPLAY.get(vf, vf) if vf else ""
-                reg_ed_display = REGISTERED_ED_DISPLAY.get(reg_ed, reg_ed) if reg_ed else ""
-                rows.append([
-                    cn or "", pt or "", pn or "",
-                    phone_display, email or "", telegram_id or "", "", how_to_address or "",
-                    is_owner if is_owner is not None else True,
-                    bv_display, vf_display, reg_ed_display,
-                ])
-
-    if canary_row:
-        pid = canary_row["premise_id"]
-        insert_idx = -1
-        for i, row in enumerate(rows):
-            if row[0] == pid:
-                insert_idx = i
-        if insert_idx >= 0:
-            cn, pt, pn = rows[insert_idx][0], rows[insert_idx][1], rows[insert_idx][2]
-        else:
-            with get_db() as db2:
-                pr = db2.execute(
-                    text("SELECT cadastral_number, premises_type, premises_number FROM premises WHERE cadastral_number = :pid"),
-                    {"pid": pid},
-                ).fetchone()
-                cn = pr[0] if pr else pid
-                pt = pr[1] if pr else ""
-                pn = pr[2] if pr else ""
-        phone_display = _format_phone_display(canary_row["phone"]) or canary_row["phone"]
-        canary_line = [
-            cn or "", pt or "", pn or "",
-            phone_display, "", canary_row["canary_telegram_id"], "", canary_row["how_to_address"],
-            True, "", "", "",
-        ]
-        if insert_idx >= 0:
-            rows.insert(insert_idx + 1, canary_line)
-        else:
-            rows.append(canary_line)
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    if ws is None:
-        ws = wb.create_sheet("Контакты")
-    ws.title = "Контакты"
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Контакты")
+    ws.freeze_panes = "A2"
     ws.append(CONTACTS_TEMPLATE_HEADERS_RU)
-    for row in rows:
-        ws.append(row)
-
-    g_col = COL_TG_LINK + 1
-    for row_idx in range(2, len(rows) + 2):
-        formula = (
-            f'=IF(F{row_idx}<>"",'
-            f'IF(ISERROR(VALUE(F{row_idx})),'
-            f'HYPERLINK("https://t.me/"&SUBSTITUTE(SUBSTITUTE(TRIM(F{row_idx}),"@","")," ",""),"\u2708"),'
-            f'HYPERLINK("tg://user?id="&F{row_idx},"\u2708")),'
-            f'IF(D{row_idx}<>"",'
-            f'HYPERLINK("https://t.me/+"&SUBSTITUTE(SUBSTITUTE(SUBSTITUTE(SUBSTITUTE(SUBSTITUTE(SUBSTITUTE(D{row_idx}," ",""),"(",""),")",""),"-",""),"+",""),".",""),"\u2708"),""))'
-        )
-        ws.cell(row=row_idx, column=g_col).value = formula
+    row_count = 0
+    with get_db() as db:
+        for row in _template_rows(db, entrance, canary_row, limit):
+            row_count += 1
+            row[COL_TG_LINK] = _tg_link_formula(row_count + 1)
+            ws.append(row)
+    for dv in _template_validations(row_count + 1):
+        ws.data_validations.append(dv)
+    wb.save(out)
+    return row_count
 
-    from openpyxl.worksheet.datavalidation import DataValidation
-    max_row = len(rows) + 1
-    dv_bv = DataValidation(
-        type="list",
-        formula1='"ЗА,Против,Не определился"',
-        allow_blank=True,
-        promptTitle="Позиция по шлагбаумам",
-        prompt="Выберите: ЗА, Против, Не определился",
-    )
-    dv_bv.add(f"J2:J{max_row}")
-    ws.add_data_validation(dv_bv)
-    dv_vf = DataValidation(
-        type="list",
-        formula1='"Электронно,Бумага,Не определился"',
-        allow_blank=True,
-        promptTitle="Формат голосования",
-        prompt="Выберите: Электронно, Бумага, Не определился",
-    )
-    dv_vf.add(f"K2:K{max_row}")
-    ws.add_data_validation(dv_vf)
-    dv_re = DataValidation(
-        type="list",
-        formula1='"Да,Нет"',
-        allow_blank=True,
-        promptTitle="Электронный дом",
-        prompt="Зарегистрирован в Электронном доме: Да, Нет",
-    )
-    dv_re.add(f"L2:L{max_row}")
-    ws.add_data_validation(dv_re)
 
-    ws.freeze_panes = "A2"
+def build_contacts_template_xlsx(entrance: str, canary_row: dict[str, Any] | None = None) -> tuple[bytes, int]:
+    """
+    ADM-08: Сформировать XLSX-шаблон контактов по подъезду.
+    Одна строка на контакт (только pending/validated; inactive не выгружаются).
+    Если у помещения только неактуальные контакты — одна строка с пустыми полями контакта.
+    canary_row: опционально dict с premise_id, phone, canary_telegram_id, how_to_address — вставляется как строка по этому помещению.
+    Возвращает (содержимое файла, количество строк данных).
+    """
     buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer.getvalue(), len(rows)
+    row_count = write_contacts_template_xlsx(buffer, entrance, canary_row)
+    return buffer.getvalue(), row_count
+
+
+def build_contacts_template_xlsx_full_house(canary_row: dict[str, Any] | None = None) -> tuple[BinaryIO, int]:
+    """
+    Шаблон контактов по всем помещениям дома (без фильтра по подъезду).
+    Лимит FULL_HOUSE_ROW_LIMIT строк. Один canary по случайному помещению — опционально (canary_row).
+    Книга пишется во временный файл; возвращает (файл, перемотанный на начало, количество строк данных) —
+    вызывающий отдаёт его потоком и закрывает.
+    """
+    out = tempfile.TemporaryFile()
+    try:
+        row_count = write_contacts_template_xlsx(out, None, canary_row, FULL_HOUSE_ROW_LIMIT)
+    except BaseException:
+        out.close()
+        raise
+    out.seek(0)
+    return out, row_count
@@ -10,12 +10,12 @@ import re
 import uuid
 from collections import defaultdict
 from decimal import Decimal, InvalidOperation
-from typing import Any
+from typing import Any, BinaryIO, Callable, Iterable, Iterator
 
 from sqlalchemy import text
 
 from app.db import get_db
-from app.import_register import COLUMN_ALIASES, _read_csv, _read_xls, _read_xlsx, _row_to_dict
+from app.import_register import _BULK_CHUNK, COLUMN_ALIASES, _row_to_dict, read_table
 
 logger = logging.getLogger(__name__)
 
@@ -52,24 +52,14 @@ def _map_headers_voting(headers: list[str]) -> dict[str, int]:
     return canonical_to_idx
 
 
-def parse_voting_participation_file(content: bytes, filename: str) -> tuple[list[str], list[str], list[dict[str, Any]]]:
-    """Распарсить файл; вернуть (original_headers, canonical_columns, rows)."""
-    fn = (filename or "").lower()
-    if fn.endswith(".csv"):
-        headers, data_rows = _read_csv(content)
-    elif fn.endswith(".xlsx"):
-        headers, data_rows = _read_xlsx(content)
-    elif fn.endswith(".xls"):
-        headers, data_rows = _read_xls(content)
-    else:
-        if content[:4] == b"PK\x03\x04":
-            headers, data_rows = _read_xlsx(content)
-        else:
-            headers, data_rows = _read_csv(content)
-
+def parse_voting_participation_file(
+    source: bytes | BinaryIO, filename: str
+) -> tuple[list[str], list[str], Iterator[dict[str, Any]]]:
+    """Распарсить файл (байты или UploadFile.file); вернуть (original_headers, canonical_columns, итератор rows)."""
+    headers, data_rows = read_table(source, filename)
     original_headers = [h for h in headers if (h or "").strip()]
     mapping = _map_headers_voting(headers)
-    rows = [_row_to_dict(r, mapping) for r in data_rows]
+    rows = (_row_to_dict(r, mapping) for r in data_rows)
     return original_headers, list(mapping.keys()), rows
 
 
@@ -119,14 +109,16 @@ def normalize_ownership_share(val: Any) -> Decimal | None:
 
 
 def run_import_voting_participation(
-    rows: list[dict[str, Any]],
+    rows: Iterable[dict[str, Any]],
     *,
     user_id: str | None = None,
     client_ip: str | None = None,
+    on_progress: Callable[[int], None] | None = None,
 ) -> dict[str, Any]:
     """
     CORE-05: импорт участия в голосовании.
     Полная перезапись oss_participation; агрегация строк с одинаковой парой кадастр+доля.
+    on_progress(число обработанных строк) вызывается каждые _BULK_CHUNK строк.
     """
     accepted = 0
     rejected = 0
@@ -138,10 +130,35 @@ def run_import_voting_participation(
     aggregated: dict[tuple[str, Decimal], Decimal] = defaultdict(lambda: Decimal(0))
     # сумма всех долей по кадастру (после агрегации по парам — суммируем итоговые группы)
     cadastral_totals: dict[str, Decimal] = defaultdict(lambda: Decimal(0))
+    # Строки с корректной долей, ждущие проверки помещений (одним запросом на пачку): (row, кадастр, доля)
+    pending: list[tuple[int, str, Decimal]] = []
+
+    def flush_pending(db) -> None:
+        nonlocal accepted, rejected
+        if not pending:
+            return
+        found = {
+            r[0] for r in db.execute(
+                text("SELECT cadastral_number FROM premises WHERE cadastral_number = ANY(:cns)"),
+                {"cns": list({cn for _, cn, _ in pending})},
+            ).fetchall()
+        }
+        for row_num, cadastral, share in pending:
+            if cadastral not in found:
+                errors.append({"row": row_num, "message": f"Premise not found: {cadastral}"})
+                rejected += 1
+                continue
+            aggregated[(cadastral, share)] += share
+            accepted += 1
+        pending.clear()
 
     with get_db() as db:
         try:
             for row_num, row in enumerate(rows, start=2):
+                if (row_num - 2) and (row_num - 2) % _BULK_CHUNK == 0:
+                    flush_pending(db)
+                    if on_progress:
+                        on_progress(row_num - 2)
                 cadastral = (row.get("cadastral_number") or "").strip()
                 if not cadastral:
                     errors.append({"row": row_num, "message": "Missing required field: cadastral_number"})
@@ -158,33 +175,29 @@ def run_import_voting_participation(
                     rejected += 1
                     continue
 
-                premise_row = db.execute(
-                    text("SELECT 1 FROM premises WHERE cadastral_number = :cn"),
-                    {"cn": cadastral},
-                ).fetchone()
-                if not premise_row:
-                    errors.append({"row": row_num, "message": f"Premise not found: {cadastral}"})
-                    rejected += 1
-                    continue
-
-                key = (cadastral, share)
-                aggregated[key] += share
-                accepted += 1
+                pending.append((row_num, cadastral, share))
+            flush_pending(db)
+            # Ошибки «помещение не найдено» добавляются при проверке пачки — вернуть порядок строк
+            errors.sort(key=lambda e: e["row"])
 
             db.execute(text("DELETE FROM oss_participation"))
 
-            for (cadastral, share_key), total_share in aggregated.items():
+            for (cadastral, _share_key), total_share in aggregated.items():
                 cadastral_totals[cadastral] += total_share
+            # Одним INSERT: триггер premise_quorum_stats (FOR EACH STATEMENT) срабатывает один раз на импорт
+            if aggregated:
                 db.execute(
                     text(
                         "INSERT INTO oss_participation "
                         "(premise_id, share_nominal, ownership_share, participated, import_batch_id) "
-                        "VALUES (:pid, :nominal, :total, true, :batch)"
+                        "SELECT v.pid, v.nominal, v.total, true, :batch "
+                        "FROM unnest(CAST(:pids AS text[]), CAST(:nominals AS numeric[]), CAST(:totals AS numeric[])) "
+                        "AS v(pid, nominal, total)"
                     ),
                     {
-                        "pid": cadastral,
-                        "nominal": share_key,
-                        "total": total_share,
+                        "pids": [cadastral for cadastral, _ in aggregated],
+                        "nominals": [share_key for _, share_key in aggregated],
+                        "totals": list(aggregated.values()),
                         "batch": batch_id,
                     },
                 )
@@ -3,7 +3,9 @@
 Точка входа FastAPI. Запуск: uvicorn app.main:app --host 0.0.0.0 --port 8000
 LOST-01, BE-02, ADM-01, ADM-04 (03-basic-admin). OPS-03: /health проверяет БД.
 """
+import logging
 import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -13,6 +15,8 @@ from sqlalchemy import text
 from app.db import get_db
 from app.routers import admin_contacts, audit, auth, bot, import_register, policy, premises, quorum, submit, superadmin
 
+logger = logging.getLogger(__name__)
+
 # SR-OPS02-001: единый текст 503 без внутренних деталей
 SERVICE_UNAVAILABLE_DETAIL = "Service temporarily unavailable"
 
@@ -44,10 +48,42 @@ app.include_router(bot.router)
 
 @app.on_event("startup")
 def startup():
-    """BE-02: при наличии MASTER_KEY_PATH проверить ключ при старте (AF-1)."""
+    """
+    BE-02: при наличии MASTER_KEY_PATH проверить ключ при старте (AF-1). Возобновить задачи импорта.
+    BE-03: секции audit_log, дослать события аудита из файла-очереди прошлого запуска.
+    BOT-01 / CORE-03: слушатель сброса кэшей (app.cache_sync).
+    """
     if os.environ.get("MASTER_KEY_PATH"):
         from app.crypto import get_fernet
         get_fernet()
+    # Фоновые задачи импорта, прерванные рестартом, — перезапустить
+    try:
+        from app.import_jobs import resume_jobs
+        resume_jobs()
+    except Exception:
+        logger.exception("Import jobs resume failed")
+    # BE-03: месячные секции audit_log на AUDIT_PARTITIONS_AHEAD месяцев вперёд
+    try:
+        from app.audit_archive import ensure_partitions
+        ensure_partitions()
+    except Exception:
+        logger.exception("Audit log partitions check failed")
+    from app.audit_log import start_audit_writer
+    start_audit_writer()
+    # Сброс кэшей процесса по изменениям, сделанным другими воркерами
+    from app.cache_sync import start_cache_sync
+    start_cache_sync()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    """BE-03: дописать буфер аудита до остановки процесса. Остановить heartbeat задач импорта."""
+    from app.audit_log import stop_audit_writer
+    stop_audit_writer()
+    from app.cache_sync import stop_cache_sync
+    stop_cache_sync()
+    from app.import_jobs import stop_import_jobs
+    stop_import_jobs()
 
 
 @app.get("/health")
@@ -0,0 +1,159 @@
+"""
+FE-03 / FE-06 / CORE-04: кэш ответов публичных эндпоинтов чтения (каскад помещений, шахматка, кворум) и ETag.
+Ключ — (пространство эндпоинта, параметры запроса); TTL и ограничение размера (вытесняется давно не читанное).
+Данные меняются только импортом и записью контактов — эти пути вызывают invalidate() после коммита,
+TTL страхует от пропущенной инвалидации. Кэш в памяти процесса: в других воркерах изменение помещений сбрасывает
+его через app.cache_sync, изменения контактов доходят по TTL.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.cache_sync import on_invalidate
+from app.config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS
+
+
+class ResponseCache:
+    """LRU с TTL и счётчиками попаданий/промахов. Потокобезопасен (sync-эндпоинты FastAPI — в пуле потоков)."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: tuple) -> tuple[bool, Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def put(self, key: tuple, value: Any, generation: int) -> None:
+        """Сохранить, если с начала расчёта не было инвалидации (иначе значение могло устареть)."""
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *namespaces: str) -> None:
+        """Сбросить записи указанных пространств; без аргументов — весь кэш."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if not namespaces:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if k[0] in namespaces]:
+                del self._data[key]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
+
+# Пространства ключей: premises.* зависят только от помещений (импорт реестра), остальные — и от контактов/ОСС
+NS_ENTRANCES = "premises.entrances"
+NS_FLOORS = "premises.floors"
+NS_TYPES = "premises.types"
+NS_NUMBERS = "premises.numbers"
+NS_CHESSBOARD = "premises.chessboard"
+NS_QUORUM = "quorum"
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match: «*» или список тегов; сравнение слабое (W/ от nginx gzip не мешает)."""
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def cached_response(namespace: str) -> Callable:
+    """
+    Декоратор sync-эндпоинта: ответ кэшируется по (namespace, именованные аргументы) уже сериализованным,
+    вместе с ETag — хэшем тела. If-None-Match с тем же ETag — 304 без тела; при попадании в кэш — и без запросов к БД.
+    ETag от содержимого: после инвалидации неизменившиеся данные дают тот же тег, рестарт его не сбивает.
+    К сигнатуре эндпоинта добавляется request — FastAPI разбирает параметры запроса как обычно.
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(request: Request, **kwargs: Any) -> Response:
+            key = (namespace, tuple(sorted(kwargs.items())))
+            found, entry = _cache.get(key)
+            if not found:
+                generation = _cache.generation()
+                body = json.dumps(
+                    jsonable_encoder(fn(**kwargs)), ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+                ).encode("utf-8")
+                entry = ('"%s"' % hashlib.sha256(body).hexdigest()[:32], body)
+                _cache.put(key, entry, generation)
+            etag, body = entry
+            # no-cache: браузер хранит ответ, но каждый опрос перепроверяет его через If-None-Match
+            headers = {"ETag": etag, "Cache-Control": "no-cache"}
+            if _etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=headers)
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        sig = inspect.signature(fn)
+        wrapper.__signature__ = sig.replace(parameters=[
+            *sig.parameters.values(),
+            inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+        ])
+        return wrapper
+    return decorator
+
+
+def invalidate(*namespaces: str) -> None:
+    """Вызывать после коммита записи: импорт, submit, бот, админка. Без аргументов — сбросить всё."""
+    _cache.invalidate(*namespaces)
+
+
+# Импорт реестра в другом воркере: сбросить всё (списки помещений, шахматка, кворум)
+on_invalidate("premises", invalidate)
+
+
+def invalidate_contacts() -> None:
+    """Изменились контакты / голосование / участие: шахматка и кворум (списки помещений не зависят)."""
+    _cache.invalidate(NS_CHESSBOARD, NS_QUORUM)
+
+
+def cache_stats() -> dict[str, Any]:
+    return _cache.stats()
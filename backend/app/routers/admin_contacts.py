@@ -2,6 +2,9 @@
 ADM-03: POST /api/admin/contacts — добавление контакта админом.
 VAL-01: GET /api/admin/contacts — список контактов; PATCH …/status — смена статуса.
 """
+import base64
+import binascii
+import json
 import logging
 import re
 from typing import Any
@@ -11,11 +14,13 @@ from pydantic import BaseModel, Field
 
 from sqlalchemy import text
 
+from app.audit_log import record_audit, write_audit
 from app.client_ip import get_client_ip
 from app.db import get_db
-from app.import_register import create_watermark
+from app.import_register import allocate_watermark, cache_watermark, cached_watermark, invalidate_watermark_cache
 from app.jwt_utils import require_admin_with_consent
-from app.crypto import decrypt, encrypt, blind_index_phone, blind_index_email, blind_index_telegram_id
+from app.response_cache import invalidate_contacts
+from app.crypto import decrypt, decrypt_many, encrypt, blind_index_phone, blind_index_email, blind_index_telegram_id
 from app.validators import validate_phone, validate_email, validate_telegram_id
 
 logger = logging.getLogger(__name__)
@@ -34,6 +39,66 @@ def _contact_list_sort_key(item: dict[str, Any]) -> tuple[str, int, str]:
     return (pt, num, pn)
 
 
+# VAL-01: тот же ключ в SQL (+ c.id для однозначности) — сортировка и keyset-пагинация на стороне БД.
+# COLLATE "C" — побайтовое сравнение UTF-8, совпадает с порядком строк Python (ключ канарейки считается в Python).
+_SORT_PT_SQL = "COALESCE(TRIM(p.premises_type), '') COLLATE \"C\""
+_SORT_NUM_SQL = (
+    "COALESCE(NULLIF(REGEXP_REPLACE(TRIM(COALESCE(p.premises_number, '')), '[^0-9].*', ''), '')::numeric, 999999)"
+)
+_SORT_PN_SQL = "COALESCE(TRIM(p.premises_number), '') COLLATE \"C\""
+CONTACTS_PAGE_DEFAULT = 100
+CONTACTS_PAGE_MAX = 500
+
+# Режим ПДн в списке: full — расшифровка; flags — только признаки наличия (без расшифровки и без ПДн в ответе)
+PII_MODE_FULL = "full"
+PII_MODE_FLAGS = "flags"
+PII_MODES = (PII_MODE_FULL, PII_MODE_FLAGS)
+PII_FIELDS = ("phone", "email", "telegram_id", "how_to_address")
+_PII_PRESENT_SQL = ", ".join(f"COALESCE(c.{f}, '') <> '' AS has_{f}" for f in PII_FIELDS)
+# Столбцов в строке страницы списка (SELECT в list_contacts)
+_PAGE_COLUMNS = 25
+
+# Последний watermark админа по подъезду с данными помещения (кортеж для cache_watermark)
+_CANARY_SQL = (
+    "SELECT w.premise_id, w.phone, w.canary_telegram_id, w.how_to_address, w.created_at, "
+    "wp.entrance, wp.floor, wp.premises_type, wp.premises_number "
+    "FROM export_watermarks w LEFT JOIN premises wp ON wp.cadastral_number = w.premise_id "
+    "WHERE w.admin_telegram_id = :w_aid AND w.entrance = :w_e "
+    "ORDER BY w.created_at DESC, w.id DESC LIMIT 1"
+)
+_CANARY_COLUMNS = 9
+
+
+def _latest_canary(admin_id: str, entrance: str) -> tuple | None:
+    """Последний watermark админа по подъезду (кортеж _CANARY_SQL) — тот же кэш и запрос, что у списка."""
+    w, generation = cached_watermark(admin_id, entrance)
+    if w is None:
+        with get_db() as db:
+            row = db.execute(text(_CANARY_SQL), {"w_aid": admin_id, "w_e": entrance}).fetchone()
+        if row is None:
+            return None
+        w = tuple(row)
+        cache_watermark(admin_id, entrance, w, generation)
+    return w
+
+
+def _mask_pii(item: dict[str, Any]) -> dict[str, Any]:
+    return {**item, **{f: None for f in PII_FIELDS}}
+
+
+def _encode_cursor(key: tuple) -> str:
+    """Курсор страницы: ключ сортировки последней записи (pt, num, pn, id) — непрозрачная строка для клиента."""
+    return base64.urlsafe_b64encode(json.dumps(list(key), ensure_ascii=False).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int, str, int]:
+    try:
+        pt, num, pn, cid = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (str(pt), int(num), str(pn), int(cid))
+    except (ValueError, TypeError, UnicodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/contacts")
 def list_contacts(
     request: Request,
@@ -44,12 +109,23 @@ def list_contacts(
     ip: str | None = Query(None, description="Фильтр по IP (ADM-02)"),
     from_date: str | None = Query(None, description="Начало диапазона дат created_at (ISO)"),
     to_date: str | None = Query(None, description="Конец диапазона дат created_at (ISO)"),
+    limit: int = Query(CONTACTS_PAGE_DEFAULT, ge=1, le=CONTACTS_PAGE_MAX, description="Размер страницы"),
+    cursor: str | None = Query(None, description="next_cursor предыдущей страницы"),
+    pii: str = Query(PII_MODE_FULL, description="full — ПДн расшифрованы; flags — только признаки has_*"),
     payload: dict = Depends(require_admin_with_consent),
 ) -> dict[str, Any]:
     """
-    VAL-01 / CORE-03 / ADM-02: Список контактов для модерации. Расшифровка ПДн на лету.
+    VAL-01 / CORE-03 / ADM-02: Список контактов для модерации, постранично (keyset по натуральному порядку помещений).
     Фильтры: entrance, premise_id, premises_number, status, ip, from_date, to_date.
+    ПДн расшифровываются только для возвращаемой страницы. total считается отдельным COUNT на первой странице
+    (без cursor); на следующих — null. next_cursor = null — страниц больше нет.
+    pii=flags: ПДн не расшифровываются и не отдаются (phone/email/telegram_id/how_to_address = null),
+    признаки has_* считаются в SQL; значения — по запросу через POST /api/admin/contacts/reveal.
     """
+    if pii not in PII_MODES:
+        raise HTTPException(status_code=400, detail="pii должен быть 'full' или 'flags'")
+    masked = pii == PII_MODE_FLAGS
+    after = _decode_cursor(cursor) if cursor else None
     clauses = []
     params: dict[str, Any] = {}
     if entrance:
@@ -77,33 +153,153 @@ def list_contacts(
         clauses.append("c.created_at <= :to_ts")
         params["to_ts"] = to_val
     where = (" AND ".join(clauses)) if clauses else "1=1"
+    page_where = where
+    if after:
+        page_where += f" AND ({_SORT_PT_SQL}, {_SORT_NUM_SQL}, {_SORT_PN_SQL}, c.id) > (:k_pt, :k_num, :k_pn, :k_id)"
+        params.update({"k_pt": after[0], "k_num": after[1], "k_pn": after[2], "k_id": after[3]})
 
+    # Canary: последний watermark админа по подъезду — из кэша процесса или тем же запросом, что и страница
+    admin_id = payload.get("sub")
+    canary_entrance = entrance.strip() if entrance and admin_id else None
+    w, w_generation = cached_watermark(admin_id, canary_entrance) if canary_entrance else (None, 0)
+    lookup_canary = canary_entrance is not None and w is None
+
+    # limit + 1 строка — признак следующей страницы
+    page_sql = (
+        f"SELECT c.id, c.premise_id, c.is_owner, c.phone, c.email, c.telegram_id, c.how_to_address, "
+        f"c.registered_in_ed, c.status, c.created_at, c.updated_at, c.ip, "
+        f"p.entrance, p.floor, p.premises_type, p.premises_number, "
+        f"o.barrier_vote, o.vote_format, "
+        f"{_SORT_PT_SQL} AS sk_pt, {_SORT_NUM_SQL} AS sk_num, {_SORT_PN_SQL} AS sk_pn, "
+        f"{_PII_PRESENT_SQL} "
+        f"FROM contacts c "
+        f"LEFT JOIN premises p ON p.cadastral_number = c.premise_id "
+        f"LEFT JOIN oss_voting o ON o.contact_id = c.id "
+        f"WHERE {page_where} "
+        f"ORDER BY sk_pt, sk_num, sk_pn, c.id "
+        f"LIMIT :lim"
+    )
+    # Страница, watermark и total (на первой странице) — одним запросом: (SELECT 1) даёт строку и при пустой странице
+    ctes = [f"page AS ({page_sql})"]
+    columns = ["page.*"]
+    joins = ["LEFT JOIN page ON true"]
+    if lookup_canary:
+        ctes.append(f"w AS ({_CANARY_SQL})")
+        columns.append("w.*")
+        joins.append("LEFT JOIN w ON true")
+        params.update({"w_aid": admin_id, "w_e": canary_entrance})
+    if after is None:
+        ctes.append(
+            f"cnt AS (SELECT COUNT(*) AS total FROM contacts c "
+            f"LEFT JOIN premises p ON p.cadastral_number = c.premise_id WHERE {where})"
+        )
+        columns.append("cnt.total")
+        joins.append("CROSS JOIN cnt")
+    total = None
     with get_db() as db:
-        rows = db.execute(
+        raw = db.execute(
             text(
-                f"SELECT c.id, c.premise_id, c.is_owner, c.phone, c.email, c.telegram_id, c.how_to_address, "
-                f"c.registered_in_ed, c.status, c.created_at, c.updated_at, c.ip, "
-                f"p.entrance, p.floor, p.premises_type, p.premises_number, "
-                f"o.barrier_vote, o.vote_format "
-                f"FROM contacts c "
-                f"LEFT JOIN premises p ON p.cadastral_number = c.premise_id "
-                f"LEFT JOIN oss_voting o ON o.contact_id = c.id "
-                f"WHERE {where}"
+                f"WITH {', '.join(ctes)} "
+                f"SELECT {', '.join(columns)} FROM (SELECT 1) AS one {' '.join(joins)} "
+                f"ORDER BY page.sk_pt, page.sk_num, page.sk_pn, page.id"
             ),
-            params,
+            {**params, "lim": limit + 1},
         ).fetchall()
+        rows = [r[:_PAGE_COLUMNS] for r in raw if r[0] is not None]
+        if lookup_canary and raw[0][_PAGE_COLUMNS] is not None:
+            w = tuple(raw[0][_PAGE_COLUMNS:_PAGE_COLUMNS + _CANARY_COLUMNS])
+        if after is None:
+            total = raw[0][-1] or 0
+        if lookup_canary and w is None:
+            # Первый просмотр подъезда админом без watermark — создать в той же сессии
+            mark = allocate_watermark(db, admin_id, canary_entrance)
+            if mark:
+                prem = db.execute(
+                    text(
+                        "SELECT entrance, floor, premises_type, premises_number "
+                        "FROM premises WHERE cadastral_number = :pid"
+                    ),
+                    {"pid": mark["premise_id"]},
+                ).fetchone()
+                db.commit()
+                invalidate_watermark_cache()
+                w_generation = cached_watermark(admin_id, canary_entrance)[1]
+                w = (
+                    mark["premise_id"], mark["phone"], mark["canary_telegram_id"], mark["how_to_address"],
+                    mark["created_at"], *(prem or (None, None, None, None)),
+                )
+    if lookup_canary and w is not None:
+        cache_watermark(admin_id, canary_entrance, w, w_generation)
+
+    # (ключ сортировки, строка БД | готовый элемент канарейки)
+    entries: list[tuple[tuple, Any]] = [((r[18], int(r[19]), r[20], r[0]), r) for r in rows]
 
+    # Канареечный контакт подчиняется тем же фильтрам, что и остальные записи (premises_number, premise_id, status;
+    # при активных ip/from_date/to_date не показываем — у канарейки нет ip/created_at).
+    if w:
+        prem = w[5:9]
+        show_canary = True
+        if premises_number and (prem[3] or "").strip() != premises_number.strip():
+            show_canary = False
+        if premise_id and w[0] != premise_id:
+            show_canary = False
+        if status and status != "pending":
+            show_canary = False
+        if ip or from_date or to_date:
+            show_canary = False
+        if show_canary:
+            canary_item = {
+                "id": -1,
+                "premise_id": w[0],
+                "is_owner": True,
+                "phone": w[1],
+                "email": None,
+                "telegram_id": w[2],
+                "how_to_address": w[3],
+                "registered_ed": None,
+                "status": "pending",
+                "created_at": w[4].isoformat() if hasattr(w[4], "isoformat") else w[4],
+                "updated_at": None,
+                "ip": None,
+                "entrance": prem[0],
+                "floor": prem[1],
+                "premises_type": prem[2],
+                "premises_number": prem[3],
+                "barrier_vote": None,
+                "vote_format": None,
+                "is_canary": True,
+                "has_phone": bool(w[1]),
+                "has_email": False,
+                "has_telegram_id": bool(w[2]),
+                "has_how_to_address": bool(w[3]),
+            }
+            canary_key = (*_contact_list_sort_key(canary_item), -1)
+            if after is None or canary_key > after:
+                entries.append((canary_key, canary_item))
+                entries.sort(key=lambda e: e[0])
+            if after is None:
+                total += 1
+
+    page = entries[:limit]
+    next_cursor = _encode_cursor(page[-1][0]) if len(entries) > limit else None
+    db_rows = [r for _, r in page if not isinstance(r, dict)]
+    # BE-02: ПДн расшифровываются только для строк страницы, одной пачкой (decrypt_many), по 4 поля на строку
+    plain = iter([None] * (4 * len(db_rows)) if masked else decrypt_many(v for r in db_rows for v in r[3:7]))
     items = []
     contact_ids = []
-    for r in rows:
+    for _, r in page:
+        if isinstance(r, dict):
+            items.append(_mask_pii(r) if masked else r)
+            continue
+        phone, email, telegram_id, how_to_address = (next(plain) for _ in range(4))
         items.append({
             "id": r[0],
             "premise_id": r[1],
             "is_owner": r[2],
-            "phone": decrypt(r[3]),
-            "email": decrypt(r[4]),
-            "telegram_id": decrypt(r[5]),
-            "how_to_address": decrypt(r[6]),
+            "phone": phone,
+            "email": email,
+            "telegram_id": telegram_id,
+            "how_to_address": how_to_address,
             "registered_ed": r[7],
             "status": r[8],
             "created_at": r[9].isoformat() if r[9] else None,
@@ -115,88 +311,59 @@ def list_contacts(
             "premises_number": r[15],
             "barrier_vote": r[16],
             "vote_format": r[17],
+            "has_phone": r[21],
+            "has_email": r[22],
+            "has_telegram_id": r[23],
+            "has_how_to_address": r[24],
         })
         contact_ids.append(str(r[0]))
 
-    # Canary: подмешать watermark по этому подъезду и админу; при отсутствии записи — создать при первом просмотре списка.
-    # Канареечный контакт подчиняется тем же фильтрам, что и остальные записи (premises_number, premise_id, status;
-    # при активных ip/from_date/to_date не показываем — у канарейки нет ip/created_at).
-    if entrance and payload.get("sub"):
-        entrance_clean = entrance.strip()
-        with get_db() as db_canary:
-            w = db_canary.execute(
-                text(
-                    "SELECT premise_id, phone, canary_telegram_id, how_to_address, created_at "
-                    "FROM export_watermarks "
-                    "WHERE admin_telegram_id = :aid AND entrance = :e "
-                    "ORDER BY created_at DESC LIMIT 1"
-                ),
-                {"aid": payload.get("sub"), "e": entrance_clean},
-            ).fetchone()
-        if not w:
-            w_dict = create_watermark(payload.get("sub"), entrance_clean)
-            if w_dict:
-                w = (w_dict["premise_id"], w_dict["phone"], w_dict["canary_telegram_id"], w_dict["how_to_address"], w_dict.get("created_at"))
-        if w:
-            with get_db() as db_prem:
-                prem = db_prem.execute(
-                    text(
-                        "SELECT entrance, floor, premises_type, premises_number "
-                        "FROM premises WHERE cadastral_number = :pid"
-                    ),
-                    {"pid": w[0]},
-                ).fetchone()
-            show_canary = True
-            if premises_number and (prem is None or (prem[3] or "").strip() != premises_number.strip()):
-                show_canary = False
-            if premise_id and w[0] != premise_id:
-                show_canary = False
-            if status and status != "pending":
-                show_canary = False
-            if ip or from_date or to_date:
-                show_canary = False
-            if show_canary:
-                canary_item = {
-                    "id": -1,
-                    "premise_id": w[0],
-                    "is_owner": True,
-                    "phone": w[1],
-                    "email": None,
-                    "telegram_id": w[2],
-                    "how_to_address": w[3],
-                    "registered_ed": None,
-                    "status": "pending",
-                    "created_at": w[4].isoformat() if len(w) > 4 and w[4] and hasattr(w[4], "isoformat") else (w[4] if len(w) > 4 and w[4] else None),
-                    "updated_at": None,
-                    "ip": None,
-                    "entrance": prem[0] if prem else None,
-                    "floor": prem[1] if prem else None,
-                    "premises_type": prem[2] if prem else None,
-                    "premises_number": prem[3] if prem else None,
-                    "barrier_vote": None,
-                    "vote_format": None,
-                    "is_canary": True,
-                }
-                items.append(canary_item)
-
-    items.sort(key=_contact_list_sort_key)
-
     # BE-03 / SR-BE03-004: логируем факт просмотра списка контактов (в т.ч. при пустом результате)
-    # entity_id в audit_log ограничен 128 символами — при длинном списке пишем list(N)
-    _AUDIT_ENTITY_ID_MAX = 128
-    if contact_ids:
-        eid = ",".join(contact_ids)
-        if len(eid) > _AUDIT_ENTITY_ID_MAX:
-            eid = f"list({len(contact_ids)})"
-    else:
-        eid = "list"
-    admin_id = payload.get("sub")
     client_ip = get_client_ip(request)
-    with get_db() as db2:
-        _audit_log(db2, "contact", eid, "select", None, None, admin_id, client_ip)
-        db2.commit()
+    record_audit("contact", _audit_entity_ids(contact_ids), "select", None, None, admin_id, client_ip)
+
+    return {"contacts": items, "total": total, "next_cursor": next_cursor}
+
+
+class RevealBody(BaseModel):
+    contact_ids: list[int] = Field(..., description="ID контактов из списка (pii=flags)")
+    entrance: str | None = Field(None, description="Подъезд списка — для канареечной записи (id = -1)")
+
+
+@router.post("/contacts/reveal")
+def reveal_contacts(
+    body: RevealBody,
+    request: Request,
+    payload: dict = Depends(require_admin_with_consent),
+) -> dict[str, Any]:
+    """
+    VAL-01 / BE-02: расшифровать ПДн выбранных контактов списка (pii=flags) по запросу — одной пачкой.
+    Каждое раскрытие пишется в audit_log (action = reveal).
+    """
+    if len(body.contact_ids) > CONTACTS_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"Не более {CONTACTS_PAGE_MAX} контактов за запрос")
+    ids = list(dict.fromkeys(i for i in body.contact_ids if i > 0))
+    rows = []
+    if ids:
+        with get_db() as db:
+            rows = db.execute(
+                text("SELECT id, phone, email, telegram_id, how_to_address FROM contacts WHERE id = ANY(:ids)"),
+                {"ids": ids},
+            ).fetchall()
+    plain = iter(decrypt_many(v for r in rows for v in r[1:5]))
+    items = [{"id": r[0], **{f: next(plain) for f in PII_FIELDS}} for r in rows]
+
+    # Канареечная запись (id = -1) — значения из export_watermarks этого админа и подъезда, как в списке
+    if -1 in body.contact_ids and body.entrance and payload.get("sub"):
+        w = _latest_canary(payload.get("sub"), body.entrance.strip())
+        if w:
+            items.append({"id": -1, "phone": w[1], "email": None, "telegram_id": w[2], "how_to_address": w[3]})
 
-    return {"contacts": items, "total": len(items)}
+    record_audit(
+        "contact", _audit_entity_ids([str(r[0]) for r in rows]), "reveal", None, None,
+        payload.get("sub"), get_client_ip(request),
+    )
+    return {"contacts": items}
 
 
 @router.get("/contacts/{contact_id}")
@@ -226,9 +393,7 @@ def get_contact(
     # BE-03 / SR-BE03-004: логируем факт чтения одного контакта
     admin_id = payload.get("sub")
     client_ip = get_client_ip(request)
-    with get_db() as db2:
-        _audit_log(db2, "contact", str(contact_id), "select", None, None, admin_id, client_ip)
-        db2.commit()
+    record_audit("contact", str(contact_id), "select", None, None, admin_id, client_ip)
 
     return {
         "id": r[0], "premise_id": r[1], "is_owner": r[2],
@@ -324,8 +489,9 @@ def create_contact(
                 {"cid": contact_id, "bv": body.barrier_vote, "vf": body.vote_format},
             )
         # BE-03 / SR-BE03-001: логируем INSERT контакта
-        _audit_log(db, "contact", str(contact_id), "insert", None, None, payload.get("sub"), get_client_ip(request))
+        write_audit(db, "contact", str(contact_id), "insert", None, None, payload.get("sub"), get_client_ip(request))
         db.commit()
+        invalidate_contacts()
 
     logger.info("ADM-03: contact created by sub=%s premise_id=%s contact_id=%s", payload.get("sub"), cadastral, contact_id)
     return {"contact_id": contact_id, "status": "validated"}
@@ -436,8 +602,9 @@ def update_contact(
                 {"cid": contact_id, "bv": body.barrier_vote, "vf": body.vote_format},
             )
         changed_str = ",".join(changed) if changed else None
-        _audit_log(db, "contact", str(contact_id), "update", None, changed_str, admin_id, client_ip)
+        write_audit(db, "contact", str(contact_id), "update", None, changed_str, admin_id, client_ip)
         db.commit()
+        invalidate_contacts()
 
     logger.info("ADM-03: contact updated id=%s by sub=%s", contact_id, admin_id)
     return {"contact_id": contact_id, "updated": True}
@@ -452,18 +619,35 @@ class BulkStatusBody(BaseModel):
     status: str = Field(..., description="pending | validated | inactive")
 
 
-def _audit_log(db, entity_type: str, entity_id: str, action: str, old_value: str | None, new_value: str | None, user_id: str | None, ip: str | None) -> None:
-    """VAL-01-005: запись в аудит-лог (BE-03)."""
-    try:
-        db.execute(
-            text(
-                "INSERT INTO audit_log (entity_type, entity_id, action, old_value, new_value, user_id, ip) "
-                "VALUES (:et, :eid, :act, :old, :new, :uid, :ip)"
-            ),
-            {"et": entity_type, "eid": entity_id, "act": action, "old": old_value, "new": new_value, "uid": user_id, "ip": ip},
-        )
-    except Exception as e:
-        logger.warning("audit_log insert failed: %s", e)
+def _audit_entity_ids(contact_ids: list[str]) -> str:
+    """entity_id для записи о списке контактов: id через запятую; audit_log.entity_id ограничен 128 символами —
+    при длинном списке пишем list(N), при пустом — list."""
+    if not contact_ids:
+        return "list"
+    eid = ",".join(contact_ids)
+    return eid if len(eid) <= 128 else f"list({len(contact_ids)})"
+
+
+BULK_STATUS_MAX = 5000
+BULK_UPDATED = "updated"
+BULK_UNCHANGED = "unchanged"
+BULK_NOT_FOUND = "not_found"
+
+# Блокировка найденных строк (по id — без взаимоблокировок с параллельной массовой сменой), UPDATE только
+# отличающихся статусов и аудит каждой смены — одним оператором; триггеры кворума срабатывают один раз.
+# FOR UPDATE перечитывает заблокированные строки: t.status — статус на момент смены.
+_BULK_STATUS_SQL = (
+    "WITH target AS ("
+    "SELECT id, status FROM contacts WHERE id = ANY(:ids) ORDER BY id FOR UPDATE"
+    "), upd AS ("
+    "UPDATE contacts c SET status = :st, updated_at = CURRENT_TIMESTAMP FROM target t "
+    "WHERE c.id = t.id AND t.status <> :st RETURNING c.id, t.status AS old_status"
+    "), audit AS ("
+    "INSERT INTO audit_log (entity_type, entity_id, action, old_value, new_value, user_id, ip, contact_id) "
+    "SELECT 'contact', id::text, 'status_change', old_status, :st, :uid, :ip, id FROM upd"
+    ") "
+    "SELECT t.id, t.status, upd.id IS NOT NULL AS changed FROM target t LEFT JOIN upd ON upd.id = t.id"
+)
 
 
 @router.patch("/contacts/bulk-status")
@@ -474,40 +658,36 @@ def bulk_update_status(
 ) -> dict[str, Any]:
     """
     CORE-03 / SR-CORE03-001: Массовая смена статуса контактов.
-    Принимает список ID и целевой статус.
+    Принимает список ID и целевой статус. Один оператор на весь список (_BULK_STATUS_SQL);
+    results — по каждому ID: updated (с прежним статусом), unchanged или not_found.
     """
     if body.status not in VALID_STATUSES:
         raise HTTPException(status_code=400, detail="status должен быть 'pending', 'validated' или 'inactive'")
     if not body.contact_ids:
         raise HTTPException(status_code=400, detail="Список ID не может быть пустым")
-    if len(body.contact_ids) > 200:
-        raise HTTPException(status_code=400, detail="Максимум 200 контактов за раз")
+    if len(body.contact_ids) > BULK_STATUS_MAX:
+        raise HTTPException(status_code=400, detail=f"Максимум {BULK_STATUS_MAX} контактов за раз")
 
     client_ip = get_client_ip(request)
     admin_id = payload.get("sub")
-    updated = 0
+    ids = list(dict.fromkeys(body.contact_ids))
 
     with get_db() as db:
-        for cid in body.contact_ids:
-            row = db.execute(
-                text("SELECT id, status FROM contacts WHERE id = :cid"),
-                {"cid": cid},
-            ).fetchone()
-            if not row:
-                continue
-            old_status = row[1]
-            if old_status == body.status:
-                continue
-            db.execute(
-                text("UPDATE contacts SET status = :st, updated_at = CURRENT_TIMESTAMP WHERE id = :cid"),
-                {"st": body.status, "cid": cid},
-            )
-            _audit_log(db, "contact", str(cid), "status_change", old_status, body.status, admin_id, client_ip)
-            updated += 1
+        rows = db.execute(text(_BULK_STATUS_SQL), {"ids": ids, "st": body.status, "uid": admin_id, "ip": client_ip}).fetchall()
         db.commit()
-
+    invalidate_contacts()
+
+    found = {r[0]: r for r in rows}
+    results = []
+    for cid in ids:
+        r = found.get(cid)
+        if r is None:
+            results.append({"id": cid, "result": BULK_NOT_FOUND})
+        else:
+            results.append({"id": cid, "result": BULK_UPDATED if r[2] else BULK_UNCHANGED, "old_status": r[1]})
+    updated = sum(1 for r in rows if r[2])
     logger.info("CORE-03: bulk status -> %s for %d contacts by sub=%s", body.status, updated, admin_id)
-    return {"updated": updated, "status": body.status}
+    return {"updated": updated, "status": body.status, "results": results}
 
 
 @router.patch("/contacts/{contact_id}/status")
@@ -540,8 +720,9 @@ def update_contact_status(
             text("UPDATE contacts SET status = :st, updated_at = CURRENT_TIMESTAMP WHERE id = :cid"),
             {"st": body.status, "cid": contact_id},
         )
-        _audit_log(db, "contact", str(contact_id), "status_change", old_status, body.status, admin_id, client_ip)
+        write_audit(db, "contact", str(contact_id), "status_change", old_status, body.status, admin_id, client_ip)
         db.commit()
+        invalidate_contacts()
 
     logger.info("VAL-01: contact_id=%s status %s -> %s by sub=%s", contact_id, old_status, body.status, admin_id)
     return {"contact_id": contact_id, "status": body.status}
\ No newline at end of file
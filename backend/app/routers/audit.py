@@ -1,17 +1,23 @@
 """
 BE-03: GET /api/admin/audit — просмотр аудит-лога.
 Доступ только для администратора (SR-BE03-005, SR-BE03-006).
-SR-BE03-008..015: фильтры по дате, entity_id; подписи; ссылки; экспорт XLSX.
+SR-BE03-008..015: фильтры по дате, entity_id; подписи; ссылки; потоковый экспорт XLSX / CSV.
 """
+import csv
 import io
+import itertools
+import json
 import logging
+import tempfile
+import zlib
 from datetime import datetime
-from typing import Any
+from typing import Any, Iterator
 
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy import text
 
+from app.audit_archive import is_month, list_archives, open_archive
 from app.crypto import decrypt
 from app.db import get_db
 from app.jwt_utils import require_admin_with_consent
@@ -20,7 +26,25 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
-EXPORT_MAX_ROWS = 10000
+# Экспорт: строк с серверного курсора за раз; размер части ответа XLSX
+EXPORT_FETCH_SIZE = 2000
+EXPORT_CHUNK_BYTES = 64 * 1024
+EXPORT_XLSX = "xlsx"
+EXPORT_CSV = "csv"
+EXPORT_CSV_GZ = "csv.gz"
+_EXPORT_FORMATS = {
+    EXPORT_XLSX: ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "audit_log.xlsx"),
+    EXPORT_CSV: ("text/csv; charset=utf-8", "audit_log.csv"),
+    EXPORT_CSV_GZ: ("application/gzip", "audit_log.csv.gz"),
+}
+
+# total в списке: точный COUNT(*), оценка планировщика или без total
+TOTAL_EXACT = "exact"
+TOTAL_ESTIMATED = "estimated"
+TOTAL_NONE = "none"
+TOTAL_MODES = (TOTAL_EXACT, TOTAL_ESTIMATED, TOTAL_NONE)
+# Оценка не больше порога — точный COUNT дёшев, считаем его
+AUDIT_EXACT_COUNT_MAX = 10000
 
 _SELECT_COLUMNS = (
     "SELECT a.id, a.entity_type, a.entity_id, a.action, "
@@ -32,9 +56,7 @@ _SELECT_COLUMNS = (
 
 _FROM_JOINS = (
     "FROM audit_log a "
-    "LEFT JOIN contacts c ON a.entity_type = 'contact' "
-    "AND a.entity_id ~ '^\\d+$' "
-    "AND c.id = CAST(CASE WHEN a.entity_id ~ '^\\d+$' THEN a.entity_id END AS INTEGER) "
+    "LEFT JOIN contacts c ON c.id = a.contact_id "
     "LEFT JOIN premises p ON p.cadastral_number = c.premise_id "
     "LEFT JOIN admins adm ON adm.telegram_id = a.user_id "
 )
@@ -122,6 +144,14 @@ def _row_to_item(r: Any) -> dict[str, Any]:
     }
 
 
+def _estimate_rows(db, where: str, params: dict[str, Any]) -> int:
+    """Оценка числа строк по статистике планировщика (EXPLAIN без выполнения) — без сканирования audit_log."""
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM audit_log a WHERE {where}"), params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
 @router.get("/audit")
 def list_audit(
     entity_type: str | None = Query(None, description="Фильтр по типу сущности: contact, admin, bot_alias, contacts_template"),
@@ -131,35 +161,159 @@ def list_audit(
     from_date: str | None = Query(None, description="Начало диапазона дат, ISO (SR-BE03-008)"),
     to_date: str | None = Query(None, description="Конец диапазона дат, ISO (SR-BE03-008)"),
     limit: int = Query(50, ge=1, le=500, description="Кол-во записей"),
-    offset: int = Query(0, ge=0, description="Смещение"),
+    offset: int = Query(0, ge=0, description="Смещение (без before_id)"),
+    before_id: int | None = Query(None, ge=1, description="Keyset: записи с id < before_id (next_before_id предыдущей страницы)"),
+    total_mode: str = Query(TOTAL_EXACT, description="exact — COUNT(*); estimated — оценка планировщика; none — без total"),
     payload: dict = Depends(require_admin_with_consent),
 ) -> dict[str, Any]:
     """
     BE-03 / SR-BE03-005: список записей аудит-лога с фильтрами.
     ПДн не хранятся в логе (SR-BE03-006).
     SR-ADM05-004: записи entity_type=admin видны только суперадмину.
+    Пагинация: before_id (keyset по id DESC, стоимость не зависит от глубины) или offset.
+    total_mode=estimated: оценка по статистике; при оценке до AUDIT_EXACT_COUNT_MAX считается точно.
     """
+    if total_mode not in TOTAL_MODES:
+        raise HTTPException(status_code=400, detail="total_mode должен быть 'exact', 'estimated' или 'none'")
     where, params = _build_where(payload, entity_type, action, user_id, entity_id, from_date, to_date)
-    params["lim"] = limit
+    count_params = dict(params)
+    page_where = where
+    if before_id is not None:
+        page_where += " AND a.id < :before_id"
+        params["before_id"] = before_id
+        offset = 0
+    # limit + 1 строка — признак следующей страницы
+    params["lim"] = limit + 1
     params["off"] = offset
 
-    select_sql = f"{_SELECT_COLUMNS}{_FROM_JOINS}WHERE {where} ORDER BY a.id DESC LIMIT :lim OFFSET :off"
+    select_sql = f"{_SELECT_COLUMNS}{_FROM_JOINS}WHERE {page_where} ORDER BY a.id DESC LIMIT :lim OFFSET :off"
     count_sql = f"SELECT COUNT(*) FROM audit_log a WHERE {where}"
 
+    total: int | None = None
+    total_estimated = False
     with get_db() as db:
         rows = db.execute(text(select_sql), params).fetchall()
-        count_row = db.execute(
-            text(count_sql),
-            {k: v for k, v in params.items() if k not in ("lim", "off")},
-        ).fetchone()
-
+        if total_mode == TOTAL_ESTIMATED:
+            total = _estimate_rows(db, where, count_params)
+            total_estimated = total > AUDIT_EXACT_COUNT_MAX
+        if total_mode == TOTAL_EXACT or (total_mode == TOTAL_ESTIMATED and not total_estimated):
+            total = db.execute(text(count_sql), count_params).scalar() or 0
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     items = []
     for r in rows:
         item = _row_to_item(r)
         item["created_at"] = item["created_at"].isoformat() if item["created_at"] else None
         items.append(item)
 
-    return {"items": items, "total": count_row[0] if count_row else 0}
+    return {
+        "items": items,
+        "total": total,
+        "total_estimated": total_estimated,
+        "next_before_id": rows[-1][0] if has_more else None,
+    }
+
+
+def _archive_match(
+    rec: dict[str, Any],
+    payload: dict[str, Any],
+    entity_type: str | None,
+    action: str | None,
+    user_id: str | None,
+    entity_id: str | None,
+) -> bool:
+    """Фильтры списка (_build_where) для записи архива."""
+    if payload.get("role") != "super_administrator" and rec["entity_type"] == "admin":
+        return False
+    return (
+        (not entity_type or rec["entity_type"] == entity_type)
+        and (not action or rec["action"] == action)
+        and (not user_id or rec["user_id"] == user_id)
+        and (not entity_id or rec["entity_id"] == entity_id)
+    )
+
+
+def _archive_rows(db, records: list[dict[str, Any]]) -> list[tuple]:
+    """Записи архива в формате строк _SELECT_COLUMNS: подписи контактов и админов — по текущим данным."""
+    contact_ids = list({r["contact_id"] for r in records if r.get("contact_id")})
+    user_ids = list({r["user_id"] for r in records if r["user_id"]})
+    contacts = {}
+    if contact_ids:
+        contacts = {
+            row[0]: row[1:]
+            for row in db.execute(
+                text(
+                    "SELECT c.id, p.premises_type, p.premises_number, p.entrance, c.telegram_id "
+                    "FROM contacts c LEFT JOIN premises p ON p.cadastral_number = c.premise_id "
+                    "WHERE c.id = ANY(:ids)"
+                ),
+                {"ids": contact_ids},
+            ).fetchall()
+        }
+    admins = {}
+    if user_ids:
+        admins = dict(
+            db.execute(
+                text("SELECT telegram_id, full_name FROM admins WHERE telegram_id = ANY(:ids)"), {"ids": user_ids}
+            ).fetchall()
+        )
+    rows = []
+    for r in records:
+        ptype, pnum, entrance, contact_tg = contacts.get(r.get("contact_id"), (None, None, None, None))
+        rows.append((
+            r["id"], r["entity_type"], r["entity_id"], r["action"], r["old_value"], r["new_value"],
+            r["user_id"], r["ip"], r["created_at"], ptype, pnum, entrance, admins.get(r["user_id"]), contact_tg,
+        ))
+    return rows
+
+
+@router.get("/audit/archives")
+def list_audit_archives(payload: dict = Depends(require_admin_with_consent)) -> dict[str, Any]:
+    """BE-03: месяцы аудит-лога, выгруженные из БД в архив (scripts/audit_retention.py)."""
+    return {"archives": list_archives()}
+
+
+@router.get("/audit/archives/{month}")
+def list_audit_archive(
+    month: str,
+    entity_type: str | None = Query(None),
+    action: str | None = Query(None),
+    user_id: str | None = Query(None),
+    entity_id: str | None = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    before_id: int | None = Query(None, ge=1, description="Keyset: записи с id < before_id"),
+    payload: dict = Depends(require_admin_with_consent),
+) -> dict[str, Any]:
+    """
+    BE-03: записи архивного месяца (YYYY-MM) с фильтрами списка. Файл читается потоково по убыванию id
+    до заполнения страницы; total не считается (потребовал бы чтения всего файла).
+    """
+    if not is_month(month):
+        raise HTTPException(status_code=400, detail="month в формате YYYY-MM")
+    records = open_archive(month)
+    if records is None:
+        raise HTTPException(status_code=404, detail="Архив за этот месяц не найден")
+
+    page: list[dict[str, Any]] = []
+    for rec in records:
+        if before_id is not None and rec["id"] >= before_id:
+            continue
+        if _archive_match(rec, payload, entity_type, action, user_id, entity_id):
+            page.append(rec)
+            if len(page) > limit:
+                break
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    with get_db() as db:
+        rows = _archive_rows(db, page)
+    items = []
+    for r in rows:
+        item = _row_to_item(r)
+        item["created_at"] = item["created_at"].isoformat() if item["created_at"] else None
+        items.append(item)
+    return {"items": items, "next_before_id": page[-1]["id"] if has_more else None}
 
 
 _ACTION_LABELS = {
@@ -174,6 +328,7 @@ _ACTION_LABELS = {
     "password_change": "Смена пароля",
     "policy_consent": "Согласие с политикой",
     "export": "Экспорт",
+    "reveal": "Раскрытие ПДн",
 }
 
 _ENTITY_TYPE_LABELS = {
@@ -186,6 +341,72 @@ _ENTITY_TYPE_LABELS = {
 _XLSX_HEADERS = ["ID", "Время", "Сущность", "Запись", "Действие", "Старое", "Новое", "Пользователь", "IP"]
 
 
+def _export_row(r: Any) -> list[Any]:
+    """Строка выгрузки (XLSX/CSV) в колонках _XLSX_HEADERS."""
+    item = _row_to_item(r)
+    created = item["created_at"]
+    time_str = created.strftime("%d.%m.%Y %H:%M:%S") if isinstance(created, datetime) else str(created or "")
+    return [
+        item["id"],
+        time_str,
+        _ENTITY_TYPE_LABELS.get(item["entity_type"], item["entity_type"]),
+        item["entity_label"] or item["entity_id"] or "",
+        _ACTION_LABELS.get(item["action"], item["action"]),
+        item["old_value"] or "",
+        item["new_value"] or "",
+        item["user_label"] or item["user_id"] or item["user_id_resolved"] or "аноним",
+        item["ip"] or "",
+    ]
+
+
+def _iter_export_rows(where: str, params: dict[str, Any]) -> Iterator[list[Any]]:
+    """Строки выгрузки с серверного курсора: в памяти не больше EXPORT_FETCH_SIZE строк результата."""
+    select_sql = f"{_SELECT_COLUMNS}{_FROM_JOINS}WHERE {where} ORDER BY a.id DESC"
+    with get_db() as db:
+        result = db.execute(text(select_sql), params, execution_options={"yield_per": EXPORT_FETCH_SIZE})
+        for r in result:
+            yield _export_row(r)
+
+
+def _xlsx_chunks(rows: Iterator[list[Any]]) -> Iterator[bytes]:
+    """write_only: строки листа пишутся во временный файл openpyxl; книга собирается во временный файл и отдаётся частями."""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Аудит-лог")
+    ws.append(_XLSX_HEADERS)
+    for row in rows:
+        ws.append(row)
+    with tempfile.TemporaryFile() as f:
+        wb.save(f)
+        f.seek(0)
+        while chunk := f.read(EXPORT_CHUNK_BYTES):
+            yield chunk
+
+
+def _csv_chunks(rows: Iterator[list[Any]], compress: bool) -> Iterator[bytes]:
+    """CSV (UTF-8 с BOM, «;» — как в импорте) пачками по EXPORT_FETCH_SIZE строк; compress — поток gzip."""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=";")
+    buf.write("\ufeff")
+    writer.writerow(_XLSX_HEADERS)
+    while batch := list(itertools.islice(rows, EXPORT_FETCH_SIZE)):
+        writer.writerows(batch)
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        if gz is not None:
+            data = gz.compress(data)
+        if data:
+            yield data
+    data = buf.getvalue().encode("utf-8")
+    if gz is not None:
+        data = gz.compress(data) + gz.flush()
+    if data:
+        yield data
+
+
 @router.get("/audit/export")
 def export_audit(
     entity_type: str | None = Query(None),
@@ -194,50 +415,29 @@ def export_audit(
     entity_id: str | None = Query(None),
     from_date: str | None = Query(None),
     to_date: str | None = Query(None),
+    export_format: str = Query(EXPORT_XLSX, alias="format", description="xlsx, csv или csv.gz"),
     payload: dict = Depends(require_admin_with_consent),
-) -> Response:
-    """SR-BE03-015: экспорт отфильтрованного аудит-лога в XLSX без пагинации."""
-    import openpyxl
-
+) -> StreamingResponse:
+    """
+    SR-BE03-015: экспорт отфильтрованного аудит-лога без пагинации и без лимита строк.
+    Строки читаются серверным курсором и сразу уходят в поток ответа — память не растёт с объёмом лога.
+    CSV / csv.gz отдаются по мере чтения; XLSX (zip) — после сборки книги во временном файле.
+    """
+    if export_format not in _EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format должен быть 'xlsx', 'csv' или 'csv.gz'")
     where, params = _build_where(payload, entity_type, action, user_id, entity_id, from_date, to_date)
-    params["lim"] = EXPORT_MAX_ROWS
-
-    select_sql = f"{_SELECT_COLUMNS}{_FROM_JOINS}WHERE {where} ORDER BY a.id DESC LIMIT :lim"
-
-    with get_db() as db:
-        rows = db.execute(text(select_sql), params).fetchall()
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Аудит-лог"
-    ws.append(_XLSX_HEADERS)
-
-    for r in rows:
-        item = _row_to_item(r)
-        created = item["created_at"]
-        time_str = created.strftime("%d.%m.%Y %H:%M:%S") if isinstance(created, datetime) else str(created or "")
-        entity_type_label = _ENTITY_TYPE_LABELS.get(item["entity_type"], item["entity_type"])
-        record_label = item["entity_label"] or item["entity_id"] or ""
-        action_label = _ACTION_LABELS.get(item["action"], item["action"])
-        user_display = item["user_label"] or item["user_id"] or item["user_id_resolved"] or "аноним"
-
-        ws.append([
-            item["id"],
-            time_str,
-            entity_type_label,
-            record_label,
-            action_label,
-            item["old_value"] or "",
-            item["new_value"] or "",
-            user_display,
-            item["ip"] or "",
-        ])
-
-    buf = io.BytesIO()
-    wb.save(buf)
-
-    return Response(
-        content=buf.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": 'attachment; filename="audit_log.xlsx"'},
+    rows = _iter_export_rows(where, params)
+    # Запрос выполняется до ответа: ошибка БД — статус 500, а не оборванный файл с кодом 200
+    first = next(rows, None)
+    rows = itertools.chain([first] if first is not None else [], rows)
+
+    media_type, filename = _EXPORT_FORMATS[export_format]
+    if export_format == EXPORT_XLSX:
+        body = _xlsx_chunks(rows)
+    else:
+        body = _csv_chunks(rows, compress=export_format == EXPORT_CSV_GZ)
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
@@ -15,6 +15,7 @@ from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from sqlalchemy import text
 
+from app.audit_log import write_audit
 from app.auth_password import (
     get_admin_by_login,
     get_admin_by_telegram_id_for_password,
@@ -30,19 +31,6 @@ from app.jwt_utils import create_access_token, require_admin
 logger = logging.getLogger(__name__)
 
 
-def _audit_log(db, entity_type: str, entity_id: str, action: str, old_value: str | None, new_value: str | None, user_id: str | None, ip: str | None) -> None:
-    """Запись в аудит-лог (BE-03). Пароли в лог не попадают."""
-    try:
-        db.execute(
-            text(
-                "INSERT INTO audit_log (entity_type, entity_id, action, old_value, new_value, user_id, ip) "
-                "VALUES (:et, :eid, :act, :old, :new, :uid, :ip)"
-            ),
-            {"et": entity_type, "eid": entity_id, "act": action, "old": old_value, "new": new_value, "uid": user_id, "ip": ip},
-        )
-    except Exception as e:
-        logger.warning("audit_log insert failed: %s", e)
-
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
@@ -103,7 +91,7 @@ def consent(
             ),
             {"v": version, "tid": str(sub)},
         )
-        _audit_log(db, "admin", str(sub), "policy_consent", None, version, str(sub), get_client_ip(request))
+        write_audit(db, "admin", str(sub), "policy_consent", None, version, str(sub), get_client_ip(request))
         db.commit()
     logger.info("ADM-09: Policy consent accepted telegram_id=%s version=%s", sub, version)
     return Response(status_code=204)
@@ -161,7 +149,7 @@ def change_password(
         )
     set_admin_password(sub, new)
     with get_db() as db:
-        _audit_log(db, "admin", str(sub), "password_change", None, "self", str(sub), get_client_ip(request))
+        write_audit(db, "admin", str(sub), "password_change", None, "self", str(sub), get_client_ip(request))
         db.commit()
     return Response(status_code=204)
 
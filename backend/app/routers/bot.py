@@ -10,9 +10,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
 from sqlalchemy import text
 
+from app.audit_log import write_audit, write_audit_many
 from app.auth_bot import require_bot_token
 from app.auth_telegram import get_admin_by_telegram_id
-from app.bot_premise_resolver import resolve as resolve_premise
+from app.bot_premise_resolver import get_short_names, resolve as resolve_premise
 from app.crypto import (
     blind_index_phone,
     blind_index_telegram_id,
@@ -21,7 +22,8 @@ from app.crypto import (
 )
 from app.db import get_db
 from app.rate_limit import check_bot_rate_limit
-from app.submit_service import _audit_log, _count_pending_on_premise, PENDING_LIMIT_PER_PREMISE
+from app.response_cache import invalidate_contacts
+from app.submit_service import _count_pending_on_premise, PENDING_LIMIT_PER_PREMISE
 from app.validators import validate_phone
 
 logger = logging.getLogger(__name__)
@@ -65,11 +67,25 @@ def _find_contacts_by_tg(db, tg_idx: str) -> list[dict[str, Any]]:
     return [{"id": r[0], "premise_id": r[1], "type": r[2], "number": r[3]} for r in rows]
 
 
-def _get_short_names(db) -> dict[str, str]:
-    rows = db.execute(
-        text("SELECT DISTINCT premises_type, short_name FROM premise_type_aliases")
-    ).fetchall()
-    return {r[0]: r[1] for r in rows}
+# BOT-04: всё для меню бота одним запросом. Первый контакт (по id) даёт ответы анкеты и голосование,
+# телефон — первый непустой среди контактов пользователя (расшифровывается один)
+_MY_DATA_SQL = """
+WITH mine AS (
+    SELECT c.id, c.premise_id, c.phone, c.registered_in_ed, p.premises_type, p.premises_number
+    FROM contacts c JOIN premises p ON p.cadastral_number = c.premise_id
+    WHERE c.telegram_id_idx = :idx AND c.status IN ('pending', 'validated')
+), first AS (
+    SELECT id, registered_in_ed FROM mine ORDER BY id LIMIT 1
+)
+SELECT
+    (SELECT json_agg(json_build_array(premise_id, premises_type, premises_number) ORDER BY id) FROM mine),
+    f.registered_in_ed, o.vote_format, o.barrier_vote,
+    (SELECT phone FROM mine WHERE phone IS NOT NULL AND trim(phone) != '' ORDER BY id LIMIT 1)
+FROM first f
+LEFT JOIN LATERAL (
+    SELECT vote_format, barrier_vote FROM oss_voting WHERE contact_id = f.id LIMIT 1
+) o ON true
+"""
 
 
 @router.post("/resolve-premise")
@@ -129,8 +145,9 @@ def add_premise(body: PremiseBody) -> dict[str, Any]:
                 text("INSERT INTO oss_voting (contact_id, barrier_vote, vote_format, voted) VALUES (:cid, NULL, NULL, false)"),
                 {"cid": cid},
             )
-            _audit_log(db, "contact", str(cid), "insert", None, "source=telegram", body.telegram_user_id, None)
+            write_audit(db, "contact", str(cid), "insert", None, "source=telegram", body.telegram_user_id, None)
         db.commit()
+        invalidate_contacts()
         return {"detail": "Premise linked", "contact_id": cid}
 
 
@@ -160,8 +177,9 @@ def remove_premise(premise_id: str, body: PremiseBody) -> dict[str, Any]:
             ),
             {"cid": cid},
         )
-        _audit_log(db, "contact", str(cid), "premise_removed", None, None, body.telegram_user_id, None)
+        write_audit(db, "contact", str(cid), "premise_removed", None, None, body.telegram_user_id, None)
         db.commit()
+        invalidate_contacts()
     return {"detail": "Premise removed"}
 
 
@@ -180,65 +198,59 @@ def update_answers(body: AnswersBody) -> dict[str, Any]:
         if not ok:
             raise HTTPException(status_code=400, detail=err or "Invalid phone")
 
+    # Одни и те же значения для всех контактов пользователя: телефон шифруется один раз
+    updates = []
+    params: dict[str, Any] = {}
+    if body.phone is not None:
+        if body.phone == "":
+            updates.extend(["phone = NULL", "phone_idx = NULL"])
+        else:
+            updates.extend(["phone = :phone", "phone_idx = :phone_idx"])
+            params["phone"] = encrypt(body.phone)
+            params["phone_idx"] = blind_index_phone(body.phone)
+    if body.registered_in_ed is not None:
+        # Бот присылает значения расширенного enum none|account|owner.
+        # Для обратной совместимости поддерживаем также true/false/yes/no/1/0.
+        re_val = body.registered_in_ed
+        if re_val not in ("none", "account", "owner"):
+            s = str(re_val).strip().lower()
+            if s in ("yes", "да", "true", "1"):
+                re_val = "owner"
+            elif s in ("no", "нет", "false", "0"):
+                re_val = "none"
+            else:
+                # Некорректное значение — не трогаем поле registered_in_ed
+                re_val = None
+        if re_val is not None:
+            updates.append("registered_in_ed = :re")
+            params["re"] = re_val
+
     with get_db() as db:
         contacts = _find_contacts_by_tg(db, tg_idx)
         if not contacts:
             raise HTTPException(status_code=404, detail="No contacts found")
+        ids = [c["id"] for c in contacts]
 
-        for c in contacts:
-            updates = []
-            params: dict[str, Any] = {"cid": c["id"]}
-
-            if body.phone is not None:
-                if body.phone == "":
-                    updates.extend(["phone = NULL", "phone_idx = NULL"])
-                else:
-                    updates.extend(["phone = :phone", "phone_idx = :phone_idx"])
-                    params["phone"] = encrypt(body.phone)
-                    params["phone_idx"] = blind_index_phone(body.phone)
-
-            if body.registered_in_ed is not None:
-                updates.append("registered_in_ed = :re")
-                # Бот присылает значения расширенного enum none|account|owner.
-                # Для обратной совместимости поддерживаем также true/false/yes/no/1/0.
-                re_val = body.registered_in_ed
-                if re_val in ("none", "account", "owner"):
-                    params["re"] = re_val
-                else:
-                    s = str(re_val).strip().lower()
-                    if s in ("yes", "да", "true", "1"):
-                        params["re"] = "owner"
-                    elif s in ("no", "нет", "false", "0"):
-                        params["re"] = "none"
-                    else:
-                        # Некорректное значение — не трогаем поле registered_in_ed
-                        updates.pop()  # убрать registered_in_ed = :re
-
-            if updates:
-                updates.append("updated_at = CURRENT_TIMESTAMP")
-                db.execute(text(f"UPDATE contacts SET {', '.join(updates)} WHERE id = :cid"), params)
-
-            if body.vote_format is not None or body.barrier_vote is not None:
-                oss = db.execute(
-                    text("SELECT vote_format, barrier_vote FROM oss_voting WHERE contact_id = :cid"),
-                    {"cid": c["id"]},
-                ).fetchone()
-                vf = body.vote_format if body.vote_format is not None else (oss[0] if oss else None)
-                bv = body.barrier_vote if body.barrier_vote is not None else (oss[1] if oss else None)
-                if oss:
-                    db.execute(
-                        text("UPDATE oss_voting SET vote_format = :vf, barrier_vote = :bv WHERE contact_id = :cid"),
-                        {"vf": vf, "bv": bv, "cid": c["id"]},
-                    )
-                else:
-                    db.execute(
-                        text("INSERT INTO oss_voting (contact_id, vote_format, barrier_vote, voted) VALUES (:cid, :vf, :bv, false)"),
-                        {"cid": c["id"], "vf": vf, "bv": bv},
-                    )
+        if updates:
+            updates.append("updated_at = CURRENT_TIMESTAMP")
+            db.execute(text(f"UPDATE contacts SET {', '.join(updates)} WHERE id = ANY(:ids)"), {**params, "ids": ids})
 
-        for c in contacts:
-            _audit_log(db, "contact", str(c["id"]), "bot_answers_update", None, None, body.telegram_user_id, None)
+        if body.vote_format is not None or body.barrier_vote is not None:
+            # None не затирает сохранённый ответ
+            db.execute(
+                text(
+                    "INSERT INTO oss_voting (contact_id, vote_format, barrier_vote, voted) "
+                    "SELECT cid, CAST(:vf AS varchar), CAST(:bv AS varchar), false FROM unnest(CAST(:ids AS integer[])) AS cid "
+                    "ON CONFLICT (contact_id) DO UPDATE SET "
+                    "vote_format = COALESCE(EXCLUDED.vote_format, oss_voting.vote_format), "
+                    "barrier_vote = COALESCE(EXCLUDED.barrier_vote, oss_voting.barrier_vote)"
+                ),
+                {"ids": ids, "vf": body.vote_format, "bv": body.barrier_vote},
+            )
+
+        write_audit_many(db, "contact", [str(cid) for cid in ids], "bot_answers_update", None, None, body.telegram_user_id, None)
         db.commit()
+        invalidate_contacts()
     return {"detail": "Answers updated"}
 
 
@@ -249,49 +261,25 @@ def get_my_data(telegram_user_id: str) -> dict[str, Any]:
         raise HTTPException(status_code=400, detail="telegram_user_id required")
 
     with get_db() as db:
-        short_names = _get_short_names(db)
-        contacts = _find_contacts_by_tg(db, tg_idx)
-        if not contacts:
-            return {"premises": [], "vote_format": None, "registered_in_ed": None, "barrier_vote": None, "phone": None}
-
-        premises = []
-        for c in contacts:
-            short = short_names.get(c["type"], c["type"])
-            premises.append({
-                "premise_id": c["premise_id"],
-                "display": f"{c['type']} {c['number']}",
-                "short_display": f"{short} {c['number']}",
-            })
-
-        first = contacts[0]
-        oss = db.execute(
-            text("SELECT vote_format, barrier_vote FROM oss_voting WHERE contact_id = :cid"),
-            {"cid": first["id"]},
-        ).fetchone()
-
-        # Телефон может быть в любом из контактов пользователя (напр. добавлен через веб в одном, бот создал другой без телефона)
-        contact_ids = [c["id"] for c in contacts]
-        phone = None
-        for cid in contact_ids:
-            phone_row = db.execute(
-                text("SELECT phone FROM contacts WHERE id = :cid AND phone IS NOT NULL AND trim(phone) != ''"),
-                {"cid": cid},
-            ).fetchone()
-            if phone_row and phone_row[0]:
-                phone = decrypt(phone_row[0])
-                break
-
-        reg_ed = db.execute(
-            text("SELECT registered_in_ed FROM contacts WHERE id = :cid"),
-            {"cid": first["id"]},
-        ).scalar()
-
+        row = db.execute(text(_MY_DATA_SQL), {"idx": tg_idx}).fetchone()
+    if not row:
+        return {"premises": [], "vote_format": None, "registered_in_ed": None, "barrier_vote": None, "phone": None}
+
+    short_names = get_short_names()
+    premises = []
+    for premise_id, pt, number in row[0]:
+        short = short_names.get(pt, pt)
+        premises.append({
+            "premise_id": premise_id,
+            "display": f"{pt} {number}",
+            "short_display": f"{short} {number}",
+        })
     return {
         "premises": premises,
-        "vote_format": oss[0] if oss else None,
-        "registered_in_ed": reg_ed,
-        "barrier_vote": oss[1] if oss else None,
-        "phone": phone,
+        "vote_format": row[2],
+        "registered_in_ed": row[1],
+        "barrier_vote": row[3],
+        "phone": decrypt(row[4]) if row[4] else None,
     }
 
 
@@ -334,6 +322,7 @@ def forget(body: ForgetBody) -> dict[str, Any]:
             )
 
         for c in contacts:
-            _audit_log(db, "contact", str(c["id"]), "forget", None, None, body.telegram_user_id, None)
+            write_audit(db, "contact", str(c["id"]), "forget", None, None, body.telegram_user_id, None)
         db.commit()
+        invalidate_contacts()
     return {"detail": "All data deleted"}
@@ -1,18 +1,24 @@
 """
 CORE-01: POST /api/admin/import/register — загрузка реестра (CSV/XLS/XLSX).
 ADM-06: POST /api/admin/import/contacts — загрузка только контактов.
-ADM-08: GET /api/admin/import/contacts-template — шаблон XLSX по подъезду.
+CORE-05: POST /api/admin/import/voting-participation — участие в голосовании.
+Импорт выполняется фоновой задачей; GET /api/admin/import/jobs/{id} — прогресс и отчёт.
+ADM-08: GET /api/admin/import/contacts-template — шаблон XLSX по подъезду; contacts-template-full — по дому (потоком).
+Повторные выгрузки без изменения данных отдаются из кэша app.template_cache.
 """
+import io
 import json
 import logging
-from typing import Any
+from typing import Any, BinaryIO, Iterator
 
 from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
+from app.audit_log import record_audit
 from app.client_ip import get_client_ip
-from app.db import get_db
+from app.config import IMPORT_MAX_FILE_SIZE_MB
 from app.import_register import (
+    FULL_HOUSE_ENTRANCE,
     build_contacts_template_xlsx,
     build_contacts_template_xlsx_full_house,
     create_watermark,
@@ -20,26 +26,54 @@ from app.import_register import (
     get_expected_columns,
     get_expected_columns_contacts_only,
     parse_file,
-    run_import,
-    run_import_contacts_only,
     transliterate_entrance_for_filename,
 )
+from app.import_jobs import (
+    JOB_KIND_CONTACTS,
+    JOB_KIND_REGISTER,
+    JOB_KIND_VOTING_PARTICIPATION,
+    create_job,
+    get_job,
+)
 from app.import_voting_participation import (
     get_expected_columns_voting_participation,
     parse_voting_participation_file,
-    run_import_voting_participation,
 )
 from app.jwt_utils import require_admin_with_consent, require_super_admin_with_consent
+from app.template_cache import get_template, latest_watermark_id, put_template, template_data_version
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
 
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5 MB (NFR Performance)
+MAX_FILE_SIZE = IMPORT_MAX_FILE_SIZE_MB * 1024 * 1024  # NFR Performance; разбор потоковый
+_STREAM_CHUNK_BYTES = 64 * 1024  # часть потокового ответа (шаблон по дому)
+
+
+def _check_upload(file: UploadFile) -> None:
+    """Проверить наличие и размер загрузки, не читая её в память (spooled file уже на диске/в буфере)."""
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    file.file.seek(0, 2)
+    size = file.file.tell()
+    file.file.seek(0)
+    if size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail=f"File too large (max {IMPORT_MAX_FILE_SIZE_MB} MB)")
+
+
+def _enqueue(kind: str, file: UploadFile, request: Request, payload: dict) -> dict[str, Any]:
+    """Структура файла уже проверена — сохранить загрузку и поставить задачу импорта в очередь."""
+    try:
+        job_id = create_job(kind, file.file, file.filename or "", payload.get("sub"), get_client_ip(request))
+    except Exception as e:
+        logger.exception("Import job enqueue failed")
+        raise HTTPException(status_code=503, detail="Service temporarily unavailable") from e
+    logger.info("Import job %s (%s) queued by sub=%s", job_id, kind, payload.get("sub"))
+    return {"job_id": job_id, "status": "queued"}
 
 
-@router.post("/import/register")
+@router.post("/import/register", status_code=202)
 def import_register(
     request: Request,
     file: UploadFile = File(...),
@@ -47,15 +81,12 @@ def import_register(
 ) -> dict[str, Any]:
     """
     CORE-01: Загрузка реестра помещений и контактов (CSV, XLS, XLSX). Только суперадмин.
-    multipart/form-data, поле file. Ответ: accepted, rejected, errors[].
+    multipart/form-data, поле file. Структура проверяется сразу; импорт — фоновой задачей.
+    Ответ 202: job_id; отчёт (accepted, rejected, errors[]) — в GET /import/jobs/{job_id}.
     """
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No file provided")
-    content = file.file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File too large (max 5 MB)")
+    _check_upload(file)
     try:
-        original_headers, canonical_columns, rows = parse_file(content, file.filename or "")
+        original_headers, canonical_columns, _rows = parse_file(file.file, file.filename or "")
     except ValueError as e:
         msg = str(e)
         if "Column structure mismatch" in msg or "Empty" in msg:
@@ -78,34 +109,10 @@ def import_register(
                 "detected_columns": original_headers,
             },
         )
-    # LOST-02: return body with expected/detected for client
-    try:
-        client_ip = get_client_ip(request)
-        report = run_import(rows, client_ip=client_ip)
-    except Exception as e:
-        logger.exception("Import failed")
-        raise HTTPException(status_code=503, detail="Service temporarily unavailable") from e
-
-    logger.info("Import by sub=%s: accepted=%s rejected=%s", payload.get("sub"), report["accepted"], report["rejected"])
-    return report
-
-
-def _audit_log(db, entity_type: str, entity_id: str, action: str, old_value: str | None, new_value: str | None, user_id: str | None, ip: str | None) -> None:
-    """Запись в аудит-лог (BE-03)."""
-    try:
-        from sqlalchemy import text
-        db.execute(
-            text(
-                "INSERT INTO audit_log (entity_type, entity_id, action, old_value, new_value, user_id, ip) "
-                "VALUES (:et, :eid, :act, :old, :new, :uid, :ip)"
-            ),
-            {"et": entity_type, "eid": entity_id, "act": action, "old": old_value, "new": new_value, "uid": user_id, "ip": ip},
-        )
-    except Exception as e:
-        logger.warning("audit_log insert failed: %s", e)
+    return _enqueue(JOB_KIND_REGISTER, file, request, payload)
 
 
-@router.post("/import/contacts")
+@router.post("/import/contacts", status_code=202)
 def import_contacts(
     request: Request,
     file: UploadFile = File(...),
@@ -114,14 +121,11 @@ def import_contacts(
     """
     ADM-06: Загрузка только контактов (CSV, XLS, XLSX). Доступна любому админу.
     Помещения не создаются; помещение с указанным кадастром должно уже быть в реестре.
+    Ответ 202: job_id (см. GET /import/jobs/{job_id}).
     """
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No file provided")
-    content = file.file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File too large (max 5 MB)")
+    _check_upload(file)
     try:
-        original_headers, canonical_columns, rows = parse_file(content, file.filename or "")
+        original_headers, canonical_columns, _rows = parse_file(file.file, file.filename or "")
     except ValueError as e:
         msg = str(e)
         if "Column structure mismatch" in msg or "Empty" in msg:
@@ -150,18 +154,10 @@ def import_contacts(
                 "detected_columns": original_headers,
             },
         )
-    try:
-        client_ip = get_client_ip(request)
-        report = run_import_contacts_only(rows, client_ip=client_ip)
-    except Exception as e:
-        logger.exception("Contacts import failed")
-        raise HTTPException(status_code=503, detail="Service temporarily unavailable") from e
-
-    logger.info("Contacts import by sub=%s: accepted=%s rejected=%s", payload.get("sub"), report["accepted"], report["rejected"])
-    return report
+    return _enqueue(JOB_KIND_CONTACTS, file, request, payload)
 
 
-@router.post("/import/voting-participation")
+@router.post("/import/voting-participation", status_code=202)
 def import_voting_participation(
     request: Request,
     file: UploadFile = File(...),
@@ -170,15 +166,12 @@ def import_voting_participation(
     """
     CORE-05: Загрузка участия в голосовании ОСС (CSV, XLS, XLSX). Только суперадмин.
     Обязательные колонки: кадастровый номер, доля в собственности.
+    Ответ 202: job_id (см. GET /import/jobs/{job_id}).
     """
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No file provided")
-    content = file.file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File too large (max 5 MB)")
+    _check_upload(file)
     try:
-        original_headers, canonical_columns, rows = parse_voting_participation_file(
-            content, file.filename or ""
+        original_headers, canonical_columns, _rows = parse_voting_participation_file(
+            file.file, file.filename or ""
         )
     except ValueError as e:
         msg = str(e)
@@ -199,25 +192,22 @@ def import_voting_participation(
                 "detected_columns": original_headers,
             },
         )
+    return _enqueue(JOB_KIND_VOTING_PARTICIPATION, file, request, payload)
 
-    try:
-        client_ip = get_client_ip(request)
-        report = run_import_voting_participation(
-            rows,
-            user_id=payload.get("sub"),
-            client_ip=client_ip,
-        )
-    except Exception as e:
-        logger.exception("Voting participation import failed")
-        raise HTTPException(status_code=503, detail="Service temporarily unavailable") from e
 
-    logger.info(
-        "Voting participation import by sub=%s: accepted=%s rejected=%s",
-        payload.get("sub"),
-        report["accepted"],
-        report["rejected"],
-    )
-    return report
+@router.get("/import/jobs/{job_id}")
+def import_job_status(
+    job_id: str,
+    payload: dict = Depends(require_admin_with_consent),
+) -> dict[str, Any]:
+    """
+    Статус фоновой задачи импорта: status (queued | running | done | failed), processed_rows,
+    после завершения — accepted, rejected, errors[] (и warnings[] для CORE-05). Админ видит только свои задачи.
+    """
+    job = get_job(job_id)
+    if not job or (payload.get("role") != "super_administrator" and job["user_id"] != payload.get("sub")):
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
 
 
 @router.get("/import/contacts-template")
@@ -230,28 +220,37 @@ def contacts_template(
     ADM-08: Скачать XLSX-шаблон контактов по подъезду. Одна строка на контакт.
     При успешной выдаче запись в аудит-лог (при пустом подъезде — без записи).
     """
-    canary_row = None
-    if payload.get("sub") and entrance.strip():
-        canary_row = create_watermark(payload.get("sub"), entrance)
-    try:
-        content, row_count = build_contacts_template_xlsx(entrance, canary_row=canary_row)
-    except Exception as e:
-        logger.exception("Contacts template failed: %s", e)
-        raise HTTPException(status_code=503, detail="Service temporarily unavailable") from e
+    # Один и тот же подъезд для версии данных, сборки, ключа кэша и аудита
+    entrance = entrance.strip()
+    admin_id = payload.get("sub")
+    cached, version = None, 0
+    if admin_id and entrance:
+        # Версия читается до сборки: изменение во время сборки даст промах при следующей выгрузке
+        version = template_data_version(entrance)
+        cached = _cached_template(admin_id, entrance, version)
+    if cached is not None:
+        chunks, row_count = cached
+        content = b"".join(chunks)
+    else:
+        canary_row = create_watermark(admin_id, entrance) if admin_id and entrance else None
+        try:
+            content, row_count = build_contacts_template_xlsx(entrance, canary_row=canary_row)
+        except Exception as e:
+            logger.exception("Contacts template failed: %s", e)
+            raise HTTPException(status_code=503, detail="Service temporarily unavailable") from e
+        if canary_row and canary_row.get("id") is not None:
+            put_template(admin_id, entrance, canary_row["id"], version, io.BytesIO(content), row_count)
 
     if row_count > 0:
-        with get_db() as db:
-            _audit_log(
-                db,
-                "contacts_template",
-                entrance,
-                "export",
-                None,
-                json.dumps({"row_count": row_count, "format": "xlsx"}),
-                payload.get("sub"),
-                get_client_ip(request),
-            )
-            db.commit()
+        record_audit(
+            "contacts_template",
+            entrance,
+            "export",
+            None,
+            json.dumps({"row_count": row_count, "format": "xlsx"}),
+            payload.get("sub"),
+            get_client_ip(request),
+        )
 
     # Имя файла: транслитерация кириллицы (подъезд Б → B), затем ASCII
     if row_count > 0:
@@ -267,6 +266,24 @@ def contacts_template(
     )
 
 
+def _cached_template(admin_id: str, entrance: str, version: int) -> tuple[Iterator[bytes], int] | None:
+    """
+    Шаблон из кэша: файл, собранный с последним водяным знаком админа по подъезду, при той же версии данных.
+    Canary при этом тот же, что показывается админу в списке контактов.
+    """
+    watermark_id = latest_watermark_id(admin_id, entrance)
+    if watermark_id is None:
+        return None
+    return get_template(admin_id, entrance, watermark_id, version)
+
+
+def _iter_file(f: BinaryIO) -> Iterator[bytes]:
+    """Отдать файл частями и закрыть (временный файл шаблона удаляется при закрытии)."""
+    with f:
+        while chunk := f.read(_STREAM_CHUNK_BYTES):
+            yield chunk
+
+
 @router.get("/import/contacts-template-full")
 def contacts_template_full(
     request: Request,
@@ -276,31 +293,38 @@ def contacts_template_full(
     Шаблон контактов по всем помещениям дома (только суперадмин).
     Один canary по случайному помещению; запись в audit_log с entity_id=full_house.
     """
-    canary_row = None
-    if payload.get("sub"):
-        canary_row = create_watermark_full_house(payload.get("sub"))
-    try:
-        content, row_count = build_contacts_template_xlsx_full_house(canary_row=canary_row)
-    except Exception as e:
-        logger.exception("Contacts template full house failed: %s", e)
-        raise HTTPException(status_code=503, detail="Service temporarily unavailable") from e
+    admin_id = payload.get("sub")
+    cached, version = None, 0
+    if admin_id:
+        version = template_data_version(None)
+        cached = _cached_template(admin_id, FULL_HOUSE_ENTRANCE, version)
+    if cached is not None:
+        body, row_count = cached
+    else:
+        canary_row = create_watermark_full_house(admin_id) if admin_id else None
+        try:
+            content, row_count = build_contacts_template_xlsx_full_house(canary_row=canary_row)
+        except Exception as e:
+            logger.exception("Contacts template full house failed: %s", e)
+            raise HTTPException(status_code=503, detail="Service temporarily unavailable") from e
+        if canary_row and canary_row.get("id") is not None:
+            put_template(admin_id, FULL_HOUSE_ENTRANCE, canary_row["id"], version, content, row_count)
+            content.seek(0)
+        body = _iter_file(content)
 
     if row_count > 0:
-        with get_db() as db:
-            _audit_log(
-                db,
-                "contacts_template",
-                "full_house",
-                "export",
-                None,
-                json.dumps({"row_count": row_count, "format": "xlsx", "scope": "full_house"}),
-                payload.get("sub"),
-                get_client_ip(request),
-            )
-            db.commit()
+        record_audit(
+            "contacts_template",
+            "full_house",
+            "export",
+            None,
+            json.dumps({"row_count": row_count, "format": "xlsx", "scope": "full_house"}),
+            payload.get("sub"),
+            get_client_ip(request),
+        )
 
-    return Response(
-        content=content,
+    return StreamingResponse(
+        body,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": 'attachment; filename="contacts_template_full.xlsx"'},
     )
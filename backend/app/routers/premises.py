@@ -9,6 +9,7 @@ from typing import Any
 from fastapi import APIRouter, Query
 
 from app.db import get_db
+from app.response_cache import NS_CHESSBOARD, NS_ENTRANCES, NS_FLOORS, NS_NUMBERS, NS_TYPES, cached_response
 from app.room_normalizer import normalize_room_number
 from sqlalchemy import text
 
@@ -48,6 +49,7 @@ def normalize_number(number: str = Query(..., description="Номер помещ
 
 
 @router.get("/entrances")
+@cached_response(NS_ENTRANCES)
 def list_entrances(
     building_id: str | None = Query(None, description="Опционально при одном доме"),
 ) -> dict[str, Any]:
@@ -60,6 +62,7 @@ def list_entrances(
 
 
 @router.get("/floors")
+@cached_response(NS_FLOORS)
 def list_floors(
     entrance: str | None = Query(None, description="Выбранный подъезд (опционально)"),
     building_id: str | None = Query(None),
@@ -76,6 +79,7 @@ def list_floors(
 
 
 @router.get("/types")
+@cached_response(NS_TYPES)
 def list_types(
     floor: str = Query(..., description="Выбранный этаж"),
     entrance: str | None = Query(None),
@@ -92,6 +96,7 @@ def list_types(
 
 
 @router.get("/chessboard")
+@cached_response(NS_CHESSBOARD)
 def chessboard(
     entrance: str = Query(..., description="Подъезд"),
 ) -> dict[str, Any]:
@@ -238,6 +243,7 @@ def chessboard(
 
 
 @router.get("/numbers")
+@cached_response(NS_NUMBERS)
 def list_numbers(
     floor: str = Query(...),
     type: str = Query(..., alias="type", description="Тип помещения"),
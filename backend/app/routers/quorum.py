@@ -7,128 +7,78 @@ from typing import Any
 from fastapi import APIRouter
 from sqlalchemy import text
 
+from app.config import QUORUM_FROM_STATS
 from app.db import get_db
+from app.response_cache import NS_QUORUM, cached_response
 
 router = APIRouter(tags=["quorum"])
 
 QUORUM_THRESHOLD = 2 / 3  # 0.667
 
+# Все показатели — одним агрегатом (SUM ... FILTER): общая площадь; площадь «ЗА» — есть контакт с голосом 'for';
+# SR-CORE04-007: ЭД — есть контакт (pending/validated) с registered_in_ed = 'owner' / 'owner' или 'account';
+# CORE-05: участие — площадь × min(сумма долей участвовавших, 1).
+# Основной путь — premise_quorum_stats (флаги по помещениям, поддерживаются триггерами, миграция 014).
+_STATS_SQL = """
+    SELECT COALESCE(SUM(area), 0),
+           COALESCE(SUM(area) FILTER (WHERE voted_for), 0),
+           COALESCE(SUM(area) FILTER (WHERE ed_owner), 0),
+           COALESCE(SUM(area) FILTER (WHERE ed_any), 0),
+           COALESCE(SUM(area * participated_share), 0)
+    FROM premise_quorum_stats
+    WHERE {where}
+"""
+# Расчёт по исходным таблицам за один проход (QUORUM_FROM_STATS=false): флаги помещений — в CTE
+_LIVE_SQL = """
+    WITH cf AS (
+        SELECT c.premise_id,
+               bool_or(o.barrier_vote = 'for') AS voted_for,
+               bool_or(c.registered_in_ed = 'owner' AND c.status IN ('pending', 'validated')) AS ed_owner,
+               bool_or(c.registered_in_ed IN ('owner', 'account') AND c.status IN ('pending', 'validated')) AS ed_any
+        FROM contacts c
+        LEFT JOIN oss_voting o ON o.contact_id = c.id
+        WHERE {where_c}
+        GROUP BY c.premise_id
+    ), ps AS (
+        SELECT premise_id, SUM(ownership_share) AS share_sum
+        FROM oss_participation
+        WHERE participated = true AND {where_ps}
+        GROUP BY premise_id
+    )
+    SELECT COALESCE(SUM(COALESCE(p.area, 0)), 0),
+           COALESCE(SUM(COALESCE(p.area, 0)) FILTER (WHERE cf.voted_for), 0),
+           COALESCE(SUM(COALESCE(p.area, 0)) FILTER (WHERE cf.ed_owner), 0),
+           COALESCE(SUM(COALESCE(p.area, 0)) FILTER (WHERE cf.ed_any), 0),
+           COALESCE(SUM(COALESCE(p.area, 0) * LEAST(COALESCE(ps.share_sum, 0), 1)), 0)
+    FROM premises p
+    LEFT JOIN cf ON cf.premise_id = p.cadastral_number
+    LEFT JOIN ps ON ps.premise_id = p.cadastral_number
+    WHERE {where_p}
+"""
+
 
 @router.get("/api/buildings/{building_id}/quorum")
+@cached_response(NS_QUORUM)
 def get_quorum(building_id: str) -> dict[str, Any]:
     """
     SR-CORE04-001..005: общая площадь, площадь «ЗА», доля, порог 2/3, кворум достигнут/нет.
     building_id = префикс кадастрового номера (напр. 77:01:0001001) или "default" — все помещения.
     """
     use_prefix = building_id != "default"
-    params: dict[str, Any] = {}
-    where = "1=1"
-    if use_prefix:
-        where = "starts_with(cadastral_number, :bid)"
-        params["bid"] = building_id
-
+    params: dict[str, Any] = {"bid": building_id} if use_prefix else {}
+    if QUORUM_FROM_STATS:
+        sql = _STATS_SQL.format(where="starts_with(premise_id, :bid)" if use_prefix else "1=1")
+    else:
+        sql = _LIVE_SQL.format(
+            where_p="starts_with(p.cadastral_number, :bid)" if use_prefix else "1=1",
+            where_c="starts_with(c.premise_id, :bid)" if use_prefix else "1=1",
+            where_ps="starts_with(premise_id, :bid)" if use_prefix else "1=1",
+        )
     with get_db() as db:
-        total_row = db.execute(
-            text(
-                f"SELECT COALESCE(SUM(COALESCE(area, 0)), 0) FROM premises WHERE {where}"
-            ),
-            params,
-        ).fetchone()
-        total_area = float(total_row[0] or 0)
-
-        if use_prefix:
-            area_for_row = db.execute(
-                text("""
-                    SELECT COALESCE(SUM(COALESCE(p.area, 0)), 0) FROM premises p
-                    WHERE starts_with(p.cadastral_number, :bid)
-                    AND EXISTS (
-                        SELECT 1 FROM contacts c
-                        JOIN oss_voting o ON o.contact_id = c.id
-                        WHERE c.premise_id = p.cadastral_number AND o.barrier_vote = 'for'
-                    )
-                """),
-                {"bid": building_id},
-            ).fetchone()
-        else:
-            area_for_row = db.execute(
-                text("""
-                    SELECT COALESCE(SUM(COALESCE(p.area, 0)), 0) FROM premises p
-                    WHERE EXISTS (
-                        SELECT 1 FROM contacts c
-                        JOIN oss_voting o ON o.contact_id = c.id
-                        WHERE c.premise_id = p.cadastral_number AND o.barrier_vote = 'for'
-                    )
-                """)
-            ).fetchone()
-        area_voted_for = float(area_for_row[0] or 0)
-
-        # SR-CORE04-007: площадь помещений с хотя бы одним контактом в ЭД (pending/validated)
-        # В новой модели учитываем только помещения, где есть контакт с registered_in_ed = 'owner'
-        ed_exists = """
-            EXISTS (
-                SELECT 1 FROM contacts c
-                WHERE c.premise_id = p.cadastral_number
-                  AND c.registered_in_ed = 'owner'
-                  AND c.status IN ('pending', 'validated')
-            )
-        """
-        # Площадь помещений, где есть контакт с ЭД (owner ИЛИ account) — все зарегистрированные
-        ed_exists_any = """
-            EXISTS (
-                SELECT 1 FROM contacts c
-                WHERE c.premise_id = p.cadastral_number
-                  AND c.registered_in_ed IN ('owner', 'account')
-                  AND c.status IN ('pending', 'validated')
-            )
-        """
-        if use_prefix:
-            area_ed_row = db.execute(
-                text(f"""
-                    SELECT COALESCE(SUM(COALESCE(p.area, 0)), 0) FROM premises p
-                    WHERE starts_with(p.cadastral_number, :bid) AND {ed_exists}
-                """),
-                {"bid": building_id},
-            ).fetchone()
-            area_ed_any_row = db.execute(
-                text(f"""
-                    SELECT COALESCE(SUM(COALESCE(p.area, 0)), 0) FROM premises p
-                    WHERE starts_with(p.cadastral_number, :bid) AND {ed_exists_any}
-                """),
-                {"bid": building_id},
-            ).fetchone()
-        else:
-            area_ed_row = db.execute(
-                text(f"SELECT COALESCE(SUM(COALESCE(p.area, 0)), 0) FROM premises p WHERE {ed_exists}")
-            ).fetchone()
-            area_ed_any_row = db.execute(
-                text(f"SELECT COALESCE(SUM(COALESCE(p.area, 0)), 0) FROM premises p WHERE {ed_exists_any}")
-            ).fetchone()
-        area_registered_ed = float(area_ed_row[0] or 0)
-        area_registered_ed_any = float(area_ed_any_row[0] or 0)
-
-        participation_sql = """
-            SELECT COALESCE(SUM(
-                COALESCE(p.area, 0) * LEAST(COALESCE(ps.share_sum, 0), 1)
-            ), 0)
-            FROM premises p
-            LEFT JOIN (
-                SELECT premise_id, SUM(ownership_share) AS share_sum
-                FROM oss_participation
-                WHERE participated = true
-                GROUP BY premise_id
-            ) ps ON ps.premise_id = p.cadastral_number
-            WHERE {where_p}
-        """
-        if use_prefix:
-            area_participated_row = db.execute(
-                text(participation_sql.format(where_p="starts_with(p.cadastral_number, :bid)")),
-                {"bid": building_id},
-            ).fetchone()
-        else:
-            area_participated_row = db.execute(
-                text(participation_sql.format(where_p="1=1"))
-            ).fetchone()
-        area_participated = float(area_participated_row[0] or 0)
+        row = db.execute(text(sql), params).fetchone()
+    total_area, area_voted_for, area_registered_ed, area_registered_ed_any, area_participated = (
+        float(v or 0) for v in row
+    )
 
     ratio = (area_voted_for / total_area) if total_area > 0 else 0.0
     quorum_reached = ratio >= QUORUM_THRESHOLD
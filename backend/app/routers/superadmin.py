@@ -3,33 +3,24 @@ ADM-04: Управление белым списком админов (толь
 ADM-05: Логирование действий суперадмина в audit_log (SR-ADM05-001, SR-ADM05-002, SR-ADM05-003).
 """
 import logging
+import time
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 from sqlalchemy import text
 
+from app.audit_log import audit_writer_stats, write_audit
 from app.auth_password import hash_password
 from app.client_ip import get_client_ip
 from app.db import get_db
+from app.import_register import create_watermarks_for_admin
 from app.jwt_utils import require_super_admin_with_consent
+from app.response_cache import cache_stats
 
 logger = logging.getLogger(__name__)
 
 
-def _audit_log(db, entity_type: str, entity_id: str, action: str, old_value: str | None, new_value: str | None, user_id: str | None, ip: str | None) -> None:
-    """ADM-05: запись в аудит-лог (BE-03)."""
-    try:
-        db.execute(
-            text(
-                "INSERT INTO audit_log (entity_type, entity_id, action, old_value, new_value, user_id, ip) "
-                "VALUES (:et, :eid, :act, :old, :new, :uid, :ip)"
-            ),
-            {"et": entity_type, "eid": entity_id, "act": action, "old": old_value, "new": new_value, "uid": user_id, "ip": ip},
-        )
-    except Exception as e:
-        logger.warning("audit_log insert failed: %s", e)
-
 router = APIRouter(prefix="/api/superadmin", tags=["superadmin"])
 
 
@@ -90,16 +81,20 @@ def add_admin(
     full_name = (body.full_name or "").strip() or "—"
     premises = (body.premises or "").strip() or "—"
     with get_db() as db:
-        db.execute(
+        inserted = db.execute(
             text(
                 "INSERT INTO admins (telegram_id, role, login, password_hash, full_name, premises) "
-                "VALUES (:tid, :role, :login, :ph, :full_name, :premises) ON CONFLICT (telegram_id) DO NOTHING"
+                "VALUES (:tid, :role, :login, :ph, :full_name, :premises) ON CONFLICT (telegram_id) DO NOTHING "
+                "RETURNING telegram_id"
             ),
             {"tid": tid, "role": body.role, "login": login_val, "ph": password_hash, "full_name": full_name, "premises": premises},
-        )
-        _audit_log(db, "admin", tid, "insert", None, body.role, payload.get("sub"), get_client_ip(request))
+        ).fetchone()
+        if inserted:
+            # Водяные знаки по всем подъездам — одной пачкой, вместе с добавлением админа
+            create_watermarks_for_admin(db, tid)
+        write_audit(db, "admin", tid, "insert", None, body.role, payload.get("sub"), get_client_ip(request))
         if password_hash:
-            _audit_log(db, "admin", tid, "password_change", None, "on_create", payload.get("sub"), get_client_ip(request))
+            write_audit(db, "admin", tid, "password_change", None, "on_create", payload.get("sub"), get_client_ip(request))
         db.commit()
     logger.info("ADM-04: Admin added telegram_id=%s by sub=%s", tid, payload.get("sub"))
     return {"ok": True, "telegram_id": tid, "role": body.role}
@@ -160,9 +155,9 @@ def patch_admin(
                 parts.append("full_name")
             if body.premises is not None:
                 parts.append("premises")
-            _audit_log(db, "admin", telegram_id, "update", None, ",".join(parts) if parts else "login,password", payload.get("sub"), get_client_ip(request))
+            write_audit(db, "admin", telegram_id, "update", None, ",".join(parts) if parts else "login,password", payload.get("sub"), get_client_ip(request))
             if body.password is not None and (body.password or "").strip():
-                _audit_log(db, "admin", telegram_id, "password_change", None, "by_superadmin", payload.get("sub"), get_client_ip(request))
+                write_audit(db, "admin", telegram_id, "password_change", None, "by_superadmin", payload.get("sub"), get_client_ip(request))
             db.commit()
     logger.info("ADM-04: Admin patched telegram_id=%s (login/password) by sub=%s", telegram_id, payload.get("sub"))
     return {"ok": True, "telegram_id": telegram_id}
@@ -196,7 +191,7 @@ def delete_admin(
                 raise HTTPException(status_code=400, detail="Cannot remove the last super_administrator")
         role_before = target[0]
         db.execute(text("DELETE FROM admins WHERE telegram_id = :tid"), {"tid": telegram_id})
-        _audit_log(db, "admin", telegram_id, "delete", role_before, None, current_sub, get_client_ip(request))
+        write_audit(db, "admin", telegram_id, "delete", role_before, None, current_sub, get_client_ip(request))
         db.commit()
     logger.info("ADM-04: Admin removed telegram_id=%s by sub=%s", telegram_id, current_sub)
     return {"ok": True, "telegram_id": telegram_id}
@@ -244,7 +239,7 @@ def add_bot_alias(
             ),
             {"pt": body.premises_type.strip(), "sn": body.short_name.strip(), "a": alias_lower},
         )
-        _audit_log(db, "bot_alias", alias_lower, "insert", None, body.premises_type, payload.get("sub"), get_client_ip(request))
+        write_audit(db, "bot_alias", alias_lower, "insert", None, body.premises_type, payload.get("sub"), get_client_ip(request))
         db.commit()
 
     from app.bot_premise_resolver import reload_aliases
@@ -266,7 +261,7 @@ def delete_bot_alias(
         if not row:
             raise HTTPException(status_code=404, detail="Alias not found")
         db.execute(text("DELETE FROM premise_type_aliases WHERE id = :id"), {"id": alias_id})
-        _audit_log(db, "bot_alias", row[0], "delete", row[1], None, payload.get("sub"), get_client_ip(request))
+        write_audit(db, "bot_alias", row[0], "delete", row[1], None, payload.get("sub"), get_client_ip(request))
         db.commit()
 
     from app.bot_premise_resolver import reload_aliases
@@ -298,3 +293,79 @@ def list_bot_unrecognized(
         ],
         "total": total,
     }
+
+
+TRIAGE_MAX_INPUTS = 10000
+
+
+@router.get("/bot-unrecognized/triage")
+def triage_bot_unrecognized(
+    limit: int = Query(5000, ge=1, le=TRIAGE_MAX_INPUTS, description="Сколько различных вводов разобрать (частые первыми)"),
+    top: int = Query(3, ge=1, le=10, description="Кандидатов-помещений на ввод"),
+    min_score: int = Query(60, ge=0, le=100, description="Минимальная схожесть, 0..100"),
+    payload: dict = Depends(require_super_admin_with_consent),
+) -> dict[str, Any]:
+    """
+    BOT-01: пакетный разбор нераспознанных вводов. Различные вводы (с числом повторов) сравниваются со всеми
+    помещениями и синонимами одним векторным проходом rapidfuzz (cdist): по каждому — помещения-кандидаты
+    со схожестью и предлагаемый синоним типа помещения. aliases — предлагаемые синонимы, сведённые по всем вводам.
+    """
+    from app.bot_premise_resolver import triage
+
+    with get_db() as db:
+        rows = db.execute(
+            text(
+                "SELECT input_text, COUNT(*) AS n, MAX(created_at) AS last_seen FROM bot_unrecognized "
+                "GROUP BY input_text ORDER BY n DESC, last_seen DESC LIMIT :lim"
+            ),
+            {"lim": limit},
+        ).fetchall()
+    started = time.perf_counter()
+    try:
+        triaged = triage([r[0] for r in rows], top=top, min_score=min_score)
+    except ImportError as e:
+        logger.warning("Bot triage unavailable: %s", e)
+        raise HTTPException(status_code=503, detail="Fuzzy matching is not available")
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    items = []
+    aliases: dict[tuple[str, str], dict[str, Any]] = {}
+    for r, t in zip(rows, triaged):
+        items.append({
+            "input_text": r[0],
+            "count": r[1],
+            "last_seen": r[2].isoformat() if r[2] else None,
+            **t,
+        })
+        suggestion = t["suggested_alias"]
+        if suggestion:
+            agg = aliases.setdefault(
+                (suggestion["alias"], suggestion["premises_type"]),
+                {**{k: suggestion[k] for k in ("alias", "premises_type", "short_name", "score")}, "inputs": 0},
+            )
+            agg["inputs"] += r[1]
+    return {
+        "items": items,
+        "aliases": sorted(aliases.values(), key=lambda a: (-a["inputs"], -a["score"], a["alias"])),
+        "elapsed_ms": elapsed_ms,
+    }
+
+
+# --- Кэш публичных эндпоинтов: попадания/промахи ---
+
+@router.get("/response-cache")
+def get_response_cache_stats(
+    payload: dict = Depends(require_super_admin_with_consent),
+) -> dict[str, Any]:
+    """Счётчики кэша ответов (каскад помещений, шахматка, кворум): hits, misses, hit_ratio, entries."""
+    return cache_stats()
+
+
+# --- Фоновая запись аудита: буфер и файл-очередь ---
+
+@router.get("/audit-writer")
+def get_audit_writer_stats(
+    payload: dict = Depends(require_super_admin_with_consent),
+) -> dict[str, Any]:
+    """Состояние буфера аудита: событий в буфере, записано, ушло в файл-очередь (БД была недоступна)."""
+    return audit_writer_stats()
@@ -0,0 +1,141 @@
+"""
+ADM-08: дисковый кэш сформированных шаблонов контактов.
+Ключ — (админ, подъезд | full_house, id водяного знака, версия данных из template_data_versions): пока данные
+подъезда не менялись и последний водяной знак админа тот же, повторная выгрузка отдаётся с диска без расшифровки
+ПДн и сборки XLSX. Файл зашифрован мастер-ключом (Fernet) частями по TEMPLATE_CACHE_CHUNK_BYTES — запись и чтение
+потоковые. На (админ, подъезд) хранится один файл; общий размер ограничен TEMPLATE_CACHE_MAX_MB
+(вытесняются давно не выдававшиеся).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from cryptography.fernet import InvalidToken
+from sqlalchemy import text
+
+from app.config import TEMPLATE_CACHE_DIR, TEMPLATE_CACHE_MAX_MB
+from app.crypto import encrypt_stream, iter_decrypted_chunks, read_encrypted_chunk, write_encrypted_chunk
+from app.db import get_db
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_CACHE_CHUNK_BYTES = 1024 * 1024
+
+
+def template_data_version(entrance: str | None) -> int:
+    """Версия данных подъезда (entrance=None — всего дома: сумма версий подъездов)."""
+    with get_db() as db:
+        if entrance is None:
+            return int(db.execute(text("SELECT COALESCE(SUM(version), 0) FROM template_data_versions")).scalar() or 0)
+        return int(
+            db.execute(
+                text("SELECT version FROM template_data_versions WHERE entrance = :e"), {"e": entrance}
+            ).scalar() or 0
+        )
+
+
+def latest_watermark_id(admin_telegram_id: str, entrance: str) -> int | None:
+    """Последний водяной знак админа по подъезду — его canary в закэшированном файле и в списке контактов."""
+    with get_db() as db:
+        return db.execute(
+            text(
+                "SELECT id FROM export_watermarks WHERE admin_telegram_id = :aid AND entrance = :e "
+                "ORDER BY created_at DESC, id DESC LIMIT 1"
+            ),
+            {"aid": admin_telegram_id, "e": entrance},
+        ).scalar()
+
+
+class TemplateCache:
+    """Файлы <хэш(админ, подъезд)>_<хэш(полный ключ)>.bin: токен Fernet с метаданными, затем токены данных."""
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, admin_telegram_id: str, entrance: str, watermark_id: int, version: int) -> Path:
+        owner = hashlib.sha256(f"{admin_telegram_id}\0{entrance}".encode("utf-8")).hexdigest()[:16]
+        full = hashlib.sha256(f"{admin_telegram_id}\0{entrance}\0{watermark_id}\0{version}".encode("utf-8")).hexdigest()[:32]
+        return self.directory / f"{owner}_{full}.bin"
+
+    def get(self, admin_telegram_id: str, entrance: str, watermark_id: int, version: int) -> tuple[Iterator[bytes], int] | None:
+        """(части расшифрованного файла, число строк данных) или None."""
+        if not self.enabled:
+            return None
+        path = self._path(admin_telegram_id, entrance, watermark_id, version)
+        try:
+            f = path.open("rb")
+        except FileNotFoundError:
+            return None
+        try:
+            meta = json.loads(read_encrypted_chunk(f) or b"")
+            os.utime(path)
+        except (InvalidToken, ValueError, KeyError, OSError) as e:
+            # Ключ сменился или файл повреждён — как промах
+            f.close()
+            logger.warning("Template cache entry %s unreadable, dropped: %s", path.name, e)
+            path.unlink(missing_ok=True)
+            return None
+        return self._iter_chunks(f), int(meta["row_count"])
+
+    @staticmethod
+    def _iter_chunks(f: BinaryIO) -> Iterator[bytes]:
+        with f:
+            yield from iter_decrypted_chunks(f)
+
+    def put(self, admin_telegram_id: str, entrance: str, watermark_id: int, version: int, src: BinaryIO, row_count: int) -> None:
+        """Зашифровать src (читается с текущей позиции до конца) в кэш; прежний файл (админ, подъезд) удаляется."""
+        if not self.enabled:
+            return
+        path = self._path(admin_telegram_id, entrance, watermark_id, version)
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with tmp.open("wb") as out:
+                write_encrypted_chunk(out, json.dumps({"row_count": row_count}).encode("utf-8"))
+                encrypt_stream(src, out, TEMPLATE_CACHE_CHUNK_BYTES)
+            with self._lock:
+                for old in self.directory.glob(path.name.split("_", 1)[0] + "_*.bin"):
+                    if old != path:
+                        old.unlink(missing_ok=True)
+                os.replace(tmp, path)
+                self._evict()
+        except OSError as e:
+            tmp.unlink(missing_ok=True)
+            logger.warning("Template cache write failed: %s", e)
+
+    def _evict(self) -> None:
+        """Удалять давно не выдававшиеся файлы, пока общий размер больше max_bytes."""
+        entries = []
+        for p in self.directory.glob("*.bin"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+
+
+_cache = TemplateCache(TEMPLATE_CACHE_DIR, TEMPLATE_CACHE_MAX_MB * 1024 * 1024)
+
+
+def get_template(admin_telegram_id: str, entrance: str, watermark_id: int, version: int) -> tuple[Iterator[bytes], int] | None:
+    return _cache.get(admin_telegram_id, entrance, watermark_id, version)
+
+
+def put_template(admin_telegram_id: str, entrance: str, watermark_id: int, version: int, src: BinaryIO, row_count: int) -> None:
+    _cache.put(admin_telegram_id, entrance, watermark_id, version, src, row_count)
@@ -0,0 +1,37 @@
+"""
+BE-03: хранение аудит-лога — создать будущие месячные секции audit_log и выгрузить секции старше
+AUDIT_RETENTION_MONTHS в архив AUDIT_ARCHIVE_DIR (см. app.audit_archive).
+
+Запуск из каталога backend (в контейнере — /app), например ежемесячно из cron на хосте:
+    docker exec mkd-backend python scripts/audit_retention.py [--months 24] [--dry-run]
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.audit_archive import run_retention  # noqa: E402
+from app.config import AUDIT_RETENTION_MONTHS  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--months", type=int, default=AUDIT_RETENTION_MONTHS,
+        help="сколько полных месяцев хранить в БД (0 — только создать секции)",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="показать секции к выгрузке, ничего не менять")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    archived = run_retention(args.months, dry_run=args.dry_run)
+    if not archived:
+        print("Нет секций старше срока хранения")
+    for a in archived:
+        print(f"{a['month']}: " + ("к выгрузке" if args.dry_run else f"выгружено строк: {a['rows']}"))
+
+
+if __name__ == "__main__":
+    main()
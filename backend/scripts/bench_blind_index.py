@@ -0,0 +1,67 @@
+"""
+BE-02: микробенчмарк Blind Index — прежний hmac.new на каждый вызов против app.blind_index
+(ключённый HMAC + copy(), blind_index_many, LRU для telegram_id).
+
+Запуск из каталога backend (в контейнере — /app):
+    python scripts/bench_blind_index.py [--n 100000]
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import sys
+import time
+
+os.environ.setdefault("BLIND_INDEX_PEPPER", "bench-pepper")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.blind_index import (  # noqa: E402
+    _normalize_phone,
+    _normalize_telegram_id,
+    blind_index_many,
+    blind_index_phone,
+    blind_index_telegram_id,
+)
+from app.config import BLIND_INDEX_PEPPER  # noqa: E402
+
+
+def _legacy(normalize, value):
+    """Реализация до app.blind_index: pepper кодируется и HMAC ключуется на каждый вызов."""
+    n = normalize(value)
+    if not n:
+        return None
+    return hmac.new(BLIND_INDEX_PEPPER.encode("utf-8"), n.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _measure(label: str, fn, n: int) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<42} {n / elapsed:>12,.0f} ops/s")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=100_000, help="число значений")
+    args = parser.parse_args()
+    n = args.n
+
+    phones = [f"8 (999) {i % 1000:03d}-{i // 1000 % 100:02d}-{i % 97:02d}" for i in range(n)]
+    # Бот: небольшое множество активных пользователей, запросы повторяются
+    tg_ids = [str(100_000_000 + i % 500) for i in range(n)]
+
+    assert [_legacy(_normalize_phone, p) for p in phones[:100]] == blind_index_many("phone", phones[:100])
+
+    print(f"n = {n:,}")
+    old = _measure("phone: hmac.new на вызов", lambda: [_legacy(_normalize_phone, p) for p in phones], n)
+    new = _measure("phone: blind_index_phone (copy)", lambda: [blind_index_phone(p) for p in phones], n)
+    many = _measure("phone: blind_index_many", lambda: blind_index_many("phone", phones), n)
+    print(f"  ускорение: copy x{old / new:.2f}, many x{old / many:.2f}")
+    old = _measure("telegram_id: hmac.new на вызов", lambda: [_legacy(_normalize_telegram_id, t) for t in tg_ids], n)
+    new = _measure("telegram_id: blind_index_telegram_id (LRU)", lambda: [blind_index_telegram_id(t) for t in tg_ids], n)
+    print(f"  ускорение: x{old / new:.2f}")
+
+
+if __name__ == "__main__":
+    main()
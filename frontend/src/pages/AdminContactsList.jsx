@@ -36,6 +36,7 @@ export default function AdminContactsList() {
 
   const [contacts, setContacts] = useState([])
   const [total, setTotal] = useState(0)
+  const [nextCursor, setNextCursor] = useState(null)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
 
@@ -54,7 +55,8 @@ export default function AdminContactsList() {
     if (!token) navigate('/login', { replace: true })
   }, [token, navigate])
 
-  const fetchContacts = useCallback(async () => {
+  // VAL-01: список постраничный — cursor задан для «Показать ещё» (total приходит только с первой страницей)
+  const fetchContacts = useCallback(async (cursor = null) => {
     if (!token || !selectedEntrance) return
     setLoading(true)
     setError(null)
@@ -66,6 +68,9 @@ export default function AdminContactsList() {
       if (filterIp.trim()) params.set('ip', filterIp.trim())
       if (filterFrom) params.set('from_date', filterFrom)
       if (filterTo) params.set('to_date', filterTo)
+      if (cursor) params.set('cursor', cursor)
+      // ПДн в списке не расшифровываются — только признаки has_*; значения по кнопке «Показать» (reveal)
+      params.set('pii', 'flags')
       const res = await fetch(`/api/admin/contacts?${params}`, {
         headers: { Authorization: `Bearer ${token}` },
       })
@@ -78,8 +83,13 @@ export default function AdminContactsList() {
       }
       const data = await res.json().catch(() => ({}))
       if (res.ok) {
-        setContacts(data.contacts || [])
-        setTotal(data.total || 0)
+        if (cursor) {
+          setContacts((prev) => [...prev, ...(data.contacts || [])])
+        } else {
+          setContacts(data.contacts || [])
+          setTotal(data.total || 0)
+        }
+        setNextCursor(data.next_cursor || null)
       } else {
         setError(typeof data.detail === 'string' ? data.detail : 'Ошибка загрузки')
       }
@@ -95,6 +105,7 @@ export default function AdminContactsList() {
     else {
       setContacts([])
       setTotal(0)
+      setNextCursor(null)
       setError(null)
     }
   }, [selectedEntrance, fetchContacts])
@@ -131,6 +142,44 @@ export default function AdminContactsList() {
     }
   }
 
+  const revealContacts = async (ids, e) => {
+    e?.stopPropagation()
+    if (!token || ids.length === 0) return
+    try {
+      const res = await fetch('/api/admin/contacts/reveal', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          Authorization: `Bearer ${token}`,
+        },
+        body: JSON.stringify({ contact_ids: ids, entrance: selectedEntrance }),
+      })
+      const { redirectConsent, dataFor403 } = await checkConsentRedirect(res, navigate)
+      if (redirectConsent) return
+      if (dataFor403 !== undefined || res.status === 401 || res.status === 403) {
+        clearAuth()
+        navigate('/login', { replace: true })
+        return
+      }
+      const data = await res.json().catch(() => ({}))
+      if (res.ok) {
+        const byId = new Map((data.contacts || []).map((r) => [r.id, r]))
+        setContacts((prev) =>
+          prev.map((c) => (byId.has(c.id) ? { ...c, ...byId.get(c.id), revealed: true } : c))
+        )
+      } else {
+        alert(typeof data.detail === 'string' ? data.detail : 'Ошибка загрузки данных')
+      }
+    } catch (err) {
+      alert(err.message || 'Ошибка сети')
+    }
+  }
+
+  // Поле есть, но ещё не раскрыто
+  const isMasked = (c, field) => !c.revealed && c[`has_${field}`]
+  const hasHiddenPii = (c) =>
+    !c.revealed && (c.has_phone || c.has_email || c.has_telegram_id || c.has_how_to_address)
+
   const toggleSelect = (id, e) => {
     e?.stopPropagation()
     setSelected((prev) => {
@@ -171,8 +220,11 @@ export default function AdminContactsList() {
         return
       }
       if (res.ok) {
+        // results: по каждому ID — updated / unchanged / not_found (удалён другим админом)
+        const data = await res.json().catch(() => ({}))
+        const missing = new Set((data.results || []).filter((r) => r.result === 'not_found').map((r) => r.id))
         setContacts((prev) =>
-          prev.map((c) => (selected.has(c.id) ? { ...c, status: newStatus } : c))
+          prev.map((c) => (selected.has(c.id) && !missing.has(c.id) ? { ...c, status: newStatus } : c))
         )
         setSelected(new Set())
       } else {
@@ -291,7 +343,7 @@ export default function AdminContactsList() {
             onChange={(e) => setFilterTo(e.target.value)}
           />
         </label>
-        <button type="button" onClick={fetchContacts} disabled={loading}>
+        <button type="button" onClick={() => fetchContacts()} disabled={loading}>
           {loading ? 'Загрузка…' : 'Обновить'}
         </button>
       </div>
@@ -312,6 +364,9 @@ export default function AdminContactsList() {
           <button type="button" className="btn-inactive" disabled={bulkLoading} onClick={() => handleBulkStatus('inactive')}>
             Неактуальный
           </button>
+          <button type="button" disabled={bulkLoading} onClick={(e) => revealContacts([...selected], e)}>
+            Показать данные
+          </button>
           <button type="button" disabled={bulkLoading} onClick={() => setSelected(new Set())}>
             Снять выделение
           </button>
@@ -363,14 +418,14 @@ export default function AdminContactsList() {
                     >
                       <TelegramIcon width={20} height={20} />
                     </a>
-                  ) : '—'}
+                  ) : (isMasked(c, 'telegram_id') || isMasked(c, 'phone') ? '•••' : '—')}
                 </td>
-                <td>{c.how_to_address || '—'}</td>
-                <td>{c.phone || '—'}</td>
+                <td>{c.how_to_address || (isMasked(c, 'how_to_address') ? '•••' : '—')}</td>
+                <td>{c.phone || (isMasked(c, 'phone') ? '•••' : '—')}</td>
                 <td onClick={(e) => e.stopPropagation()}>
                   {c.email ? (
                     <a href={`mailto:${c.email}`} className="btn-icon-link" title="Написать письмо">📧</a>
-                  ) : '—'}
+                  ) : (isMasked(c, 'email') ? '•••' : '—')}
                 </td>
                 <td className="col-owner">{c.is_owner ? 'Да' : 'Нет'}</td>
                 <td>{c.ip || '—'}</td>
@@ -379,6 +434,11 @@ export default function AdminContactsList() {
                 <td>{c.registered_ed ? (REGISTERED_ED_LABELS[c.registered_ed] ?? c.registered_ed) : '—'}</td>
                 <td>{c.created_at ? new Date(c.created_at).toLocaleDateString('ru-RU', { day: '2-digit', month: '2-digit', year: '2-digit' }) : '—'}</td>
                 <td className="actions" onClick={(e) => e.stopPropagation()}>
+                  {hasHiddenPii(c) && (
+                    <button type="button" className="btn-reveal" onClick={(e) => revealContacts([c.id], e)}>
+                      Показать
+                    </button>
+                  )}
                   <Link to={`/admin/contacts/${c.id}`} state={{ fromEntrance: selectedEntrance }} className="btn-edit">Редактировать</Link>
                   {c.status !== 'validated' && (
                     <button type="button" className="btn-validate" onClick={(e) => handleStatusChange(c.id, 'validated', e)}>
@@ -402,6 +462,12 @@ export default function AdminContactsList() {
         </table>
       )}
 
+      {nextCursor && (
+        <button type="button" className="btn-load-more" onClick={() => fetchContacts(nextCursor)} disabled={loading}>
+          {loading ? 'Загрузка…' : `Показать ещё (${contacts.length} из ${total})`}
+        </button>
+      )}
+
       {!loading && selectedEntrance && contacts.length === 0 && !error && (
         <p className="empty-message">В выбранном подъезде контакты не найдены.</p>
       )}
@@ -20,6 +20,7 @@ const ACTION_LABELS = {
   password_change: 'Смена пароля',
   policy_consent: 'Согласие с политикой',
   export: 'Экспорт',
+  reveal: 'Раскрытие ПДн',
 }
 
 const ENTITY_TYPE_LABELS = {
@@ -64,10 +65,16 @@ export default function AuditLog() {
 
   const [items, setItems] = useState([])
   const [total, setTotal] = useState(0)
+  const [totalEstimated, setTotalEstimated] = useState(false)
   const [loading, setLoading] = useState(false)
   const [exporting, setExporting] = useState(false)
+  const [exportFormat, setExportFormat] = useState('xlsx')
   const [error, setError] = useState(null)
-  const [offset, setOffset] = useState(0)
+  // Keyset-пагинация: before_id каждой открытой страницы (null — первая), next_before_id — следующая
+  const [pageCursors, setPageCursors] = useState([null])
+  const [nextBeforeId, setNextBeforeId] = useState(null)
+  const beforeId = pageCursors[pageCursors.length - 1]
+  const resetPages = () => setPageCursors([null])
 
   const [filterEntity, setFilterEntity] = useState('')
   const [filterAction, setFilterAction] = useState('')
@@ -93,7 +100,8 @@ export default function AuditLog() {
       if (filterFromDate) params.set('from_date', filterFromDate)
       if (filterToDate) params.set('to_date', filterToDate)
       params.set('limit', String(PAGE_SIZE))
-      params.set('offset', String(offset))
+      if (beforeId) params.set('before_id', String(beforeId))
+      params.set('total_mode', 'estimated')
 
       const res = await fetch(`/api/admin/audit?${params}`, {
         headers: { Authorization: `Bearer ${token}` },
@@ -109,6 +117,8 @@ export default function AuditLog() {
       if (res.ok) {
         setItems(data.items || [])
         setTotal(data.total || 0)
+        setTotalEstimated(!!data.total_estimated)
+        setNextBeforeId(data.next_before_id || null)
       } else {
         setError(typeof data.detail === 'string' ? data.detail : 'Ошибка загрузки')
       }
@@ -117,14 +127,13 @@ export default function AuditLog() {
     } finally {
       setLoading(false)
     }
-  }, [token, filterEntity, filterAction, filterUser, filterEntityId, filterFromDate, filterToDate, offset, navigate])
+  }, [token, filterEntity, filterAction, filterUser, filterEntityId, filterFromDate, filterToDate, beforeId, navigate])
 
   useEffect(() => {
     fetchAudit()
   }, [fetchAudit])
 
-  const totalPages = Math.ceil(total / PAGE_SIZE)
-  const currentPage = Math.floor(offset / PAGE_SIZE) + 1
+  const currentPage = pageCursors.length
 
   function buildFilterParams() {
     const params = new URLSearchParams()
@@ -142,6 +151,7 @@ export default function AuditLog() {
     setExporting(true)
     try {
       const params = buildFilterParams()
+      params.set('format', exportFormat)
       const res = await fetch(`/api/admin/audit/export?${params}`, {
         headers: { Authorization: `Bearer ${token}` },
       })
@@ -153,7 +163,7 @@ export default function AuditLog() {
       const url = URL.createObjectURL(blob)
       const a = document.createElement('a')
       a.href = url
-      a.download = 'audit_log.xlsx'
+      a.download = `audit_log.${exportFormat}`
       a.click()
       URL.revokeObjectURL(url)
     } catch (err) {
@@ -208,7 +218,7 @@ export default function AuditLog() {
       <div className="filters-bar">
         <label>
           Сущность:
-          <select value={filterEntity} onChange={(e) => { setFilterEntity(e.target.value); setOffset(0) }}>
+          <select value={filterEntity} onChange={(e) => { setFilterEntity(e.target.value); resetPages() }}>
             <option value="">Все</option>
             {Object.entries(ENTITY_TYPE_LABELS).map(([k, v]) => (
               <option key={k} value={k}>{v}</option>
@@ -217,7 +227,7 @@ export default function AuditLog() {
         </label>
         <label>
           Действие:
-          <select value={filterAction} onChange={(e) => { setFilterAction(e.target.value); setOffset(0) }}>
+          <select value={filterAction} onChange={(e) => { setFilterAction(e.target.value); resetPages() }}>
             <option value="">Все</option>
             {Object.entries(ACTION_LABELS).map(([k, v]) => (
               <option key={k} value={k}>{v}</option>
@@ -247,7 +257,7 @@ export default function AuditLog() {
           <input
             type="date"
             value={filterFromDate}
-            onChange={(e) => { setFilterFromDate(e.target.value); setOffset(0) }}
+            onChange={(e) => { setFilterFromDate(e.target.value); resetPages() }}
           />
         </label>
         <label>
@@ -255,20 +265,25 @@ export default function AuditLog() {
           <input
             type="date"
             value={filterToDate}
-            onChange={(e) => { setFilterToDate(e.target.value); setOffset(0) }}
+            onChange={(e) => { setFilterToDate(e.target.value); resetPages() }}
           />
         </label>
-        <button type="button" onClick={() => { setOffset(0); fetchAudit() }} disabled={loading}>
+        <button type="button" onClick={() => { if (beforeId) resetPages(); else fetchAudit() }} disabled={loading}>
           {loading ? 'Загрузка…' : 'Обновить'}
         </button>
+        <select value={exportFormat} onChange={(e) => setExportFormat(e.target.value)} disabled={exporting}>
+          <option value="xlsx">Excel (XLSX)</option>
+          <option value="csv">CSV</option>
+          <option value="csv.gz">CSV (gzip)</option>
+        </select>
         <button type="button" onClick={handleExport} disabled={exporting || loading} className="export-btn">
-          {exporting ? 'Экспорт…' : 'Экспорт в Excel'}
+          {exporting ? 'Экспорт…' : 'Экспорт'}
         </button>
       </div>
 
       {error && <p className="list-error">{error}</p>}
 
-      <p className="total-info">Записей: {total}</p>
+      <p className="total-info">Записей: {totalEstimated ? `≈ ${total}` : total}</p>
 
       {items.length > 0 && (
         <table className="audit-table">
@@ -303,13 +318,13 @@ export default function AuditLog() {
         </table>
       )}
 
-      {totalPages > 1 && (
+      {(currentPage > 1 || nextBeforeId) && (
         <div className="pagination">
-          <button type="button" disabled={offset === 0} onClick={() => setOffset(Math.max(0, offset - PAGE_SIZE))}>
+          <button type="button" disabled={currentPage === 1} onClick={() => setPageCursors((prev) => prev.slice(0, -1))}>
             ← Назад
           </button>
-          <span>Стр. {currentPage} из {totalPages}</span>
-          <button type="button" disabled={currentPage >= totalPages} onClick={() => setOffset(offset + PAGE_SIZE)}>
+          <span>Стр. {currentPage} из {totalEstimated ? '≈ ' : ''}{Math.max(1, Math.ceil(total / PAGE_SIZE))}</span>
+          <button type="button" disabled={!nextBeforeId} onClick={() => setPageCursors((prev) => [...prev, nextBeforeId])}>
             Вперёд →
           </button>
         </div>
@@ -21,6 +21,9 @@ export default function BotUnrecognized() {
   const [offset, setOffset] = useState(0)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
+  const [triage, setTriage] = useState(null)
+  const [triaging, setTriaging] = useState(false)
+  const [addedAliases, setAddedAliases] = useState({})
 
   const fetchData = useCallback(async (off) => {
     if (!token) return
@@ -56,6 +59,59 @@ export default function BotUnrecognized() {
     fetchData(offset)
   }, [token, navigate, fetchData, offset])
 
+  const authFailed = async (res) => {
+    const { redirectConsent, dataFor403 } = await checkConsentRedirect(res, navigate)
+    if (redirectConsent) return true
+    if (dataFor403 !== undefined || res.status === 401 || res.status === 403) {
+      clearAuth()
+      navigate('/login', { replace: true })
+      return true
+    }
+    return false
+  }
+
+  // Пакетный разбор: все различные вводы против всех помещений и синонимов за один запрос
+  const runTriage = async () => {
+    setTriaging(true)
+    setError(null)
+    try {
+      const res = await fetch('/api/superadmin/bot-unrecognized/triage', {
+        headers: { Authorization: `Bearer ${token}` },
+      })
+      if (await authFailed(res)) return
+      const data = await res.json().catch(() => ({}))
+      if (res.ok) {
+        setTriage(data)
+      } else {
+        setError(typeof data.detail === 'string' ? data.detail : 'Ошибка разбора')
+      }
+    } catch (err) {
+      setError(err.message || 'Ошибка сети')
+    } finally {
+      setTriaging(false)
+    }
+  }
+
+  const addAlias = async (a) => {
+    setError(null)
+    try {
+      const res = await fetch('/api/superadmin/bot-aliases', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
+        body: JSON.stringify({ premises_type: a.premises_type, short_name: a.short_name, alias: a.alias }),
+      })
+      if (await authFailed(res)) return
+      const data = await res.json().catch(() => ({}))
+      if (res.ok) {
+        setAddedAliases((prev) => ({ ...prev, [a.alias]: true }))
+      } else {
+        setError(typeof data.detail === 'string' ? data.detail : 'Ошибка добавления')
+      }
+    } catch (err) {
+      setError(err.message || 'Ошибка сети')
+    }
+  }
+
   if (!token) return null
 
   const totalPages = Math.ceil(total / PAGE_SIZE)
@@ -70,6 +126,71 @@ export default function BotUnrecognized() {
       </p>
       {error && <p className="superadmin-admins-error">{error}</p>}
 
+      <p>
+        <button type="button" onClick={runTriage} disabled={triaging}>
+          {triaging ? 'Разбор…' : 'Подобрать помещения и синонимы'}
+        </button>
+      </p>
+      {triage && (
+        <>
+          <p>Разобрано различных вводов: {triage.items.length} за {triage.elapsed_ms} мс</p>
+          {triage.aliases.length > 0 && (
+            <>
+              <h2>Предлагаемые синонимы</h2>
+              <table className="superadmin-admins-table">
+                <thead>
+                  <tr>
+                    <th>Синоним</th>
+                    <th>Тип помещения</th>
+                    <th>Схожесть</th>
+                    <th>Вводов</th>
+                    <th></th>
+                  </tr>
+                </thead>
+                <tbody>
+                  {triage.aliases.map((a) => (
+                    <tr key={`${a.alias}|${a.premises_type}`}>
+                      <td style={{ fontFamily: 'monospace' }}>{a.alias}</td>
+                      <td>{a.premises_type} ({a.short_name})</td>
+                      <td>{a.score}</td>
+                      <td>{a.inputs}</td>
+                      <td>
+                        {addedAliases[a.alias]
+                          ? 'Добавлен'
+                          : <button type="button" onClick={() => addAlias(a)}>Добавить</button>}
+                      </td>
+                    </tr>
+                  ))}
+                </tbody>
+              </table>
+            </>
+          )}
+          <h2>Кандидаты по вводам</h2>
+          <table className="superadmin-admins-table">
+            <thead>
+              <tr>
+                <th>Ввод пользователя</th>
+                <th>Повторов</th>
+                <th>Помещения (схожесть)</th>
+              </tr>
+            </thead>
+            <tbody>
+              {triage.items.map((t) => (
+                <tr key={t.input_text}>
+                  <td style={{ fontFamily: 'monospace' }}>{t.input_text}</td>
+                  <td>{t.count}</td>
+                  <td>
+                    {t.candidates.length === 0
+                      ? '—'
+                      : t.candidates.map((c) => `${c.short_display} (${c.score})`).join(', ')}
+                  </td>
+                </tr>
+              ))}
+            </tbody>
+          </table>
+        </>
+      )}
+
       {loading && <p>Загрузка…</p>}
       {!loading && items.length === 0 && <p className="superadmin-empty">Нет нераспознанных вводов.</p>}
 
@@ -19,6 +19,22 @@ const EXPECTED_COLUMNS_CONTACTS = [
 
 const EXPECTED_COLUMNS_VOTING = ['cadastral_number', 'ownership_share']
 
+const IMPORT_JOB_POLL_MS = 1500
+
+/** Импорт — фоновая задача: POST отвечает 202 + job_id, отчёт забираем опросом GET /api/admin/import/jobs/{id}. */
+async function waitForImportJob(jobId, token) {
+  for (;;) {
+    await new Promise((resolve) => setTimeout(resolve, IMPORT_JOB_POLL_MS))
+    const res = await fetch(`/api/admin/import/jobs/${encodeURIComponent(jobId)}`, {
+      headers: { Authorization: `Bearer ${token}` },
+    })
+    const data = await res.json().catch(() => ({}))
+    if (!res.ok) return { error: typeof data.detail === 'string' ? data.detail : `HTTP ${res.status}` }
+    if (data.status === 'done') return data
+    if (data.status === 'failed') return { error: data.detail || 'Ошибка импорта' }
+  }
+}
+
 export default function Upload() {
   const [fileRegister, setFileRegister] = useState(null)
   const [fileContacts, setFileContacts] = useState(null)
@@ -89,7 +105,7 @@ export default function Upload() {
         }
         return
       }
-      setResultRegister(data)
+      setResultRegister(res.status === 202 && data.job_id ? await waitForImportJob(data.job_id, token) : data)
     } catch (err) {
       setResultRegister({ error: err.message || 'Ошибка сети' })
     } finally {
@@ -130,7 +146,7 @@ export default function Upload() {
         }
         return
       }
-      setResultContacts(data)
+      setResultContacts(res.status === 202 && data.job_id ? await waitForImportJob(data.job_id, token) : data)
     } catch (err) {
       setResultContacts({ error: err.message || 'Ошибка сети' })
     } finally {
@@ -177,7 +193,7 @@ export default function Upload() {
         }
         return
       }
-      setResultVoting(data)
+      setResultVoting(res.status === 202 && data.job_id ? await waitForImportJob(data.job_id, token) : data)
     } catch (err) {
       setResultVoting({ error: err.message || 'Ошибка сети' })
     } finally {